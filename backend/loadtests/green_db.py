@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Green psycopg2 load test
+Runs N concurrent 'SELECT pg_sleep(...)' greenlets on one eventlet hub, each on its own connection,
+first without a psycopg2 wait callback (every query blocks the hub) and then with the one
+utils/green_db.py installs, and reports the wall time of each round.
+
+    python loadtests/green_db.py --concurrency 10 20 --sleep 0.5
+
+The app needs its usual environment (DATABASE_URI pointing at PostgreSQL, SECRET_KEY, ...).
+Run from the backend directory.
+"""
+
+import eventlet
+
+# Like gunicorn's eventlet worker, but without eventlet's own psycopg2 callback so both modes can be timed
+eventlet.monkey_patch(psycopg=False)
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+import psycopg2  # noqa: E402
+from psycopg2 import extensions  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from yuuzone.utils.green_db import patch_psycopg  # noqa: E402
+
+
+def run_round(dsn: str, concurrency: int, sleep: float) -> float:
+    """Open the connections first, then time the concurrent queries alone"""
+    connections = [psycopg2.connect(dsn) for _ in range(concurrency)]
+
+    def query(connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_sleep(%s)', (sleep,))
+            cursor.fetchone()
+
+    try:
+        pool = eventlet.GreenPool(concurrency)
+        started_at = time.perf_counter()
+        for connection in connections:
+            pool.spawn(query, connection)
+        pool.waitall()
+        return time.perf_counter() - started_at
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10])
+    parser.add_argument('--sleep', type=float, default=0.5, help='Seconds each query sleeps in pg_sleep')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URI'))
+    args = parser.parse_args()
+    if not args.dsn or not args.dsn.startswith(('postgres://', 'postgresql')):
+        parser.error('a PostgreSQL DATABASE_URI (or --dsn) is required')
+    dsn = args.dsn.replace('postgresql+psycopg2://', 'postgresql://', 1)
+
+    print(f"{'greenlets':>9} {'callback':>8} {'wall s':>8} {'serial s':>8}")
+    for concurrency in args.concurrency:
+        for label in ('none', 'green'):
+            extensions.set_wait_callback(None)
+            if label == 'green':
+                patch_psycopg(force=True)
+            elapsed = run_round(dsn, concurrency, args.sleep)
+            print(f"{concurrency:>9} {label:>8} {elapsed:>8.2f} {concurrency * args.sleep:>8.2f}")
+    extensions.set_wait_callback(None)
+
+
+if __name__ == '__main__':
+    main()
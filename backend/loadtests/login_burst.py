@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Login burst load test
+Starts gunicorn with one eventlet worker, keeps a few clients looping on a feed, fires N concurrent
+logins at once and reports login status codes and latency plus how many feed requests completed,
+and at what latency, while the logins' bcrypt checks ran. Each PASSWORD_HASH_WORKERS value gets
+its own server.
+
+    python loadtests/login_burst.py --logins 50 --feed-clients 4 --hash-workers 1 4
+
+The app needs its usual environment (DATABASE_URI pointing at PostgreSQL, SECRET_KEY, ...).
+The login users (loadtest1@example.com, ...) are created or reset with a verified email first.
+Run from the backend directory.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import bcrypt
+import psycopg2
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'LoadTest-Passw0rd!'
+
+
+def seed_users(dsn: str, count: int, rounds: int) -> None:
+    """Create or reset loadtest1..N with one shared password hash"""
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()
+    with psycopg2.connect(dsn) as connection, connection.cursor() as cursor:
+        for index in range(1, count + 1):
+            cursor.execute(
+                "INSERT INTO users (username, email, password_hash, is_email_verified) VALUES (%s, %s, %s, true) "
+                "ON CONFLICT (username) DO UPDATE SET email = EXCLUDED.email, password_hash = EXCLUDED.password_hash, "
+                "is_email_verified = true, deleted = false",
+                (f'loadtest{index}', f'loadtest{index}@example.com', password_hash),
+            )
+    connection.close()
+
+
+def start_server(hash_workers: int, port: int, log_path: str) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY='1', PASSWORD_HASH_WORKERS=str(hash_workers))
+    log = open(log_path, 'w')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '--bind', f'127.0.0.1:{port}', 'wsgi:application'],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/healthz', timeout=1).status_code == 200:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f'Server did not start, see {log_path}')
+
+
+def measure(hash_workers: int, args) -> dict:
+    port = args.port + hash_workers
+    base = f'http://127.0.0.1:{port}'
+    server = start_server(hash_workers, port, os.path.join(args.log_dir, f'login_burst_h{hash_workers}.log'))
+    feed_ms, login_ms, codes = [], [], []
+    stopping = threading.Event()
+    measuring = threading.Event()
+
+    def feed_client():
+        session = requests.Session()
+        while not stopping.is_set():
+            started_at = time.perf_counter()
+            try:
+                session.get(f'{base}/api/posts/{args.feed}?limit=20', timeout=args.timeout)
+            except requests.RequestException:
+                continue
+            if measuring.is_set():
+                feed_ms.append((time.perf_counter() - started_at) * 1000)
+
+    def login(index: int):
+        started_at = time.perf_counter()
+        try:
+            # One address per login, so the per-IP login rate limit does not cut the burst short
+            response = requests.post(
+                f'{base}/api/user/login',
+                json={'email': f'loadtest{index}@example.com', 'password': PASSWORD},
+                headers={'X-Forwarded-For': f'10.77.{index // 250}.{index % 250 + 1}'},
+                timeout=args.timeout,
+            )
+            codes.append(response.status_code)
+        except requests.RequestException as e:
+            codes.append(type(e).__name__)
+        login_ms.append((time.perf_counter() - started_at) * 1000)
+
+    try:
+        feeds = [threading.Thread(target=feed_client) for _ in range(args.feed_clients)]
+        for thread in feeds:
+            thread.start()
+        time.sleep(1)  # Let the feed warm its caches before the burst
+        measuring.set()
+        logins = [threading.Thread(target=login, args=(index,)) for index in range(1, args.logins + 1)]
+        started_at = time.perf_counter()
+        for thread in logins:
+            thread.start()
+        for thread in logins:
+            thread.join()
+        elapsed = time.perf_counter() - started_at
+        stopping.set()
+        for thread in feeds:
+            thread.join()
+        stats = requests.get(f'{base}/api/system/stats', timeout=10).json().get('password_hasher', {})
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    return {
+        'hash_workers': hash_workers,
+        'elapsed_s': elapsed,
+        'codes': {code: codes.count(code) for code in sorted(set(codes), key=str)},
+        'login_p50_ms': statistics.median(login_ms),
+        'login_max_ms': max(login_ms),
+        'feed_requests': len(feed_ms),
+        'feed_p50_ms': statistics.median(feed_ms) if feed_ms else None,
+        'feed_p99_ms': statistics.quantiles(feed_ms, n=100)[98] if len(feed_ms) > 1 else None,
+        'peak_pending': stats.get('peak_pending'),
+        'rejected': stats.get('rejected'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hash-workers', type=int, nargs='+', default=[1])
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--feed-clients', type=int, default=4)
+    parser.add_argument('--feed', default='all', help='Feed the background clients read')
+    parser.add_argument('--rounds', type=int, default=int(os.environ.get('BCRYPT_ROUNDS', '12')))
+    parser.add_argument('--port', type=int, default=5700)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URI'))
+    parser.add_argument('--log-dir', default='/tmp')
+    args = parser.parse_args()
+    if not args.dsn or not args.dsn.startswith(('postgres://', 'postgresql')):
+        parser.error('a PostgreSQL DATABASE_URI (or --dsn) is required')
+    seed_users(args.dsn.replace('postgresql+psycopg2://', 'postgresql://', 1), args.logins, args.rounds)
+
+    print(f"{'hash workers':>12} {'logins s':>8} {'login p50':>9} {'login max':>9} "
+          f"{'feed reqs':>9} {'feed p50':>8} {'feed p99':>8} {'peak queue':>10}  codes")
+    for hash_workers in args.hash_workers:
+        result = measure(hash_workers, args)
+        feed_p50 = f"{result['feed_p50_ms']:.0f}" if result['feed_p50_ms'] is not None else '-'
+        feed_p99 = f"{result['feed_p99_ms']:.0f}" if result['feed_p99_ms'] is not None else '-'
+        print(f"{result['hash_workers']:>12} {result['elapsed_s']:>8.2f} {result['login_p50_ms']:>9.0f} "
+              f"{result['login_max_ms']:>9.0f} {result['feed_requests']:>9} {feed_p50:>8} {feed_p99:>8} "
+              f"{str(result['peak_pending']):>10}  {result['codes']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Default logo generation microbenchmark
+Renders default subthread logos for random names with the logo engine and with the previous inline
+renderer (per-cell rectangles, fonts reloaded for every size probe, eight offset outline passes,
+default PNG compression), and reports milliseconds per logo for each. Nothing is uploaded.
+
+    python loadtests/logo_generation.py --logos 40 --font /usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf
+
+The app needs its usual environment (DATABASE_URI, SECRET_KEY, ...). Run from the backend directory.
+"""
+
+import argparse
+import colorsys
+import io
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from yuuzone.utils import logo_engine  # noqa: E402
+
+
+def legacy_render(name: str, font_path: str, rng) -> bytes:
+    """The renderer Subthread.handle_logo ran inline before the logo engine, minus the upload"""
+    img_size = logo_engine.LOGO_SIZE
+    pixel_size = logo_engine.PIXEL_SIZE
+    base_hue = rng.randint(0, 360)
+    base_saturation = rng.randint(70, 100)
+    base_value = rng.randint(60, 90)
+    bg_r, bg_g, bg_b = colorsys.hsv_to_rgb(base_hue / 360, base_saturation / 100, max(20, base_value - 40) / 100)
+    img = Image.new("RGB", img_size, (int(bg_r * 255), int(bg_g * 255), int(bg_b * 255)))
+    draw = ImageDraw.Draw(img)
+
+    for y in range(0, img_size[1], pixel_size):
+        for x in range(0, img_size[0], pixel_size):
+            pixel_saturation = max(30, min(100, base_saturation + rng.randint(-25, 25)))
+            pixel_value = max(25, min(95, base_value + rng.randint(-30, 30)))
+            r, g, b = colorsys.hsv_to_rgb(base_hue / 360, pixel_saturation / 100, pixel_value / 100)
+            draw.rectangle([x, y, x + pixel_size - 1, y + pixel_size - 1], fill=(int(r * 255), int(g * 255), int(b * 255)))
+
+    font = ImageFont.truetype(font_path, 500)
+    text = logo_engine.logo_text(name)
+    target_size = int(img_size[0] * logo_engine.TEXT_RATIO)
+    min_size, max_size, optimal_size = 50, 800, 500
+    for _ in range(15):
+        test_font = ImageFont.truetype(font.path, optimal_size)
+        bbox = draw.textbbox((0, 0), text, font=test_font)
+        max_dimension = max(bbox[2] - bbox[0], bbox[3] - bbox[1])
+        if abs(max_dimension - target_size) < 15:
+            font = test_font
+            break
+        elif max_dimension < target_size:
+            min_size = optimal_size
+        else:
+            max_size = optimal_size
+        optimal_size = (min_size + max_size) // 2
+
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    text_x = (img_size[0] - text_width) / 2
+    text_y = (img_size[1] - text_height) / 2
+    offset = max(20, int(max(text_width, text_height) * 0.03))
+    for offset_x, offset_y in [(0, offset), (offset, 0), (0, -offset), (-offset, 0),
+                               (offset, offset), (-offset, -offset), (offset, -offset), (-offset, offset)]:
+        draw.text((text_x + offset_x, text_y + offset_y), text, font=font, fill=(0, 0, 0))
+    draw.text((text_x, text_y), text, font=font, fill=(255, 255, 255))
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def engine_render(name: str, font_path: str, rng) -> bytes:
+    """render_default_logo with the font choice pinned, so both renderers draw with the same font"""
+    pick_font = logo_engine.pick_font
+    logo_engine.pick_font = lambda rng=None: font_path
+    try:
+        return logo_engine.render_default_logo(name, rng)
+    finally:
+        logo_engine.pick_font = pick_font
+
+
+def measure(render, names, font_path: str, seed: int) -> dict:
+    rng = random.Random(seed)
+    timings = []
+    size = 0
+    for name in names:
+        started_at = time.perf_counter()
+        size += len(render(name, font_path, rng))
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return {
+        'mean_ms': statistics.mean(timings),
+        'p50_ms': statistics.median(timings),
+        'max_ms': max(timings),
+        'kb_per_logo': size / len(names) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logos', type=int, default=40)
+    parser.add_argument('--font', default='/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if not os.path.exists(args.font):
+        parser.error(f'font not found: {args.font}')
+
+    rng = random.Random(args.seed)
+    names = ['t/' + ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 12))) for _ in range(args.logos)]
+    # Load the font once, as a long-running worker already has; text fits stay cold like new names
+    measure(engine_render, ['t/__warmup'], args.font, args.seed)
+
+    print(f"{'renderer':>8} {'mean ms':>8} {'p50 ms':>8} {'max ms':>8} {'KB/logo':>8}")
+    baseline = None
+    for label, render in (('legacy', legacy_render), ('engine', engine_render)):
+        result = measure(render, names, args.font, args.seed)
+        baseline = baseline or result['mean_ms']
+        print(f"{label:>8} {result['mean_ms']:>8.1f} {result['p50_ms']:>8.1f} {result['max_ms']:>8.1f}"
+              f" {result['kb_per_logo']:>8.1f}  x{baseline / result['mean_ms']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
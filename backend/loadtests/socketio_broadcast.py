@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Socket.IO broadcast load test
+Starts gunicorn with 1..N eventlet workers sharing MESSAGE_QUEUE_URL, spreads websocket clients over
+the workers, publishes broadcasts through the queue and reports how many deliveries per second reach clients.
+
+    MESSAGE_QUEUE_URL=redis://127.0.0.1:6379/0 python loadtests/socketio_broadcast.py --workers 1 2 4
+
+The app needs its usual environment (DATABASE_URI, SECRET_KEY, ...). Run from the backend directory.
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import requests
+import socketio
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers: int, port: int, log_path: str) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers))
+    log = open(log_path, 'w')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '--bind', f'127.0.0.1:{port}', 'wsgi:application'],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/healthz', timeout=1).status_code == 200:
+                # Every worker has to be up before clients are spread over them
+                time.sleep(1 + workers)
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f'Server did not start, see {log_path}')
+
+
+def run_clients(url: str, count: int, broadcasts: int, ready, results, start_event, timeout: float):
+    """One client process: connect `count` websocket clients and count broadcasts until all have arrived"""
+    received = [0] * count
+    last_at = [0.0]
+    clients = []
+    for index in range(count):
+        client = socketio.Client(reconnection=False)
+
+        def on_broadcast(data, index=index):
+            received[index] += 1
+            last_at[0] = time.time()
+
+        client.on('bench_broadcast', on_broadcast)
+        client.connect(url, transports=['websocket'], wait_timeout=20)
+        clients.append(client)
+    ready.put(count)
+    start_event.wait()
+
+    deadline = time.time() + timeout
+    while sum(received) < count * broadcasts and time.time() < deadline:
+        time.sleep(0.01)
+    results.put((sum(received), last_at[0]))
+    for client in clients:
+        client.disconnect()
+
+
+def measure(workers: int, args) -> dict:
+    port = args.port + workers
+    server = start_server(workers, port, os.path.join(args.log_dir, f'broadcast_w{workers}.log'))
+    try:
+        ready = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+        start_event = multiprocessing.Event()
+        per_process = [args.clients // args.client_processes] * args.client_processes
+        per_process[0] += args.clients - sum(per_process)
+        processes = [
+            multiprocessing.Process(
+                target=run_clients,
+                args=(f'http://127.0.0.1:{port}', count, args.broadcasts, ready, results, start_event, args.timeout),
+            )
+            for count in per_process
+        ]
+        for process in processes:
+            process.start()
+        connected = sum(ready.get(timeout=120) for _ in processes)
+
+        # Emit from outside the server, like any worker would: through the shared queue
+        emitter = socketio.RedisManager(args.queue, channel=args.channel, write_only=True)
+        payload = 'x' * args.payload
+        start_event.set()
+        started_at = time.time()
+        for seq in range(args.broadcasts):
+            emitter.emit('bench_broadcast', {'seq': seq, 'payload': payload}, namespace='/')
+        published_at = time.time()
+
+        delivered = 0
+        finished_at = started_at
+        for _ in processes:
+            count, last_at = results.get(timeout=args.timeout + 30)
+            delivered += count
+            finished_at = max(finished_at, last_at)
+        for process in processes:
+            process.join(timeout=30)
+
+        elapsed = finished_at - started_at
+        return {
+            'workers': workers,
+            'clients': connected,
+            'expected': connected * args.broadcasts,
+            'delivered': delivered,
+            'publish_s': published_at - started_at,
+            'elapsed_s': elapsed,
+            'deliveries_per_s': delivered / elapsed if elapsed > 0 else 0.0,
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--broadcasts', type=int, default=200)
+    parser.add_argument('--payload', type=int, default=256, help='Bytes of padding per broadcast')
+    parser.add_argument('--port', type=int, default=5600)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--queue', default=os.environ.get('MESSAGE_QUEUE_URL'))
+    parser.add_argument('--channel', default=os.environ.get('SOCKETIO_CHANNEL', 'yuuzone-socketio'))
+    parser.add_argument('--log-dir', default='/tmp')
+    args = parser.parse_args()
+    if not args.queue or not args.queue.startswith(('redis://', 'rediss://')):
+        parser.error('a redis:// MESSAGE_QUEUE_URL (or --queue) is required')
+    os.environ['MESSAGE_QUEUE_URL'] = args.queue
+
+    print(f"{'workers':>7} {'clients':>7} {'delivered':>12} {'elapsed s':>9} {'deliveries/s':>12}")
+    baseline = None
+    for workers in args.workers:
+        result = measure(workers, args)
+        baseline = baseline or result['deliveries_per_s']
+        print(f"{result['workers']:>7} {result['clients']:>7} {result['delivered']:>6}/{result['expected']:<6}"
+              f"{result['elapsed_s']:>9.2f} {result['deliveries_per_s']:>12.0f}"
+              f"  x{result['deliveries_per_s'] / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Socket.IO broadcast CPU benchmark
+Measures the CPU one new_post-sized broadcast costs the server when it reaches N sockets in a room:
+one emit per recipient, one room emit with JSON packets (encoded once) and one room emit with
+msgpack packets (SOCKETIO_SERIALIZER=msgpack). Sockets are registered with python-socketio's
+manager directly and every recipient's packet is encoded the way the websocket writer does, so
+no network or client processes are involved.
+
+    python loadtests/socketio_serializer.py --clients 1000 --rounds 50
+
+Needs only python-socketio (and msgpack for the msgpack row); the app is not imported.
+"""
+
+import argparse
+import time
+
+import socketio
+
+ROOM = 'sub:9'
+
+NEW_POST = {
+    'postData': {
+        'post_info': {
+            'id': 123, 'title': 'A reasonably long post title here', 'content': 'lorem ipsum dolor sit amet ' * 80,
+            'media': [f'https://res.cloudinary.com/x/image/upload/v1/{index}.jpg' for index in range(4)],
+            'created_at': '2026-10-19T01:00:00+00:00', 'post_karma': 42, 'comments_count': 7, 'is_edited': False,
+        },
+        'user_info': {'user_name': 'alice', 'user_avatar': 'https://res.cloudinary.com/x/a.png'},
+        'thread_info': {'thread_id': 9, 'thread_name': 'python', 'thread_logo': None},
+        'current_user': None,
+    },
+    'subthreadId': 9, 'createdBy': 'alice', 'timestamp': '2026-10-19T01:00:00+00:00', 'postId': 123,
+}
+
+
+def make_server(serializer: str, clients: int):
+    """A server with `clients` sockets in ROOM whose packets are encoded and counted instead of sent"""
+    server = socketio.Server(serializer=serializer, async_mode='threading')
+    sent = {'frames': 0, 'bytes': 0}
+
+    def send_packet(eio_sid, packet):
+        encoded = packet.encode()
+        sent['frames'] += 1
+        sent['bytes'] += len(encoded)
+
+    server.eio.send_packet = send_packet
+    server.manager.initialize()
+    for index in range(clients):
+        sid = server.manager.connect(f'eio{index}', '/')
+        server.manager.enter_room(sid, '/', ROOM)
+    return server, sent
+
+
+def measure(serializer: str, per_recipient: bool, args) -> dict:
+    server, sent = make_server(serializer, args.clients)
+    sids = [sid for sid, _ in server.manager.get_participants('/', ROOM)]
+    started_at = time.process_time()
+    for _ in range(args.rounds):
+        if per_recipient:
+            for sid in sids:
+                server.emit('new_post', NEW_POST, to=sid)
+        else:
+            server.emit('new_post', NEW_POST, room=ROOM)
+    return {
+        'cpu_ms': (time.process_time() - started_at) / args.rounds * 1000,
+        'bytes_per_frame': sent['bytes'] // sent['frames'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    cases = [('json, emit per recipient', 'default', True), ('json, room emit', 'default', False)]
+    try:
+        import msgpack  # noqa: F401
+        cases.append(('msgpack, room emit', 'msgpack', False))
+    except ImportError:
+        print('msgpack is not installed, skipping the msgpack row')
+
+    print(f"{'mode':<26} {'CPU ms/broadcast':>16} {'bytes/frame':>11}")
+    for label, serializer, per_recipient in cases:
+        result = measure(serializer, per_recipient, args)
+        print(f"{label:<26} {result['cpu_ms']:>16.2f} {result['bytes_per_frame']:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -855,3 +855,106 @@ CREATE INDEX idx_media_order ON public.media(media_order);
 
 -- Add media column to comments table for backward compatibility
 ALTER TABLE public.comments ADD COLUMN media text;
+
+-- Background account deletion jobs (progress survives restarts)
+CREATE TABLE IF NOT EXISTS public.account_deletion_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id integer NOT NULL,
+    mode text NOT NULL DEFAULT 'purge',
+    status text NOT NULL DEFAULT 'pending',
+    stage text,
+    rows_deleted integer NOT NULL DEFAULT 0,
+    assets_deleted integer NOT NULL DEFAULT 0,
+    pending_assets text,
+    attempts integer NOT NULL DEFAULT 0,
+    error text,
+    created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at timestamp with time zone
+);
+
+CREATE INDEX IF NOT EXISTS idx_account_deletion_jobs_status ON public.account_deletion_jobs(status);
+
+-- Indexes used by the batched account deletion (per-user lookups and ON DELETE CASCADE targets)
+CREATE INDEX IF NOT EXISTS idx_posts_user_id ON public.posts(user_id);
+CREATE INDEX IF NOT EXISTS idx_comments_user_id ON public.comments(user_id);
+CREATE INDEX IF NOT EXISTS idx_comments_post_id ON public.comments(post_id);
+CREATE INDEX IF NOT EXISTS idx_comments_parent_id ON public.comments(parent_id);
+CREATE INDEX IF NOT EXISTS idx_reactions_post_id ON public.reactions(post_id);
+CREATE INDEX IF NOT EXISTS idx_reactions_comment_id ON public.reactions(comment_id);
+CREATE INDEX IF NOT EXISTS idx_saved_post_id ON public.saved(post_id);
+CREATE INDEX IF NOT EXISTS idx_messages_sender_id ON public.messages(sender_id);
+CREATE INDEX IF NOT EXISTS idx_messages_receiver_id ON public.messages(receiver_id);
+CREATE INDEX IF NOT EXISTS idx_subthread_bans_banned_by ON public.subthread_bans(banned_by);
+CREATE INDEX IF NOT EXISTS idx_user_blocks_blocked_id ON public.user_blocks(blocked_id);
+
+-- Conversation lookups for keyset-paged chat history (both directions share one index range)
+CREATE INDEX IF NOT EXISTS idx_messages_conversation
+    ON public.messages (LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id), created_at, id);
+
+-- Per user pair chat summary backing the inbox (maintained by the message routes)
+CREATE TABLE IF NOT EXISTS public.conversations (
+    id SERIAL PRIMARY KEY,
+    user_low_id integer NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    user_high_id integer NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    last_message_id integer,
+    last_sender_id integer,
+    last_activity_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    preview text,
+    unread_low integer NOT NULL DEFAULT 0,
+    unread_high integer NOT NULL DEFAULT 0,
+    CONSTRAINT conversations_pair_key UNIQUE (user_low_id, user_high_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversations_low_activity ON public.conversations(user_low_id, last_activity_at DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_high_activity ON public.conversations(user_high_id, last_activity_at DESC);
+
+-- Backfill summaries from existing messages
+INSERT INTO public.conversations (user_low_id, user_high_id, last_message_id, last_sender_id, last_activity_at, preview, unread_low, unread_high)
+SELECT latest.user_low_id, latest.user_high_id, latest.id, latest.sender_id, latest.created_at, latest.preview,
+       COALESCE(unread.unread_low, 0), COALESCE(unread.unread_high, 0)
+FROM (
+    SELECT DISTINCT ON (LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id))
+           LEAST(sender_id, receiver_id) AS user_low_id, GREATEST(sender_id, receiver_id) AS user_high_id,
+           id, sender_id, created_at, LEFT(content, 200) AS preview
+    FROM public.messages
+    WHERE sender_id IS NOT NULL AND receiver_id IS NOT NULL
+    ORDER BY LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id), created_at DESC, id DESC
+) latest
+LEFT JOIN (
+    SELECT LEAST(sender_id, receiver_id) AS user_low_id, GREATEST(sender_id, receiver_id) AS user_high_id,
+           COUNT(*) FILTER (WHERE receiver_id < sender_id) AS unread_low,
+           COUNT(*) FILTER (WHERE receiver_id > sender_id) AS unread_high
+    FROM public.messages
+    WHERE NOT seen
+    GROUP BY 1, 2
+) unread USING (user_low_id, user_high_id)
+ON CONFLICT (user_low_id, user_high_id) DO NOTHING;
+
+-- media.id was created without its sequence default, so inserts into media failed
+ALTER TABLE ONLY public.media ALTER COLUMN id SET DEFAULT nextval('public.media_id_seq'::regclass);
+SELECT setval('public.media_id_seq', GREATEST((SELECT COALESCE(MAX(id), 0) FROM public.media), 1));
+
+-- Files accepted by a request and uploaded to Cloudinary by the media upload pipeline
+CREATE TABLE IF NOT EXISTS public.media_uploads (
+    id SERIAL PRIMARY KEY,
+    user_id integer REFERENCES public.users(id) ON DELETE CASCADE,
+    post_id integer REFERENCES public.posts(id) ON DELETE CASCADE,
+    message_id integer REFERENCES public.messages(id) ON DELETE CASCADE,
+    media_order integer NOT NULL DEFAULT 0,
+    media_type text NOT NULL,
+    filename text,
+    spool_path text,
+    size bigint,
+    status text NOT NULL DEFAULT 'pending',
+    url text,
+    error text,
+    attempts integer NOT NULL DEFAULT 0,
+    created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_uploads_pending ON public.media_uploads(id) WHERE status <> 'ready';
+CREATE INDEX IF NOT EXISTS idx_media_uploads_post_id ON public.media_uploads(post_id);
+CREATE INDEX IF NOT EXISTS idx_media_uploads_message_id ON public.media_uploads(message_id);
+CREATE INDEX IF NOT EXISTS idx_media_uploads_user_id ON public.media_uploads(user_id);
@@ -17,7 +17,15 @@ from yuuzone.config import (
     DEFAULT_AVATAR_URL,
     SEPAY_API_KEY,
     TRANSLATE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
 )
+from yuuzone.utils.green_db import patch_psycopg, engine_options
+from yuuzone.utils.password_hasher import PasswordHasherBusy
+
+# Let psycopg2 yield to the eventlet hub before any database connection is opened
+patch_psycopg()
 
 app = Flask(
     __name__,
@@ -43,10 +51,7 @@ app.config["CLOUDINARY_NAME"] = CLOUDINARY_NAME
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
 app.config["SECRET_KEY"] = SECRET_KEY
 app.config["DEFAULT_AVATAR_URL"] = DEFAULT_AVATAR_URL
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 1800
-}
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT)
 
 # Configure session settings for Flask-Login
 app.config['SESSION_COOKIE_SECURE'] = False  # Allow HTTP for development
@@ -67,7 +72,10 @@ init_mail(app)
 # Initialize Socket.IO with the app
 try:
     from yuuzone.socketio_app import socketio
-    socketio.init_app(app)
+    from yuuzone.utils.cluster import cluster
+    # With a message queue, emits from any worker reach clients connected to every worker; either
+    # way the manager logs room events for reconnect replay
+    socketio.init_app(app, client_manager=cluster.socketio_manager())
 except ImportError:
     socketio = None
 except Exception:
@@ -76,6 +84,20 @@ except Exception:
 # Export socketio for use in other modules
 __all__ = ['app', 'db', 'socketio']
 
+# Initialize cluster coordination
+try:
+    from yuuzone.config import MESSAGE_QUEUE_URL
+    from yuuzone.utils.cluster import init_cluster
+
+    # Cache invalidations from other workers arrive over the same backend as Socket.IO emits
+    init_cluster(app)
+
+    if int(os.environ.get("WEB_CONCURRENCY", "1")) > 1 and not MESSAGE_QUEUE_URL:
+        print("⚠️ WEB_CONCURRENCY > 1 without MESSAGE_QUEUE_URL: emits and rate limits will not be shared between workers")
+    print("✅ Cluster coordination initialized")
+except Exception as e:
+    print(f"❌ Failed to initialize cluster coordination: {e}")
+
 # Initialize connection management system
 try:
     from yuuzone.utils.connection_manager import connection_manager
@@ -83,10 +105,14 @@ try:
     
     # Start connection health checker
     connection_manager.start_health_checker()
+
+    # Sample CPU/memory in the background so admission checks read a snapshot
+    system_monitor.start_sampler()
     
     # Add cleanup on app shutdown
     import atexit
     atexit.register(connection_manager.stop_health_checker)
+    atexit.register(system_monitor.stop_sampler)
     
     print("✅ Connection management system initialized")
 except Exception as e:
@@ -103,6 +129,28 @@ try:
 except Exception as e:
     print(f"❌ Failed to initialize materialized view refresher: {e}")
 
+# Initialize emit scheduler
+try:
+    from yuuzone.utils.emit_scheduler import init_emit_scheduler
+
+    # High-rate room events are merged per tick and sent as one frame per room
+    init_emit_scheduler(app)
+
+    print("✅ Emit scheduler initialized")
+except Exception as e:
+    print(f"❌ Failed to initialize emit scheduler: {e}")
+
+# Initialize presence service
+try:
+    from yuuzone.utils.presence import init_presence
+
+    # Room counts and online status come from server-side presence, pushed debounced
+    init_presence(app)
+
+    print("✅ Presence service initialized")
+except Exception as e:
+    print(f"❌ Failed to initialize presence service: {e}")
+
 
 @login_manager.unauthorized_handler
 def callback():
@@ -146,11 +194,47 @@ def system_stats():
         from yuuzone.utils.connection_manager import connection_manager
         from yuuzone.utils.system_monitor import system_monitor
         from yuuzone.utils.materialized_view_refresher import get_materialized_view_refresher
+        from yuuzone.utils.logo_engine import logo_engine
+        from yuuzone.utils.password_hasher import password_hasher
+        from yuuzone.users.service import identity_cache
+        from yuuzone.auth.permissions import permission_index
+        from yuuzone.subthreads.service import access_cache
+        from yuuzone.utils.account_deleter import account_deleter
+        from yuuzone.utils.message_cache import message_cache
+        from yuuzone.utils.media_uploader import media_upload_pipeline
+        from yuuzone.utils.cluster import cluster
+        from yuuzone.utils.emit_scheduler import emit_scheduler
+        from yuuzone.utils.rooms import room_registry
+        from yuuzone.utils.feeds import feed_registry
+        from yuuzone.utils.presence import presence
+        from yuuzone.utils.event_limiter import event_limiter
+        from yuuzone.utils.socket_sessions import socket_sessions
+        from yuuzone.utils.chat_delivery import chat_delivery
+        from yuuzone.utils.replay_log import replay_log
         
         stats = {
             "system": system_monitor.get_system_stats(),
+            "system_history": system_monitor.get_history(),
+            "system_sampler": system_monitor.get_sampler_status(),
             "connections": connection_manager.get_connection_stats(),
             "materialized_view_refresher": get_materialized_view_refresher().get_status() if get_materialized_view_refresher() else None,
+            "logo_engine": logo_engine.get_status(),
+            "password_hasher": password_hasher.get_stats(),
+            "identity_cache": identity_cache.get_stats(),
+            "permission_index": permission_index.get_stats(),
+            "access_cache": access_cache.get_stats(),
+            "account_deleter": account_deleter.get_status(),
+            "message_cache": message_cache.get_stats(),
+            "media_upload_pipeline": media_upload_pipeline.get_status(),
+            "cluster": cluster.get_status(),
+            "emit_scheduler": emit_scheduler.get_status(),
+            "rooms": room_registry.get_stats(),
+            "feeds": feed_registry.get_stats(),
+            "presence": presence.get_stats(),
+            "event_limiter": event_limiter.get_stats(),
+            "socket_sessions": socket_sessions.get_stats(),
+            "chat_delivery": chat_delivery.get_stats(),
+            "replay_log": replay_log.get_stats(),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -199,6 +283,43 @@ app.register_blueprint(translation)
 app.register_blueprint(coins_bp, url_prefix='/api/coins')
 init_subscription_routes(app)
 
+# Initialize account deletion pipeline
+# Started after the blueprints have imported every model: its startup rescan queries them right away,
+# and a mapper configured before a related model (UserRole) is defined stays broken for the process
+try:
+    from yuuzone.utils.account_deleter import init_account_deleter
+
+    # Deleted accounts are purged in batches off the request path, resuming unfinished jobs
+    init_account_deleter(app)
+
+    print("✅ Account deletion pipeline initialized")
+except Exception as e:
+    print(f"❌ Failed to initialize account deletion pipeline: {e}")
+
+# Initialize default logo engine
+# Also started after the models are imported, for its startup rescan
+try:
+    from yuuzone.utils.logo_engine import init_logo_engine
+
+    # Render and upload default subthread logos off the request path
+    init_logo_engine(app)
+
+    print("✅ Logo engine initialized")
+except Exception as e:
+    print(f"❌ Failed to initialize logo engine: {e}")
+
+# Initialize media upload pipeline
+# Also started after the models are imported, for its startup rescan
+try:
+    from yuuzone.utils.media_uploader import init_media_upload_pipeline
+
+    # Post and message media is uploaded to Cloudinary by background workers after the request commits
+    init_media_upload_pipeline(app)
+
+    print("✅ Media upload pipeline initialized")
+except Exception as e:
+    print(f"❌ Failed to initialize media upload pipeline: {e}")
+
 # Register catch-all route AFTER all API routes
 def register_catch_all_route():
     @app.route("/", defaults={"path": ""})
@@ -254,6 +375,17 @@ def handle_marshmallow_validation(err):
     return jsonify({"errors": err.messages}), 400
 
 
+@app.errorhandler(PasswordHasherBusy)
+def handle_password_hasher_busy(err):
+    response = jsonify({
+        "user_message": "Server is busy, please try again in a moment.",
+        "error_code": "SERVER_BUSY",
+        "developer_message": str(err)
+    })
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.errorhandler(404)
 def not_found(error):
     # If it's an API request, return JSON error
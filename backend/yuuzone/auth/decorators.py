@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import jsonify, request
 from flask_login import current_user, login_user
+from yuuzone.auth.permissions import permission_index
 
 
 def auth_role(role):
@@ -12,15 +13,7 @@ def auth_role(role):
             tid = kwargs.get("tid")
             if tid is not None:
                 # Check if user has role for the specific subthread
-                has_role_for_subthread = False
-                for r in roles:
-                    if any(
-                        ur.role.slug == r and ur.subthread_id == int(tid)
-                        for ur in current_user.user_role
-                    ):
-                        has_role_for_subthread = True
-                        break
-                if not has_role_for_subthread:
+                if not permission_index.has_role(current_user.id, int(tid), roles):
                     return jsonify({"message": "Unauthorized"}), 401
             else:
                 # No fallback to global roles - subthread ID is required for authorization
@@ -48,18 +41,10 @@ def super_manager_required(f):
             return jsonify({'error': 'Authentication required'}), 401
         
         # Check if user has SuperManager role
-        from yuuzone.models import UserRole, Role
-        super_manager_role = Role.query.filter_by(slug='SM').first()
-        
-        if not super_manager_role:
+        if permission_index.role_id('SM') is None:
             return jsonify({'error': 'SuperManager role not found'}), 500
         
-        user_role = UserRole.query.filter_by(
-            user_id=current_user.id, 
-            role_id=super_manager_role.id
-        ).first()
-        
-        if not user_role:
+        if not permission_index.has_role_anywhere(current_user.id, 'SM'):
             return jsonify({'error': 'SuperManager access required'}), 403
         
         return f(*args, **kwargs)
@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from yuuzone import db
+from yuuzone.models import Role, UserRole
+from yuuzone.utils.cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionIndex:
+    """Process-wide role index: role slug -> id and (user_id, subthread_id) -> role bitmask"""
+
+    def __init__(self, max_age: int = 300):
+        self.max_age = max_age  # Safety net reload in case an invalidation was missed
+        self.lock = threading.Lock()
+        self.version = 0
+        self.loaded_version = -1
+        self.loaded_at = 0.0
+        self.role_ids: Dict[str, int] = {}
+        self.role_bits: Dict[str, int] = {}
+        self.grants: Dict[Tuple[int, Optional[int]], int] = {}
+        self.user_masks: Dict[int, int] = {}  # Union of a user's roles across all subthreads
+        self.reloads = 0
+        self.checks = 0
+
+    def invalidate(self) -> None:
+        """Bump the version; the index is rebuilt on the next permission check"""
+        self._drop()
+        cluster.publish('permission_index', None)
+
+    def _drop(self, _payload=None) -> None:
+        with self.lock:
+            self.version += 1
+
+    def _ensure_loaded(self) -> None:
+        if self.loaded_version == self.version and time.time() - self.loaded_at < self.max_age:
+            return
+        with self.lock:
+            if self.loaded_version == self.version and time.time() - self.loaded_at < self.max_age:
+                return
+            version = self.version
+            roles = db.session.query(Role.id, Role.slug).order_by(Role.id).all()
+            role_ids = {slug: role_id for role_id, slug in roles}
+            bit_by_role_id = {role_id: 1 << position for position, (role_id, _slug) in enumerate(roles)}
+
+            grants: Dict[Tuple[int, Optional[int]], int] = {}
+            user_masks: Dict[int, int] = {}
+            for user_id, subthread_id, role_id in db.session.query(UserRole.user_id, UserRole.subthread_id, UserRole.role_id):
+                bit = bit_by_role_id.get(role_id, 0)
+                grants[(user_id, subthread_id)] = grants.get((user_id, subthread_id), 0) | bit
+                user_masks[user_id] = user_masks.get(user_id, 0) | bit
+
+            # Swap whole maps so readers never see a half-built index
+            self.role_ids = role_ids
+            self.role_bits = {slug: bit_by_role_id[role_id] for slug, role_id in role_ids.items()}
+            self.grants = grants
+            self.user_masks = user_masks
+            self.loaded_version = version
+            self.loaded_at = time.time()
+            self.reloads += 1
+
+    @staticmethod
+    def _key(user_id, subthread_id) -> Tuple[int, Optional[int]]:
+        return int(user_id), int(subthread_id) if subthread_id is not None else None
+
+    def _mask(self, slugs: Iterable[str]) -> int:
+        mask = 0
+        for slug in slugs:
+            mask |= self.role_bits.get(slug, 0)
+        return mask
+
+    def role_id(self, slug: str) -> Optional[int]:
+        self._ensure_loaded()
+        return self.role_ids.get(slug)
+
+    def has_role(self, user_id, subthread_id, slugs) -> bool:
+        """True if the user holds any of the roles in the given subthread"""
+        if user_id is None:
+            return False
+        self._ensure_loaded()
+        self.checks += 1
+        slugs = [slugs] if isinstance(slugs, str) else slugs
+        return bool(self.grants.get(self._key(user_id, subthread_id), 0) & self._mask(slugs))
+
+    def has_role_anywhere(self, user_id, slug: str) -> bool:
+        """True if the user holds the role in any subthread (or globally)"""
+        if user_id is None:
+            return False
+        self._ensure_loaded()
+        self.checks += 1
+        return bool(self.user_masks.get(int(user_id), 0) & self.role_bits.get(slug, 0))
+
+    def roles_for(self, user_id, subthread_id, slugs: Iterable[str] = ("admin", "mod")) -> List[str]:
+        """Role slugs (from the given candidates) the user holds in the subthread"""
+        if user_id is None:
+            return []
+        self._ensure_loaded()
+        self.checks += 1
+        mask = self.grants.get(self._key(user_id, subthread_id), 0)
+        return [slug for slug in slugs if mask & self.role_bits.get(slug, 0)]
+
+    def get_stats(self) -> Dict:
+        return {
+            'version': self.version,
+            'loaded_version': self.loaded_version,
+            'grants': len(self.grants),
+            'roles': len(self.role_ids),
+            'reloads': self.reloads,
+            'checks': self.checks,
+        }
+
+
+# Global instance
+permission_index = PermissionIndex()
+cluster.subscribe('permission_index', permission_index._drop)
+
+
+@event.listens_for(UserRole, "after_insert")
+@event.listens_for(UserRole, "after_update")
+@event.listens_for(UserRole, "after_delete")
+@event.listens_for(Role, "after_insert")
+@event.listens_for(Role, "after_update")
+@event.listens_for(Role, "after_delete")
+def _roles_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['permissions_changed'] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    if session.info.pop('permissions_changed', False):
+        permission_index.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, *_):
+    session.info.pop('permissions_changed', None)
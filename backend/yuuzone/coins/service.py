@@ -13,6 +13,7 @@ import traceback
 import json
 from yuuzone.utils.email import send_email
 from yuuzone.config import BOOST_DURATION_DAYS, DAILY_BOOST_LIMIT
+from yuuzone.utils.rooms import user_room
 
 # Import socketio for real-time updates - will be imported locally in functions
 socketio = None
@@ -108,7 +109,7 @@ class CoinService:
                         'new_balance': wallet.coin_balance,
                         'transaction_type': transaction_type,
                         'amount': amount
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
                     logging.info(f"🔍 DEBUG: Real-time update emitted successfully")
             except Exception as socket_error:
                 logging.error(f"Error emitting coin balance update: {socket_error}")
@@ -196,7 +197,7 @@ class CoinService:
                         'new_balance': wallet.coin_balance,
                         'transaction_type': transaction_type,
                         'amount': -amount
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
                     logging.info(f"🔍 DEBUG: Real-time update emitted successfully")
             except Exception as socket_error:
                 logging.error(f"Error emitting coin balance update: {socket_error}")
@@ -403,7 +404,7 @@ class CoinService:
                         'new_balance': self.get_wallet_balance(payment.user_id),
                         'package_name': payment.package.name if payment.package else 'Coin Package',
                         'coin_amount': coin_amount
-                    }, room=f'user_{payment.user_id}')
+                    }, room=user_room(payment.user_id))
                     
                     # Emit purchase history event
                     socketio.emit('new_purchase', {
@@ -422,7 +423,7 @@ class CoinService:
                             'paid_at': payment.paid_at.isoformat() if payment.paid_at else None,
                             'description': f"Purchased {payment.coin_amount} coins"
                         }
-                    }, room=f'user_{payment.user_id}')
+                    }, room=user_room(payment.user_id))
             except Exception as e:
                 if self.debug_mode:
                     logging.error(f"❌ DEBUG: Error emitting coin purchase completion: {e}")
@@ -485,7 +486,7 @@ class CoinService:
                         'new_balance': self.get_wallet_balance(user_id),
                         'avatar_name': avatar.name,
                         'cost': avatar.price_coins
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
                     
                     # Emit purchase history event
                     socketio.emit('new_purchase', {
@@ -500,7 +501,7 @@ class CoinService:
                             'created_at': user_avatar.purchased_at.isoformat() if user_avatar.purchased_at else None,
                             'description': f"Purchased avatar: {avatar.name}"
                         }
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
             except Exception as e:
                 logging.error(f"Error emitting avatar purchase: {e}")
             
@@ -614,7 +615,7 @@ class CoinService:
                         'post_title': post.title,
                         'cost': self.boost_cost,
                         'daily_boosts_remaining': DAILY_BOOST_LIMIT - today_boosts  # Show remaining boosts
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
                     
                     # Emit purchase history event
                     socketio.emit('new_purchase', {
@@ -628,7 +629,7 @@ class CoinService:
                             'created_at': boost.created_at.isoformat() if boost.created_at else None,
                             'description': f"Boosted post #{post_id}"
                         }
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
             except Exception as e:
                 logging.error(f"Error emitting post boost: {e}")
             
@@ -880,7 +881,7 @@ class CoinService:
                         'tier_name': tier.name,
                         'tier_slug': tier_slug,
                         'cost': coin_cost
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
                     
                     # Emit purchase history event
                     socketio.emit('new_purchase', {
@@ -895,7 +896,7 @@ class CoinService:
                             'created_at': subscription.created_at.isoformat() if subscription and subscription.created_at else None,
                             'description': f"Purchased tier: {tier.name}"
                         }
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
             except Exception as e:
                 logging.error(f"Error emitting tier purchase: {e}")
             
@@ -122,16 +122,9 @@ class CommentInfo(db.Model):
     def as_dict(self, cur_user):
         # Get author's roles in this subthread
         author_roles = []
-        if self.comment and self.comment.user:
-            from yuuzone.models import UserRole
-            user_roles = UserRole.query.filter_by(
-                user_id=self.comment.user.id,
-                subthread_id=self.post.subthread_id
-            ).join(UserRole.role).all()
-
-            for user_role in user_roles:
-                if user_role.role.slug in ["admin", "mod"]:
-                    author_roles.append(user_role.role.slug)
+        if self.comment and self.comment.user_id:
+            from yuuzone.auth.permissions import permission_index
+            author_roles = permission_index.roles_for(self.comment.user_id, self.post.subthread_id, ["admin", "mod"])
 
         # Get author's subscription types
         subscription_types = []
@@ -12,6 +12,7 @@ except ImportError:
 
 # Import rate limiting utilities
 from yuuzone.utils.rate_limiter import combined_protection, rate_limit
+from yuuzone.utils.rooms import post_room
 
 comments = Blueprint("comments", __name__, url_prefix="/api")
 
@@ -25,8 +26,8 @@ def get_comments(pid):
         if current_user.is_authenticated:
             post_info = PostInfo.query.filter_by(post_id=pid).first()
             if post_info:
-                from yuuzone.subthreads.models import SubthreadBan
-                banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post_info.thread_id).first()
+                from yuuzone.subthreads.service import access_cache
+                banned = access_cache.get(current_user.id).is_banned(post_info.thread_id)
                 if banned:
                     return jsonify({
                         "message": "You are banned from this subthread",
@@ -72,8 +73,8 @@ def update_comment(cid):
     from yuuzone.posts.models import Posts
     post = Posts.query.filter_by(id=comment.post_id).first()
     if post:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+        from yuuzone.subthreads.service import access_cache
+        banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -94,7 +95,7 @@ def update_comment(cid):
                     'content': new_content,
                     'edited_by': current_user.username,
                     'edited_at': comment.updated_at.isoformat() if comment.updated_at else None
-                }, room=f'{comment.post_id}')
+                }, room=post_room(comment.post_id))
             except Exception as e:
                 import logging
                 logging.error(f"Failed to emit comment edit: {e}")
@@ -114,8 +115,8 @@ def delete_comment(cid):
     from yuuzone.posts.models import Posts
     post = Posts.query.filter_by(id=comment.post_id).first()
     if post:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+        from yuuzone.subthreads.service import access_cache
+        banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -136,7 +137,7 @@ def delete_comment(cid):
                     'comment_id': cid,
                     'post_id': post_id,
                     'deleted_by': current_user.username
-                }, room=f'{post_id}')
+                }, room=post_room(post_id))
             except Exception as e:
                 import logging
                 logging.error(f"Failed to emit comment deletion: {e}")
@@ -164,7 +165,7 @@ def delete_comment(cid):
                     'comment_id': cid,
                     'post_id': post_id,
                     'deleted_by': current_user.username
-                }, room=f'{post_id}')
+                }, room=post_room(post_id))
             except Exception as e:
                 import logging
                 logging.error(f"Failed to emit comment deletion: {e}")
@@ -191,8 +192,8 @@ def new_comment():
     from yuuzone.posts.models import Posts
     post = Posts.query.filter_by(id=post_id).first()
     if post:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+        from yuuzone.subthreads.service import access_cache
+        banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -265,7 +266,7 @@ def new_comment():
             try:
                 # Validate the data structure before emitting
                 if response_data and 'comment' in response_data:
-                    socketio.emit('new_comment', response_data, room=f'{post_id}')
+                    socketio.emit('new_comment', response_data, room=post_room(post_id))
                 else:
                     import logging
                     logging.warning(f"Invalid comment data structure for Socket.IO emission: {response_data}")
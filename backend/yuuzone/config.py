@@ -24,3 +24,62 @@ SEPAY_API_KEY = os.environ.get("SEPAY_API_KEY")
 MAX_BOOSTS_PER_USER = int(os.environ.get("MAX_BOOSTS_PER_USER", "3"))  # Maximum boosts per user
 BOOST_DURATION_DAYS = int(os.environ.get("BOOST_DURATION_DAYS", "7"))  # How long boosts last
 DAILY_BOOST_LIMIT = int(os.environ.get("DAILY_BOOST_LIMIT", "5"))  # Maximum boosts per day per user
+
+# Database pool configuration (sized for green concurrency on the eventlet worker)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "20"))  # Persistent connections kept in the pool
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))  # Extra connections allowed under bursts
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "10"))  # Seconds to wait for a free connection
+
+# Password hashing configuration
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))  # Cost factor; older hashes are upgraded on login
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))  # Concurrent bcrypt operations, one core left for the hub
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "32"))  # Queue depth before rejecting with 503
+
+# Account deletion pipeline
+ACCOUNT_DELETION_BATCH_SIZE = int(os.environ.get("ACCOUNT_DELETION_BATCH_SIZE", "500"))  # Rows deleted per committed batch
+ACCOUNT_DELETION_PAUSE_MS = int(os.environ.get("ACCOUNT_DELETION_PAUSE_MS", "50"))  # Pause between batches to leave room for requests
+
+# Decrypted message cache
+MESSAGE_CACHE_MAX_BYTES = int(os.environ.get("MESSAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # Approximate memory held by decrypted content
+MESSAGE_DECRYPT_BATCH_THRESHOLD = int(os.environ.get("MESSAGE_DECRYPT_BATCH_THRESHOLD", "32"))  # Uncached messages on a page before decrypting in native threads
+MESSAGE_DECRYPT_WORKERS = int(os.environ.get("MESSAGE_DECRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))  # Native threads a large page is split across
+
+# Media upload pipeline
+MEDIA_UPLOAD_WORKERS = int(os.environ.get("MEDIA_UPLOAD_WORKERS", "4"))  # Concurrent Cloudinary uploads
+MEDIA_UPLOAD_SPOOL_DIR = os.environ.get("MEDIA_UPLOAD_SPOOL_DIR")  # Where accepted files wait for upload; defaults to a temp dir
+MEDIA_CHUNKED_UPLOAD_THRESHOLD = int(os.environ.get("MEDIA_CHUNKED_UPLOAD_THRESHOLD", str(20 * 1024 * 1024)))  # Videos this large use chunked upload
+MEDIA_UPLOAD_CHUNK_SIZE = int(os.environ.get("MEDIA_UPLOAD_CHUNK_SIZE", str(6 * 1024 * 1024)))  # Chunk size for chunked uploads (Cloudinary minimum is 5MB)
+
+# System load sampling
+SYSTEM_SAMPLE_INTERVAL = float(os.environ.get("SYSTEM_SAMPLE_INTERVAL", "2"))  # Seconds between psutil samples used by admission checks
+SYSTEM_HISTORY_SIZE = int(os.environ.get("SYSTEM_HISTORY_SIZE", "150"))  # Samples kept for /api/system/stats (5 minutes at the default interval)
+
+# Multi-worker coordination
+MESSAGE_QUEUE_URL = os.environ.get("MESSAGE_QUEUE_URL")  # redis://host:6379/0 shares emits, rate limits and invalidations across workers; memory:// for single-process tests
+SOCKETIO_CHANNEL = os.environ.get("SOCKETIO_CHANNEL", "yuuzone-socketio")  # Pub/sub channel for Socket.IO emits
+CLUSTER_KEY_PREFIX = os.environ.get("CLUSTER_KEY_PREFIX", "yuuzone")  # Namespace for shared keys and the invalidation channel
+
+# Socket.IO emit coalescing
+EMIT_COALESCE_TICK_MS = int(os.environ.get("EMIT_COALESCE_TICK_MS", "150"))  # Buffering window per room; 0 sends every event immediately
+EMIT_COALESCE_EVENTS = os.environ.get("EMIT_COALESCE_EVENTS")  # Comma-separated events to coalesce; unset uses the built-in list, empty disables
+
+# Socket.IO rooms
+ROOM_MAX_PER_SOCKET = int(os.environ.get("ROOM_MAX_PER_SOCKET", "32"))  # Rooms one socket may hold at once, across all types
+FEED_MAX_SUBTHREADS = int(os.environ.get("FEED_MAX_SUBTHREADS", "200"))  # Subthreads one feed view is indexed under; larger home feeds get live updates for the first ones
+FEED_TOP_TTL = int(os.environ.get("FEED_TOP_TTL", "60"))  # Seconds the all/popular subthread lists are cached for feed registration
+
+# Presence
+PRESENCE_HEARTBEAT_TTL = int(os.environ.get("PRESENCE_HEARTBEAT_TTL", "90"))  # Seconds without a heartbeat before a socket stops counting as present (clients beat every 30s)
+PRESENCE_DEBOUNCE_MS = int(os.environ.get("PRESENCE_DEBOUNCE_MS", "1000"))  # Live count and status changes are pushed at most once per this window
+
+# Socket.IO packets
+SOCKETIO_MAX_DECODE_PACKETS = int(os.environ.get("SOCKETIO_MAX_DECODE_PACKETS", "64"))  # Packets one polling payload may carry (engine.io default is 16)
+SOCKETIO_SERIALIZER = os.environ.get("SOCKETIO_SERIALIZER", "default")  # "msgpack" sends binary packets (needs msgpack, and socket.io-msgpack-parser on every client)
+
+# Socket sessions
+SOCKET_IDENTITY_TTL = int(os.environ.get("SOCKET_IDENTITY_TTL", "300"))  # Seconds a socket reuses the identity resolved at connect before reloading it
+
+# Reconnect replay
+REPLAY_MAX_EVENTS_PER_ROOM = int(os.environ.get("REPLAY_MAX_EVENTS_PER_ROOM", "100"))  # Ring buffer size per room; 0 disables replay
+REPLAY_MAX_ROOMS = int(os.environ.get("REPLAY_MAX_ROOMS", "2000"))  # Rooms logged at once; the least recently written is dropped beyond this
+REPLAY_TTL = int(os.environ.get("REPLAY_TTL", "120"))  # Seconds an event stays replayable, and a reconnected socket may catch up
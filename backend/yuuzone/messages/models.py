@@ -1,11 +1,9 @@
 from yuuzone import db
-from sqlalchemy import case, func
-import uuid
+from sqlalchemy import case, func, and_, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import logging
-import io
-from werkzeug.utils import secure_filename
-from flask import current_app as app
 from yuuzone.utils.message_encryption import message_encryption
+from yuuzone.utils.message_cache import message_cache
 
 
 class Messages(db.Model):
@@ -33,7 +31,11 @@ class Messages(db.Model):
     def __init__(self, sender_id, receiver_id, content, media=None):
         self.sender_id = sender_id
         self.receiver_id = receiver_id
-        
+        self.set_content(content)
+        self.media = media
+
+    def set_content(self, content):
+        """Store new message text, re-encrypting it so edits never leave a stale ciphertext behind"""
         # Encrypt content if encryption is available
         if message_encryption and content:
             encrypted_content, iv = message_encryption.encrypt_message(content)
@@ -50,19 +52,13 @@ class Messages(db.Model):
             self.iv = None
             self.encryption_version = None
             self.encryption_key_id = None
-        
-        self.media = media
 
     def handle_media(self, file):
-        """Handle file upload for messages with 25MB limit"""
+        """Spool an attached file (25MB limit) and return its pending upload; media is set once it reaches Cloudinary"""
         if not file:
-            return
+            return None
 
-        # Import Cloudinary here to avoid circular imports
-        try:
-            from cloudinary import uploader
-        except ImportError:
-            raise ValueError("Cloudinary not configured for file uploads")
+        from yuuzone.utils.media_uploader import media_upload_pipeline
 
         # Check file size (25MB = 26214400 bytes)
         file.seek(0, 2)  # Seek to end
@@ -76,67 +72,32 @@ class Messages(db.Model):
             raise ValueError("File is empty")
 
         try:
-            filename = secure_filename(file.filename)
-
-            if file.content_type.startswith("image/"):
-                # Upload image
-                image_data = uploader.upload(
-                    file,
-                    public_id=f"message_image_{uuid.uuid4().hex}_{filename.rsplit('.')[0]}",
-                    resource_type="image"
-                )
-                if not image_data or not image_data.get('public_id'):
-                    raise ValueError("Cloudinary upload failed: no public_id returned")
-                url = f"https://res.cloudinary.com/{app.config['CLOUDINARY_NAME']}/image/upload/c_auto,g_auto/{image_data.get('public_id')}"
-                #logging.info(f"Message image uploaded successfully to Cloudinary: {image_data.get('public_id')}")
-
-            elif file.content_type.startswith("video/"):
-                # Upload video
-                video_data = uploader.upload(
-                    file,
-                    resource_type="video",
-                    public_id=f"message_video_{uuid.uuid4().hex}_{filename.rsplit('.')[0]}",
-                )
-                if not video_data or not video_data.get('public_id'):
-                    raise ValueError("Cloudinary video upload failed: no public_id returned")
-
-                # Use consistent URL format like images - this ensures /video/ is in the path
-                url = f"https://res.cloudinary.com/{app.config['CLOUDINARY_NAME']}/video/upload/{video_data.get('public_id')}"
-                # print(f"f🔥 YUUZONE DEBUG: Generated video URL: {url}")
-                #logging.info(f"Message video uploaded successfully to Cloudinary: {video_data.get('public_id')}")
-
-            else:
-                # For other file types, upload as raw
-                file_data = uploader.upload(
-                    file,
-                    resource_type="raw",
-                    public_id=f"message_file_{uuid.uuid4().hex}_{filename.rsplit('.')[0]}",
-                )
-                if not file_data or not file_data.get('secure_url'):
-                    raise ValueError("Cloudinary upload failed: no secure_url returned")
-                url = file_data.get("secure_url")
-                #logging.info(f"Message file uploaded successfully to Cloudinary: {file_data.get('public_id')}")
-
-            self.media = url
-
+            return media_upload_pipeline.stage(file, self.sender_id, max_size=26214400)
+        except ValueError:
+            raise
         except Exception as e:
-            logging.error(f"Failed to upload message file to Cloudinary: {e}")
+            logging.error(f"Failed to spool message file: {e}")
             raise ValueError(f"Failed to upload file: {str(e)}")
 
-    def as_dict(self):
-        # Decrypt content if encrypted
-        content = self.get_decrypted_content()
-        
+    def as_dict(self, participants=None, contents=None):
+        # Decrypt content if encrypted; page readers pass contents already decrypted in one batch
+        if contents is not None and contents.get(self.id) is not None:
+            content = contents[self.id]
+        else:
+            content = self.get_decrypted_content()
+
+        # Callers serializing a whole conversation pass both users once instead of lazy-loading them per row
+        if participants:
+            sender = participants[self.sender_id]
+            receiver = participants[self.receiver_id]
+        else:
+            sender = {"username": self.user_sender.username, "avatar": self.user_sender.avatar}
+            receiver = {"username": self.user_receiver.username, "avatar": self.user_receiver.avatar}
+
         return {
             "message_id": self.id,
-            "sender": {
-                "username": self.user_sender.username,
-                "avatar": self.user_sender.avatar,
-            },
-            "receiver": {
-                "username": self.user_receiver.username,
-                "avatar": self.user_receiver.avatar,
-            },
+            "sender": sender,
+            "receiver": receiver,
             "content": content,
             "media": self.media,
             "created_at": self.created_at,
@@ -150,7 +111,7 @@ class Messages(db.Model):
         # Try to decrypt encrypted content first
         if self.content_encrypted and message_encryption:
             try:
-                decrypted = message_encryption.decrypt_message(self.content_encrypted, self.iv)
+                decrypted = message_cache.get_content(self, message_encryption)
                 if decrypted is not None:
                     return decrypted
             except Exception as e:
@@ -159,35 +120,178 @@ class Messages(db.Model):
         # Fallback to plain text content
         return self.content
 
+    @staticmethod
+    def conversation_filter(user_id, other_id):
+        """Match both directions of a conversation through the (least, greatest, created_at) index"""
+        low, high = min(user_id, other_id), max(user_id, other_id)
+        return and_(
+            func.least(Messages.sender_id, Messages.receiver_id) == low,
+            func.greatest(Messages.sender_id, Messages.receiver_id) == high,
+        )
+
     @classmethod
-    def get_inbox(cls, user_id):
-        my_case = case(
-            (Messages.sender_id == user_id, Messages.receiver_id),
-            else_=Messages.sender_id,
-        ).label("contact_id")
-        my_max = func.max(Messages.id).label("latest_id")
-        my_subquery = (
-            db.session.query(my_case, my_max)
-            .filter((Messages.sender_id == user_id) | (Messages.receiver_id == user_id))
-            .group_by("contact_id")
-            .subquery()
+    def get_chat_page(cls, user, other, before_id=None, limit=50):
+        """Newest-first keyset page of a conversation; returns (messages oldest-first, cursor for older page)"""
+        query = Messages.query.filter(cls.conversation_filter(user.id, other.id))
+        if before_id is not None:
+            cursor = (
+                db.session.query(Messages.created_at, Messages.id)
+                .filter(Messages.id == before_id, cls.conversation_filter(user.id, other.id))
+                .first()
+            )
+            if cursor is None:
+                return [], None
+            # Row comparison keeps the cursor an index range instead of an OR the planner cannot use
+            query = query.filter(tuple_(Messages.created_at, Messages.id) < tuple_(cursor.created_at, cursor.id))
+        # One row past the page tells whether an older page exists
+        rows = query.order_by(Messages.created_at.desc(), Messages.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        participants = {
+            user.id: {"username": user.username, "avatar": user.avatar},
+            other.id: {"username": other.username, "avatar": other.avatar},
+        }
+        contents = message_cache.decrypt_page(rows, message_encryption) if message_encryption else None
+        page = [message.as_dict(participants, contents) for message in reversed(rows)]
+        return page, (rows[-1].id if has_more else None)
+
+
+class Conversation(db.Model):
+    """Per user pair summary of a chat, kept in step with messages inside the same transaction"""
+    __tablename__ = "conversations"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_low_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_high_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    last_message_id = db.Column(db.Integer)
+    last_sender_id = db.Column(db.Integer)
+    last_activity_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now())
+    preview = db.Column(db.Text)
+    unread_low = db.Column(db.Integer, nullable=False, default=0)  # Unseen messages addressed to user_low_id
+    unread_high = db.Column(db.Integer, nullable=False, default=0)  # Unseen messages addressed to user_high_id
+    __table_args__ = (db.UniqueConstraint("user_low_id", "user_high_id", name="conversations_pair_key"),)
+
+    PREVIEW_LENGTH = 200
+
+    @staticmethod
+    def pair_filter(user_id, other_id):
+        low, high = min(user_id, other_id), max(user_id, other_id)
+        return and_(Conversation.user_low_id == low, Conversation.user_high_id == high)
+
+    @staticmethod
+    def unread_column(receiver_id, other_id):
+        """Counter column holding the unseen messages addressed to receiver_id"""
+        return Conversation.unread_low if receiver_id < other_id else Conversation.unread_high
+
+    @classmethod
+    def make_preview(cls, content):
+        return (content or "")[:cls.PREVIEW_LENGTH]
+
+    @classmethod
+    def record_message(cls, message, content):
+        """Upsert the pair's summary for a flushed message and count it as unread for the receiver"""
+        low, high = min(message.sender_id, message.receiver_id), max(message.sender_id, message.receiver_id)
+        unread = cls.unread_column(message.receiver_id, message.sender_id)
+        stmt = pg_insert(cls).values(
+            user_low_id=low,
+            user_high_id=high,
+            last_message_id=message.id,
+            last_sender_id=message.sender_id,
+            last_activity_at=func.now(),
+            preview=cls.make_preview(content),
+            unread_low=int(message.receiver_id == low),
+            unread_high=int(message.receiver_id == high),
         )
-        messages = (
-            Messages.query.join(my_subquery, my_subquery.c.latest_id == Messages.id)
-            .order_by(Messages.created_at.desc())
+        # Ids are allocated in send order, so an older message committing late never replaces a newer preview
+        is_newer = stmt.excluded.last_message_id > func.coalesce(cls.last_message_id, 0)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_low_id, cls.user_high_id],
+            set_={
+                "last_message_id": case((is_newer, stmt.excluded.last_message_id), else_=cls.last_message_id),
+                "last_sender_id": case((is_newer, stmt.excluded.last_sender_id), else_=cls.last_sender_id),
+                "last_activity_at": func.greatest(cls.last_activity_at, stmt.excluded.last_activity_at),
+                "preview": case((is_newer, stmt.excluded.preview), else_=cls.preview),
+                unread.key: unread + 1,
+            },
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def record_edit(cls, message, content):
+        """Refresh the preview when the edited message is the one shown in the inbox"""
+        cls.query.filter(
+            cls.pair_filter(message.sender_id, message.receiver_id),
+            cls.last_message_id == message.id,
+        ).update({"preview": cls.make_preview(content)}, synchronize_session=False)
+
+    @classmethod
+    def record_delete(cls, message):
+        """Call after the delete is flushed: drop it from the unread count and fall back to the previous message"""
+        pair = cls.pair_filter(message.sender_id, message.receiver_id)
+        if not message.seen:
+            unread = cls.unread_column(message.receiver_id, message.sender_id)
+            cls.query.filter(pair).update(
+                {unread: func.greatest(unread - 1, 0)}, synchronize_session=False
+            )
+        if not cls.query.filter(pair, cls.last_message_id == message.id).count():
+            return
+        previous = (
+            Messages.query.filter(Messages.conversation_filter(message.sender_id, message.receiver_id))
+            .order_by(Messages.created_at.desc(), Messages.id.desc())
+            .first()
+        )
+        if previous is None:
+            cls.query.filter(pair).delete(synchronize_session=False)
+            return
+        cls.query.filter(pair).update(
+            {
+                "last_message_id": previous.id,
+                "last_sender_id": previous.sender_id,
+                "last_activity_at": previous.created_at,
+                "preview": cls.make_preview(previous.get_decrypted_content()),
+            },
+            synchronize_session=False,
+        )
+
+    @classmethod
+    def mark_seen(cls, receiver_id, sender_id):
+        unread = cls.unread_column(receiver_id, sender_id)
+        cls.query.filter(cls.pair_filter(receiver_id, sender_id)).update({unread: 0}, synchronize_session=False)
+
+    @classmethod
+    def get_inbox(cls, user, limit=50):
+        """Latest conversations for a user in one indexed read, with the contact joined in"""
+        from yuuzone.users.models import User
+
+        is_low = cls.user_low_id == user.id
+        contact_id = case((is_low, cls.user_high_id), else_=cls.user_low_id)
+        rows = (
+            db.session.query(cls, User.username, User.avatar)
+            .join(User, User.id == contact_id)
+            .filter(or_(is_low, cls.user_high_id == user.id))
+            .order_by(cls.last_activity_at.desc(), cls.id.desc())
+            .limit(limit)
             .all()
         )
-        messages_list = []
-        for message in messages:
-            sender = message.user_receiver if message.sender_id == user_id else message.user_sender
-            messages_list.append(
-                message.as_dict()
-                | {
-                    "latest_from_user": message.sender_id == user_id,
-                    "sender": {
-                        "username": sender.username,
-                        "avatar": sender.avatar,
-                    },
-                }
+        me = {"username": user.username, "avatar": user.avatar}
+        inbox = []
+        for conversation, username, avatar in rows:
+            contact = {"username": username, "avatar": avatar}
+            mine_unread, theirs_unread = (
+                (conversation.unread_low, conversation.unread_high)
+                if conversation.user_low_id == user.id
+                else (conversation.unread_high, conversation.unread_low)
             )
-        return messages_list
+            latest_from_user = conversation.last_sender_id == user.id
+            inbox.append({
+                "message_id": conversation.last_message_id,
+                # "sender" is always the contact; the inbox lists people, not message directions
+                "sender": contact,
+                "receiver": contact if latest_from_user else me,
+                "content": conversation.preview,
+                "created_at": conversation.last_activity_at,
+                "seen": (theirs_unread if latest_from_user else mine_unread) == 0,
+                "latest_from_user": latest_from_user,
+                "unread_count": mine_unread,
+            })
+        return inbox
@@ -1,12 +1,13 @@
-from yuuzone.messages.models import Messages
+from yuuzone.messages.models import Conversation, Messages
 from flask import Blueprint, jsonify, request
 from yuuzone import db
-from sqlalchemy import and_
 from yuuzone.users.models import User
+from yuuzone.utils.media_uploader import media_upload_pipeline
 from flask_login import login_required, current_user
 
 # Import rate limiting utilities
 from yuuzone.utils.rate_limiter import combined_protection
+from yuuzone.utils.chat_delivery import chat_delivery
 
 messages = Blueprint("messages", __name__, url_prefix="/api")
 
@@ -51,6 +52,7 @@ def new_message():
         if not content and file:
             content = ""
 
+        upload = None
         try:
             new_message = Messages(
                 sender_id=current_user.id,
@@ -58,14 +60,20 @@ def new_message():
                 content=content,
             )
 
-            # Handle file upload if present
+            # Handle file upload if present; the file is spooled now and uploaded after commit
             if file:
                 # print(f"f🔥 YUUZONE DEBUG: Processing file upload: {file.filename}")
-                new_message.handle_media(file)
-                # print(f"f🔥 YUUZONE DEBUG: After handle_media, message.media = {new_message.media}")
+                upload = new_message.handle_media(file)
 
             db.session.add(new_message)
+            db.session.flush()
+            if upload:
+                upload.message_id = new_message.id
+                db.session.add(upload)
+            Conversation.record_message(new_message, content)
             db.session.commit()
+            if upload:
+                media_upload_pipeline.enqueue(upload.id)
 
             # Refresh the message from database to ensure all fields are loaded
             db.session.refresh(new_message)
@@ -77,14 +85,14 @@ def new_message():
         except Exception as e:
             # Handle other errors
             import logging
+            db.session.rollback()
+            if upload:
+                media_upload_pipeline.discard([upload])
             logging.error(f"Failed to create message: {e}")
             return jsonify({"message": "Failed to send message"}), 500
 
         # Emit to shared chat room and individual user rooms if socketio is available
         if socketio_instance:
-            # Create consistent room name for both users (alphabetical order)
-            room_name = f"chat_{min(current_user.username, receiver_user.username)}_{max(current_user.username, receiver_user.username)}"
-
             # Prepare message data
             message_data = {
                 'user': current_user.username,
@@ -99,7 +107,8 @@ def new_message():
                 'receiver': {
                     'username': receiver_user.username,
                     'avatar': receiver_user.avatar
-                }
+                },
+                'media_upload': upload.as_dict() if upload else None,
             }
 
             # print(f"f🔥 YUUZONE DEBUG: Prepared message data for Socket.IO: {message_data}")
@@ -115,22 +124,10 @@ def new_message():
             # Emit to shared chat room for real-time messaging (if Socket.IO available)
             if socketio_instance:
                 try:
-                    import logging
-                    #logging.info(f"Emitting message to chat room: {room_name}")
-
-                    # Emit to the chat room for real-time chat updates
-                    # The Chat component will handle both chat and inbox updates
-                    # print(f"f🔥 YUUZONE DEBUG: Emitting to chat room: {room_name}")
-                    socketio_instance.emit('new_message', message_data, room=room_name)
-                    # print(f"f🔥 YUUZONE DEBUG: Emitted to chat room successfully")
-
-                    # Also emit to individual user rooms to ensure users get messages
-                    # even if they're not currently in the chat room
-                    # print(f"f🔥 YUUZONE DEBUG: Emitting to user rooms: user_{receiver_user.id}, user_{current_user.id}")
-                    #logging.info(f"Emitting to user rooms: user_{receiver_user.id}, user_{current_user.id}")
-                    socketio_instance.emit('new_message', message_data, room=f"user_{receiver_user.id}")
-                    socketio_instance.emit('new_message', message_data, room=f"user_{current_user.id}")
-                    # print(f"f🔥 YUUZONE DEBUG: Emitted to user rooms successfully")
+                    # The chat room gets chat updates; the user rooms reach the inbox even when
+                    # the chat is not open. Sockets in several of these rooms get one copy.
+                    chat_delivery.deliver('new_message', message_data, (receiver_user.id, current_user.id),
+                                          (current_user.username, receiver_user.username))
 
                 except Exception as e:
                     import logging
@@ -139,7 +136,7 @@ def new_message():
                 import logging
                 #logging.info("Socket.IO not available, skipping real-time message emission")
 
-        response_data = new_message.as_dict()
+        response_data = new_message.as_dict() | {"media_upload": upload.as_dict() if upload else None}
         # print(f"f🔥 YUUZONE DEBUG: API response data: {response_data}")
         # print(f"f🔥 YUUZONE DEBUG: API response media field: {response_data.get('media')}")
         return jsonify(response_data), 200
@@ -149,7 +146,11 @@ def new_message():
 @messages.route("/messages/inbox")
 @login_required
 def get_inbox():
-    return jsonify(Messages.get_inbox(current_user.id)), 200
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 100)
+    except ValueError:
+        return jsonify({"message": "Invalid paging parameters"}), 400
+    return jsonify(Conversation.get_inbox(current_user, limit)), 200
 
 
 @messages.route("/messages/chat/<username>")
@@ -165,14 +166,14 @@ def get_chat(username):
         # Return error for deleted users
         return jsonify({"error": "User not found or account deleted"}), 404
     
-    chat_messages = Messages.query.filter(
-        and_(
-            (Messages.sender_id == current_user.id) & (Messages.receiver_id == receiver_user.id) |
-            (Messages.sender_id == receiver_user.id) & (Messages.receiver_id == current_user.id)
-        )
-    ).order_by(Messages.created_at.asc()).all()
-    
-    return jsonify([message.as_dict() for message in chat_messages]), 200
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 100)
+        before_id = int(request.args["before"]) if request.args.get("before") else None
+    except ValueError:
+        return jsonify({"message": "Invalid paging parameters"}), 400
+
+    chat_messages, next_before = Messages.get_chat_page(current_user, receiver_user, before_id, limit)
+    return jsonify({"messages": chat_messages, "next_before": next_before}), 200
 
 
 @messages.route("/messages/mark-seen", methods=["POST"])
@@ -198,6 +199,7 @@ def mark_messages_seen():
             receiver_id=current_user.id,
             seen=False
         ).update({"seen": True, "seen_at": db.func.now()})
+        Conversation.mark_seen(current_user.id, sender_user.id)
         
         db.session.commit()
         return jsonify({"message": "Messages marked as seen"}), 200
@@ -221,8 +223,9 @@ def edit_message(message_id):
         return jsonify({"message": "Message not found or you don't have permission to edit it"}), 404
 
     # Update the message
-    message.content = new_content
+    message.set_content(new_content)
     message.edited_at = db.func.now()
+    Conversation.record_edit(message, new_content)
     db.session.commit()
 
     # Emit real-time update if socketio is available
@@ -231,9 +234,6 @@ def edit_message(message_id):
             # Get receiver info
             receiver_user = User.query.get(message.receiver_id)
             if receiver_user:
-                # Create consistent room name for both users (alphabetical order)
-                room_name = f"chat_{min(current_user.username, receiver_user.username)}_{max(current_user.username, receiver_user.username)}"
-
                 # Prepare edit data
                 edit_data = {
                     'message_id': message_id,
@@ -242,8 +242,9 @@ def edit_message(message_id):
                     'sender': current_user.username
                 }
 
-                # Emit to chat room
-                socketio_instance.emit('message_edited', edit_data, room=room_name)
+                # Emit to the chat and both users' rooms, once per socket
+                chat_delivery.deliver('message_edited', edit_data, (receiver_user.id, current_user.id),
+                                      (current_user.username, receiver_user.username))
 
         except Exception as e:
             import logging
@@ -266,22 +267,22 @@ def delete_message(message_id):
 
     # Delete the message
     db.session.delete(message)
+    db.session.flush()
+    Conversation.record_delete(message)
     db.session.commit()
 
     # Emit real-time update if socketio is available
     if socketio_instance and receiver_user:
         try:
-            # Create consistent room name for both users (alphabetical order)
-            room_name = f"chat_{min(current_user.username, receiver_user.username)}_{max(current_user.username, receiver_user.username)}"
-
             # Prepare delete data
             delete_data = {
                 'message_id': message_id,
                 'sender': current_user.username
             }
 
-            # Emit to chat room
-            socketio_instance.emit('message_deleted', delete_data, room=room_name)
+            # Emit to the chat and both users' rooms, once per socket
+            chat_delivery.deliver('message_deleted', delete_data, (receiver_user.id, current_user.id),
+                                  (current_user.username, receiver_user.username))
 
         except Exception as e:
             import logging
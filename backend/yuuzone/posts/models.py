@@ -4,7 +4,6 @@ import uuid
 from flask import url_for
 from datetime import datetime, timedelta
 import cloudinary.uploader as uploader
-from werkzeug.utils import secure_filename
 from yuuzone.subthreads.models import Subthread
 from flask_marshmallow.fields import fields
 from marshmallow.exceptions import ValidationError
@@ -74,6 +73,48 @@ class Media(db.Model):
         db.session.commit()
 
 
+class MediaUpload(db.Model):
+    """A file accepted by a request and uploaded to Cloudinary by the media upload pipeline"""
+    __tablename__ = "media_uploads"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+    post_id = db.Column(db.Integer, db.ForeignKey("posts.id", ondelete="CASCADE"))
+    message_id = db.Column(db.Integer, db.ForeignKey("messages.id", ondelete="CASCADE"))
+    media_order = db.Column(db.Integer, nullable=False, default=0)
+    media_type = db.Column(db.Text, nullable=False)  # 'image', 'video', 'file'
+    filename = db.Column(db.Text)
+    spool_path = db.Column(db.Text)  # Local copy of the file until the upload finishes
+    size = db.Column(db.BigInteger)
+    status = db.Column(db.Text, nullable=False, default="pending")  # pending, uploading, ready, failed
+    url = db.Column(db.Text)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now())
+
+    def __init__(self, user_id, media_type, filename, spool_path, size, post_id=None, message_id=None, media_order=0):
+        self.user_id = user_id
+        self.media_type = media_type
+        self.filename = filename
+        self.spool_path = spool_path
+        self.size = size
+        self.post_id = post_id
+        self.message_id = message_id
+        self.media_order = media_order
+
+    def as_dict(self) -> dict:
+        return {
+            "upload_id": self.id,
+            "post_id": self.post_id,
+            "message_id": self.message_id,
+            "media_order": self.media_order,
+            "media_type": self.media_type,
+            "status": self.status,
+            "url": self.url,
+            "error": self.error,
+        }
+
+
 class Posts(db.Model):
     __tablename__ = "posts"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -92,6 +133,7 @@ class Posts(db.Model):
     comment_info = db.relationship("CommentInfo", back_populates="post")
     saved_post = db.relationship("SavedPosts", back_populates="post")
     media_items = db.relationship("Media", back_populates="post", cascade="all, delete-orphan", lazy="select")
+    pending_uploads = ()  # MediaUpload rows staged by handle_media, queued once the post is committed
 
     def get_media(self):
         # After migration, all media should be HTTP URLs
@@ -165,18 +207,21 @@ class Posts(db.Model):
             # Mark as edited and commit
             self.is_edited = True
             db.session.commit()
+            self.enqueue_uploads()
 
             #logging.info(f"Post patched successfully: ID {self.id}")
 
         except ValueError as ve:
             # Handle validation errors (from handle_media)
             db.session.rollback()
+            self.discard_uploads()
             logging.error(f"Post patch failed - validation error for post {self.id}: {ve}")
             raise ve
 
         except Exception as e:
             # Handle database or other unexpected errors
             db.session.rollback()
+            self.discard_uploads()
             logging.error(f"Post patch failed - unexpected error for post {self.id}: {e}")
             raise ValueError(f"Failed to update post: {str(e)}")
 
@@ -197,15 +242,14 @@ class Posts(db.Model):
             if form_data.get("content"):
                 new_post.content = form_data.get("content")
 
-            # Add to session and commit
+            # Add to session and commit together with the staged uploads
             db.session.add(new_post)
+            db.session.flush()
+            for upload in new_post.pending_uploads:
+                upload.post_id = new_post.id
+                db.session.add(upload)
             db.session.commit()
-
-            # After commit, handle any temporary media that was stored
-            if hasattr(new_post, '_temp_media_list') and new_post._temp_media_list:
-                Media.add_media(new_post._temp_media_list, post_id=new_post.id)
-                # Clean up the temporary attribute
-                delattr(new_post, '_temp_media_list')
+            new_post.enqueue_uploads()
 
             #logging.info(f"Post added successfully: ID {new_post.id}, Title: {new_post.title}")
             return new_post
@@ -213,15 +257,27 @@ class Posts(db.Model):
         except ValueError as ve:
             # Handle validation errors (from handle_media or other validation)
             db.session.rollback()
+            new_post.discard_uploads()
             logging.error(f"Post creation failed - validation error: {ve}")
             raise ve
 
         except Exception as e:
             # Handle database or other unexpected errors
             db.session.rollback()
+            new_post.discard_uploads()
             logging.error(f"Post creation failed - unexpected error: {e}")
             raise ValueError(f"Failed to create post: {str(e)}")
 
+    def enqueue_uploads(self):
+        from yuuzone.utils.media_uploader import media_upload_pipeline
+        for upload in self.pending_uploads:
+            media_upload_pipeline.enqueue(upload.id)
+
+    def discard_uploads(self):
+        from yuuzone.utils.media_uploader import media_upload_pipeline
+        media_upload_pipeline.discard(self.pending_uploads)
+        self.pending_uploads = ()
+
     def handle_media(self, content_type, images=None, urls=None):
         import logging
 
@@ -230,75 +286,43 @@ class Posts(db.Model):
             Media.delete_media_for_post(self.id)
 
         if content_type == "media" and images:
+            from yuuzone.utils.media_uploader import media_upload_pipeline
+
+            uploads = []
             try:
                 self.delete_media()
-                media_list = []
-                
+                if self.id:
+                    # Drop uploads still in flight for the media being replaced; the worker discards their result
+                    MediaUpload.query.filter(
+                        MediaUpload.post_id == self.id, MediaUpload.status != "ready"
+                    ).delete(synchronize_session=False)
+
                 # Handle multiple images
                 if isinstance(images, list):
                     image_files = images
                 else:
                     image_files = [images]
-                
-                for i, image in enumerate(image_files):
+
+                # Files are only spooled here; the upload pipeline sends them to Cloudinary after commit
+                for image in image_files:
                     if not image:
                         continue
-                        
-                    filename = secure_filename(image.filename)
-                    media_type = 'image' if image.content_type.startswith("image/") else 'video'
-                    
-                    if image.content_type.startswith("image/"):
-                        try:
-                            image_data = uploader.upload(
-                                image,
-                                public_id=f"{uuid.uuid4().hex}_{filename.rsplit('.')[0]}",
-                            )
-                            if not image_data or not image_data.get('public_id'):
-                                raise ValueError("Cloudinary upload failed: no public_id returned")
-                            url = f"https://res.cloudinary.com/{app.config['CLOUDINARY_NAME']}/image/upload/c_auto,g_auto/{image_data.get('public_id')}"
-                            media_list.append({
-                                'url': url,
-                                'type': media_type
-                            })
-                        except Exception as e:
-                            logging.error(f"Failed to upload image to Cloudinary: {e}")
-                            raise ValueError(f"Failed to upload image: {str(e)}")
-
-                    elif image.content_type.startswith("video/"):
-                        try:
-                            video_data = uploader.upload(
-                                image,
-                                resource_type="video",
-                                public_id=f"{uuid.uuid4().hex}_{filename.rsplit('.')[0]}",
-                            )
-                            if not video_data or not video_data.get('playback_url'):
-                                raise ValueError("Cloudinary video upload failed: no playback_url returned")
-                            url = video_data.get("playback_url")
-                            media_list.append({
-                                'url': url,
-                                'type': media_type
-                            })
-                        except Exception as e:
-                            logging.error(f"Failed to upload video to Cloudinary: {e}")
-                            raise ValueError(f"Failed to upload video: {str(e)}")
-                    else:
+                    if not image.content_type.startswith(("image/", "video/")):
                         raise ValueError(f"Unsupported media type: {image.content_type}")
+                    upload = media_upload_pipeline.stage(image, self.user_id, post_id=self.id, media_order=len(uploads))
+                    uploads.append(upload)
+                    if self.id:
+                        db.session.add(upload)
 
-                # Add media items to database only if post has an ID
-                if media_list and self.id:
-                    Media.add_media(media_list, post_id=self.id)
-                    # Set the first media as legacy media for backward compatibility
-                    self.media = media_list[0]['url']
-                elif media_list:
-                    # For new posts, store the media list temporarily
-                    # It will be added to the database after the post is committed
-                    self._temp_media_list = media_list
-                    # Set the first media as legacy media for backward compatibility
-                    self.media = media_list[0]['url']
+                # The legacy column is filled in when the first upload finishes
+                self.media = None
+                self.pending_uploads = uploads
 
             except ValueError:
+                media_upload_pipeline.discard(uploads)
                 raise
             except Exception as e:
+                media_upload_pipeline.discard(uploads)
                 logging.error(f"Unexpected error in handle_media: {e}")
                 raise ValueError(f"Media processing failed: {str(e)}")
 
@@ -442,16 +466,9 @@ class PostInfo(db.Model):
     def as_dict(self, cur_user=None):
         # Get author's roles in this subthread
         author_roles = []
-        if self.user:
-            from yuuzone.models import UserRole
-            user_roles = UserRole.query.filter_by(
-                user_id=self.user.id,
-                subthread_id=self.thread_id
-            ).join(UserRole.role).all()
-
-            for user_role in user_roles:
-                if user_role.role.slug in ["admin", "mod"]:
-                    author_roles.append(user_role.role.slug)
+        if self.user_id:
+            from yuuzone.auth.permissions import permission_index
+            author_roles = permission_index.roles_for(self.user_id, self.thread_id, ["admin", "mod"])
 
         # Get author's subscription types
         subscription_types = []
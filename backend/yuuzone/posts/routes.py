@@ -11,7 +11,8 @@ from yuuzone.posts.models import (
     get_filters,
     SavedPosts,
 )
-from yuuzone.subthreads.models import Subscription, SubthreadInfo
+from yuuzone.subthreads.models import SubthreadInfo
+from yuuzone.subthreads.service import access_cache
 # Socket.IO will be handled in WSGI - use try/except for graceful fallback
 try:
     from yuuzone.socketio_app import socketio
@@ -20,6 +21,9 @@ except ImportError:
 
 # Import rate limiting utilities
 from yuuzone.utils.rate_limiter import combined_protection, rate_limit
+from yuuzone.utils.emit_scheduler import emit_scheduler
+from yuuzone.utils.rooms import sub_room
+from yuuzone.utils.feeds import feed_registry
 from yuuzone.utils.giphy_service import GiphyService
 
 posts = Blueprint("posts", __name__, url_prefix="/api")
@@ -42,7 +46,7 @@ def get_posts(feed_name):
             return jsonify({"message": "Invalid Request"}), 400
 
         if feed_name == "home" and current_user.is_authenticated:
-            threads = [subscription.subthread.id for subscription in Subscription.query.filter_by(user_id=current_user.id)]
+            threads = access_cache.get(current_user.id).subscribed
         elif feed_name == "all":
             threads = [thread.id for thread in SubthreadInfo.query.order_by(SubthreadInfo.members_count.desc()).limit(25)]
         elif feed_name == "popular":
@@ -52,9 +56,8 @@ def get_posts(feed_name):
 
         # Filter out subthreads where the current user is banned
         if current_user.is_authenticated:
-            from yuuzone.subthreads.models import SubthreadBan
-            banned_subthreads = [ban.subthread_id for ban in SubthreadBan.query.filter_by(user_id=current_user.id).all()]
-            threads = [tid for tid in threads if tid not in banned_subthreads]
+            threads = set(threads) - access_cache.get(current_user.id).banned
+        threads = list(threads)
 
         # Get ALL non-expired boosted posts (no per-user limits)
         from yuuzone.coins.models import PostBoost
@@ -264,8 +267,7 @@ def get_post(pid):
 
     # Check if current user is banned from the subthread of this post
     if current_user.is_authenticated:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post_info.thread_id).first()
+        banned = access_cache.get(current_user.id).is_banned(post_info.thread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -292,8 +294,7 @@ def new_post():
     subthread_id = form_data.get("subthread_id")
 
     # Check if user is banned from this subthread
-    from yuuzone.subthreads.models import SubthreadBan
-    banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=subthread_id).first()
+    banned = access_cache.get(current_user.id).is_banned(subthread_id)
     if banned:
         return jsonify({
             "message": "You are banned from this subthread",
@@ -302,8 +303,7 @@ def new_post():
         }), 403
 
     # Check if user is subscribed to the subthread
-    subscription = Subscription.query.filter_by(user_id=current_user.id, subthread_id=subthread_id).first()
-    if not subscription:
+    if not access_cache.get(current_user.id).is_member(subthread_id):
         return jsonify({"message": "You must join the subthread before posting"}), 403
 
     # Validate input data
@@ -334,38 +334,38 @@ def new_post():
                 post_data = new_post.as_dict()
                 
                 # Emit enhanced new post event with comprehensive data
-                socketio.emit('new_post', {
+                emit_scheduler.emit('new_post', {
                     'postData': post_data,
                     'subthreadId': subthread_id,
                     'createdBy': current_user.username,
                     'timestamp': new_post.created_at.isoformat() if hasattr(new_post, 'created_at') else None,
                     'postId': new_post.id
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
-                # Also emit to global room for cross-subthread updates
-                socketio.emit('new_post_global', {
+                # Also emit to the feeds that show this subthread
+                feed_registry.emit('new_post_global', {
                     'postData': post_data,
                     'subthreadId': subthread_id,
                     'createdBy': current_user.username,
                     'timestamp': new_post.created_at.isoformat() if hasattr(new_post, 'created_at') else None,
                     'postId': new_post.id
-                }, room='global')
+                }, subthread_id)
                 
                 # Emit enhanced real-time events
-                socketio.emit('subthread_stats_update', {
+                emit_scheduler.emit('subthread_stats_update', {
                     'subthread_id': subthread_id,
                     'stats_type': 'posts_count',
                     'new_value': 1,  # Increment by 1
                     'updated_by': current_user.username
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
-                socketio.emit('user_activity', {
+                emit_scheduler.emit('user_activity', {
                     'username': current_user.username,
                     'activity_type': 'posting',
                     'subthread_id': subthread_id,
                     'post_id': new_post.id,
                     'timestamp': new_post.created_at.isoformat() if hasattr(new_post, 'created_at') else None
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
                 #logging.info(f"✅ Socket event emitted for new post {new_post.id} in room {subthread_id}")
             except Exception as socket_err:
@@ -377,7 +377,12 @@ def new_post():
             #logging.info("⚠️ Socket.IO not available, skipping new post event emission")
             pass
 
-        return jsonify({"message": "Post created"}), 200
+        return jsonify({
+            "message": "Post created",
+            "post_id": new_post.id,
+            # Attached files finish uploading in the background and arrive through post_updated
+            "media_uploads": [upload.as_dict() for upload in new_post.pending_uploads],
+        }), 200
 
     except ValueError as ve:
         # Handle validation or business logic errors
@@ -423,8 +428,7 @@ def update_post(pid):
         return jsonify({"message": "Unauthorized"}), 401
 
     # Check if user is banned from the subthread of this post
-    from yuuzone.subthreads.models import SubthreadBan
-    banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=update_post.subthread_id).first()
+    banned = access_cache.get(current_user.id).is_banned(update_post.subthread_id)
     if banned:
         return jsonify({
             "message": "You are banned from this subthread",
@@ -448,16 +452,16 @@ def update_post(pid):
                     'subthreadId': subthread_id,
                     'updatedBy': current_user.username,
                     'timestamp': update_post.updated_at.isoformat() if hasattr(update_post, 'updated_at') else None
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
-                # Also emit to global room for cross-subthread updates
-                socketio.emit('post_updated_global', {
+                # Also emit to the feeds that show this subthread
+                feed_registry.emit('post_updated_global', {
                     'postId': pid,
                     'newData': update_post.post_info[0].as_dict(current_user.id),
                     'subthreadId': subthread_id,
                     'updatedBy': current_user.username,
                     'timestamp': update_post.updated_at.isoformat() if hasattr(update_post, 'updated_at') else None
-                }, room='global')
+                }, subthread_id)
                 
                 #logging.info(f"Socket event emitted for updated post {pid} in room {subthread_id}")
             except Exception as socket_err:
@@ -469,6 +473,7 @@ def update_post(pid):
                 {
                     "message": "Post updated",
                     "new_data": update_post.post_info[0].as_dict(current_user.id),
+                    "media_uploads": [upload.as_dict() for upload in update_post.pending_uploads],
                 }
             ),
             200,
@@ -510,8 +515,7 @@ def delete_post(pid):
     # Check if user is the post owner
     if post.user_id == current_user.id:
         # Check if user is banned from the subthread of this post
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+        banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -532,31 +536,31 @@ def delete_post(pid):
                     'subthreadId': subthread_id,
                     'deletedBy': current_user.username,
                     'timestamp': None
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
-                # Also emit to global room for cross-subthread updates
-                socketio.emit('post_deleted_global', {
+                # Also emit to the feeds that show this subthread
+                feed_registry.emit('post_deleted_global', {
                     'postId': pid,
                     'subthreadId': subthread_id,
                     'deletedBy': current_user.username,
                     'timestamp': None
-                }, room='global')
+                }, subthread_id)
                 
                 # Emit enhanced real-time events
-                socketio.emit('subthread_stats_update', {
+                emit_scheduler.emit('subthread_stats_update', {
                     'subthread_id': subthread_id,
                     'stats_type': 'posts_count',
                     'new_value': -1,  # Decrement by 1
                     'updated_by': current_user.username
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
-                socketio.emit('user_activity', {
+                emit_scheduler.emit('user_activity', {
                     'username': current_user.username,
                     'activity_type': 'posting',
                     'subthread_id': subthread_id,
                     'post_id': pid,
                     'timestamp': None
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
                 #logging.info(f"Socket event emitted for deleted post {pid} in room {subthread_id}")
             except Exception as e:
@@ -591,31 +595,31 @@ def delete_post(pid):
                     'subthreadId': subthread_id,
                     'deletedBy': current_user.username,
                     'timestamp': None
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
-                # Also emit to global room for cross-subthread updates
-                socketio.emit('post_deleted_global', {
+                # Also emit to the feeds that show this subthread
+                feed_registry.emit('post_deleted_global', {
                     'postId': pid,
                     'subthreadId': subthread_id,
                     'deletedBy': current_user.username,
                     'timestamp': None
-                }, room='global')
+                }, subthread_id)
                 
                 # Emit enhanced real-time events
-                socketio.emit('subthread_stats_update', {
+                emit_scheduler.emit('subthread_stats_update', {
                     'subthread_id': subthread_id,
                     'stats_type': 'posts_count',
                     'new_value': -1,  # Decrement by 1
                     'updated_by': current_user.username
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
-                socketio.emit('user_activity', {
+                emit_scheduler.emit('user_activity', {
                     'username': current_user.username,
                     'activity_type': 'posting',
                     'subthread_id': subthread_id,
                     'post_id': pid,
                     'timestamp': None
-                }, room=f'{subthread_id}')
+                }, room=sub_room(subthread_id))
                 
                 #logging.info(f"Socket event emitted for deleted post {pid} in room {subthread_id}")
             except Exception as e:
@@ -629,8 +633,7 @@ def delete_post(pid):
 def get_posts_of_thread(tid):
     # Check if current user is banned from this subthread
     if current_user.is_authenticated:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=tid).first()
+        banned = access_cache.get(current_user.id).is_banned(tid)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -891,9 +894,7 @@ def get_posts_of_user(user_name):
                 if post_info and (durationBy is True or (hasattr(durationBy, 'filter') and durationBy.filter(post_info).scalar())):
                     # Check if post is from banned subthread
                     if current_user.is_authenticated:
-                        from yuuzone.subthreads.models import SubthreadBan
-                        banned_subthreads = [ban.subthread_id for ban in SubthreadBan.query.filter_by(user_id=current_user.id).all()]
-                        if post_info.thread_id in banned_subthreads:
+                        if access_cache.get(current_user.id).is_banned(post_info.thread_id):
                             continue  # Skip posts from banned subthreads
                     
                     # Only add if we haven't seen this post ID before
@@ -938,10 +939,9 @@ def get_posts_of_user(user_name):
 
     # Filter out posts from subthreads where the current user is banned
     if current_user.is_authenticated:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned_subthreads = [ban.subthread_id for ban in SubthreadBan.query.filter_by(user_id=current_user.id).all()]
+        banned_subthreads = access_cache.get(current_user.id).banned
         if banned_subthreads:
-            query = query.filter(~PostInfo.thread_id.in_(banned_subthreads))
+            query = query.filter(~PostInfo.thread_id.in_(list(banned_subthreads)))
 
     # Calculate how many regular posts we need
     # For pagination, we need to consider that top boosted posts are always at the top (max 3)
@@ -1057,8 +1057,7 @@ def get_saved():
     offset = request.args.get("offset", default=0, type=int)
 
     # Get banned subthreads for current user
-    from yuuzone.subthreads.models import SubthreadBan
-    banned_subthreads = [ban.subthread_id for ban in SubthreadBan.query.filter_by(user_id=current_user.id).all()]
+    banned_subthreads = access_cache.get(current_user.id).banned
 
     saved_posts = SavedPosts.query.filter(SavedPosts.user_id == current_user.id).offset(offset).limit(limit).all()
 
@@ -1078,8 +1077,7 @@ def delete_saved(pid):
     # Check if user is banned from the subthread of this post
     post_info = PostInfo.query.filter_by(post_id=pid).first()
     if post_info:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post_info.thread_id).first()
+        banned = access_cache.get(current_user.id).is_banned(post_info.thread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -1101,8 +1099,7 @@ def new_saved(pid):
     # Check if user is banned from the subthread of this post
     post_info = PostInfo.query.filter_by(post_id=pid).first()
     if post_info:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post_info.thread_id).first()
+        banned = access_cache.get(current_user.id).is_banned(post_info.thread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -1,8 +1,11 @@
 from flask import Blueprint, jsonify, request
+from sqlalchemy import case, func
 from yuuzone import db
 from yuuzone.reactions.models import Reactions
 from flask_login import current_user, login_required
 from yuuzone.users.models import UsersKarma
+from yuuzone.utils.emit_scheduler import emit_scheduler
+from yuuzone.utils.rooms import post_room, sub_room, user_room
 # Socket.IO will be handled in WSGI - use try/except for graceful fallback
 try:
     from yuuzone.socketio_app import socketio
@@ -15,6 +18,15 @@ from yuuzone.utils.rate_limiter import rate_limit
 reactions = Blueprint("reactions", __name__, url_prefix="/api")
 
 
+def _vote_counts(**filters):
+    """Absolute counts for a post or comment; coalesced vote events keep only the newest, so they carry totals"""
+    upvotes, downvotes = db.session.query(
+        func.count(case((Reactions.is_upvote.is_(True), 1))),
+        func.count(case((Reactions.is_upvote.is_(False), 1))),
+    ).filter_by(**filters).one()
+    return {'upvotes': upvotes, 'downvotes': downvotes, 'karma': upvotes - downvotes}
+
+
 @reactions.route("/reactions/post/<post_id>", methods=["PATCH"])
 @login_required
 @rate_limit("vote")
@@ -23,8 +35,8 @@ def update_reaction_post(post_id):
     from yuuzone.posts.models import Posts
     post = Posts.query.filter_by(id=post_id).first()
     if post:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+        from yuuzone.subthreads.service import access_cache
+        banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -43,20 +55,21 @@ def update_reaction_post(post_id):
             # Emit real-time vote update
             if socketio and post:
                 try:
-                    socketio.emit('post_vote_updated', {
-                        'post_id': post_id,
+                    emit_scheduler.emit('post_vote_updated', {
+                        'post_id': post.id,
                         'user_id': current_user.id,
                         'is_upvote': new_vote,
                         'vote_type': 'update',
-                        'old_vote': old_vote
-                    }, room=f'{post.subthread_id}')
+                        'old_vote': old_vote,
+                        **_vote_counts(post_id=post.id)
+                    }, room=sub_room(post.subthread_id))
                     # Emit real-time karma update
                     user_karma = UsersKarma.query.filter_by(user_id=current_user.id).first()
                     if user_karma:
-                        socketio.emit('karma_updated', {
+                        emit_scheduler.emit('karma_updated', {
                             'user_id': current_user.id,
                             'user_karma': user_karma.user_karma
-                        }, room=f'user_{current_user.id}')
+                        }, room=user_room(current_user.id))
                 except Exception as e:
                     import logging
                     logging.error(f"Failed to emit post vote update: {e}")
@@ -73,8 +86,8 @@ def add_reaction_post(post_id):
     from yuuzone.posts.models import Posts
     post = Posts.query.filter_by(id=post_id).first()
     if post:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+        from yuuzone.subthreads.service import access_cache
+        banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -96,20 +109,21 @@ def add_reaction_post(post_id):
         # Emit real-time vote addition/update
         if socketio and post:
             try:
-                socketio.emit('post_vote_updated', {
-                    'post_id': post_id,
+                emit_scheduler.emit('post_vote_updated', {
+                    'post_id': post.id,
                     'user_id': current_user.id,
                     'is_upvote': has_upvoted,
                     'vote_type': vote_type,
-                    'old_vote': old_vote
-                }, room=f'{post.subthread_id}')
+                    'old_vote': old_vote,
+                    **_vote_counts(post_id=post.id)
+                }, room=sub_room(post.subthread_id))
                 # Emit real-time karma update
                 user_karma = UsersKarma.query.filter_by(user_id=current_user.id).first()
                 if user_karma:
-                    socketio.emit('karma_updated', {
+                    emit_scheduler.emit('karma_updated', {
                         'user_id': current_user.id,
                         'user_karma': user_karma.user_karma
-                    }, room=f'user_{current_user.id}')
+                    }, room=user_room(current_user.id))
             except Exception as e:
                 import logging
                 logging.error(f"Failed to emit post vote addition: {e}")
@@ -125,8 +139,8 @@ def delete_reaction_post(post_id):
     from yuuzone.posts.models import Posts
     post = Posts.query.filter_by(id=post_id).first()
     if post:
-        from yuuzone.subthreads.models import SubthreadBan
-        banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+        from yuuzone.subthreads.service import access_cache
+        banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
         if banned:
             return jsonify({
                 "message": "You are banned from this subthread",
@@ -143,20 +157,21 @@ def delete_reaction_post(post_id):
         # Emit real-time vote removal
         if socketio and post:
             try:
-                socketio.emit('post_vote_updated', {
-                    'post_id': post_id,
+                emit_scheduler.emit('post_vote_updated', {
+                    'post_id': post.id,
                     'user_id': current_user.id,
                     'is_upvote': None,
                     'vote_type': 'remove',
-                    'old_vote': old_vote
-                }, room=f'{post.subthread_id}')
+                    'old_vote': old_vote,
+                    **_vote_counts(post_id=post.id)
+                }, room=sub_room(post.subthread_id))
                 # Emit real-time karma update
                 user_karma = UsersKarma.query.filter_by(user_id=current_user.id).first()
                 if user_karma:
-                    socketio.emit('karma_updated', {
+                    emit_scheduler.emit('karma_updated', {
                         'user_id': current_user.id,
                         'user_karma': user_karma.user_karma
-                    }, room=f'user_{current_user.id}')
+                    }, room=user_room(current_user.id))
             except Exception as e:
                 import logging
                 logging.error(f"Failed to emit post vote removal: {e}")
@@ -176,8 +191,8 @@ def update_reaction_comment(comment_id):
     if comment:
         post = Posts.query.filter_by(id=comment.post_id).first()
         if post:
-            from yuuzone.subthreads.models import SubthreadBan
-            banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+            from yuuzone.subthreads.service import access_cache
+            banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
             if banned:
                 return jsonify({
                     "message": "You are banned from this subthread",
@@ -195,21 +210,22 @@ def update_reaction_comment(comment_id):
             # Emit real-time comment vote update
             if socketio and comment:
                 try:
-                    socketio.emit('comment_vote_updated', {
-                        'comment_id': comment_id,
+                    emit_scheduler.emit('comment_vote_updated', {
+                        'comment_id': comment.id,
                         'post_id': comment.post_id,
                         'user_id': current_user.id,
                         'is_upvote': has_upvoted,
                         'vote_type': 'update',
-                        'old_vote': old_vote
-                    }, room=f'{comment.post_id}')
+                        'old_vote': old_vote,
+                        **_vote_counts(comment_id=comment.id)
+                    }, room=post_room(comment.post_id))
                     # Emit real-time karma update
                     user_karma = UsersKarma.query.filter_by(user_id=current_user.id).first()
                     if user_karma:
-                        socketio.emit('karma_updated', {
+                        emit_scheduler.emit('karma_updated', {
                             'user_id': current_user.id,
                             'user_karma': user_karma.user_karma
-                        }, room=f'user_{current_user.id}')
+                        }, room=user_room(current_user.id))
                 except Exception as e:
                     import logging
                     logging.error(f"Failed to emit comment vote update: {e}")
@@ -229,8 +245,8 @@ def add_reaction_comment(comment_id):
     if comment:
         post = Posts.query.filter_by(id=comment.post_id).first()
         if post:
-            from yuuzone.subthreads.models import SubthreadBan
-            banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+            from yuuzone.subthreads.service import access_cache
+            banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
             if banned:
                 return jsonify({
                     "message": "You are banned from this subthread",
@@ -245,20 +261,21 @@ def add_reaction_comment(comment_id):
         # Emit real-time comment vote addition
         if socketio and comment:
             try:
-                socketio.emit('comment_vote_updated', {
-                    'comment_id': comment_id,
+                emit_scheduler.emit('comment_vote_updated', {
+                    'comment_id': comment.id,
                     'post_id': comment.post_id,
                     'user_id': current_user.id,
                     'is_upvote': has_upvoted,
-                    'vote_type': 'new'
-                }, room=f'{comment.post_id}')
+                    'vote_type': 'new',
+                    **_vote_counts(comment_id=comment.id)
+                }, room=post_room(comment.post_id))
                 # Emit real-time karma update
                 user_karma = UsersKarma.query.filter_by(user_id=current_user.id).first()
                 if user_karma:
-                    socketio.emit('karma_updated', {
+                    emit_scheduler.emit('karma_updated', {
                         'user_id': current_user.id,
                         'user_karma': user_karma.user_karma
-                    }, room=f'user_{current_user.id}')
+                    }, room=user_room(current_user.id))
             except Exception as e:
                 import logging
                 logging.error(f"Failed to emit comment vote addition: {e}")
@@ -277,8 +294,8 @@ def delete_reaction_comment(comment_id):
     if comment:
         post = Posts.query.filter_by(id=comment.post_id).first()
         if post:
-            from yuuzone.subthreads.models import SubthreadBan
-            banned = SubthreadBan.query.filter_by(user_id=current_user.id, subthread_id=post.subthread_id).first()
+            from yuuzone.subthreads.service import access_cache
+            banned = access_cache.get(current_user.id).is_banned(post.subthread_id)
             if banned:
                 return jsonify({
                     "message": "You are banned from this subthread",
@@ -295,21 +312,22 @@ def delete_reaction_comment(comment_id):
         # Emit real-time comment vote removal
         if socketio and comment:
             try:
-                socketio.emit('comment_vote_updated', {
-                    'comment_id': comment_id,
+                emit_scheduler.emit('comment_vote_updated', {
+                    'comment_id': comment.id,
                     'post_id': comment.post_id,
                     'user_id': current_user.id,
                     'is_upvote': None,
                     'vote_type': 'remove',
-                    'old_vote': old_vote
-                }, room=f'{comment.post_id}')
+                    'old_vote': old_vote,
+                    **_vote_counts(comment_id=comment.id)
+                }, room=post_room(comment.post_id))
                 # Emit real-time karma update
                 user_karma = UsersKarma.query.filter_by(user_id=current_user.id).first()
                 if user_karma:
-                    socketio.emit('karma_updated', {
+                    emit_scheduler.emit('karma_updated', {
                         'user_id': current_user.id,
                         'user_karma': user_karma.user_karma
-                    }, room=f'user_{current_user.id}')
+                    }, room=user_room(current_user.id))
             except Exception as e:
                 import logging
                 logging.error(f"Failed to emit comment vote removal: {e}")
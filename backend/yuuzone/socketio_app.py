@@ -3,15 +3,35 @@ from flask import request
 import logging
 from .utils.connection_manager import connection_manager
 from .utils.system_monitor import system_monitor
+from .utils.rooms import room_registry, post_room, settings_room, sub_room, user_room
+from .utils.feeds import FEEDS, feed_registry, feed_room
+from .utils.presence import presence
+from .utils.event_limiter import event_limiter, throttled
+from .utils.socket_sessions import socket_sessions, socket_user
+from .utils.replay_log import replay_log
+from .utils.emit_scheduler import BATCH_EVENT
 
 # Fix for "Too many packets in payload" error
 try:
     from engineio.payload import Payload
-    Payload.max_decode_packets = 500  # Increased from default ~16 to 500
+    from .config import SOCKETIO_MAX_DECODE_PACKETS
+    Payload.max_decode_packets = SOCKETIO_MAX_DECODE_PACKETS  # Packets accepted in one polling payload; event rates are limited per socket below
 except ImportError:
     # If engineio is not available or version doesn't support this, continue without it
     logging.warning("Could not import engineio.payload, continuing without packet limit fix")
 
+def _packet_serializer():
+    """'msgpack' when configured and installed, JSON packets otherwise"""
+    from .config import SOCKETIO_SERIALIZER
+    if SOCKETIO_SERIALIZER != 'msgpack':
+        return 'default'
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        logging.warning("SOCKETIO_SERIALIZER=msgpack but msgpack is not installed, using JSON packets")
+        return 'default'
+    return 'msgpack'
+
 # Create socketio instance without app (will be initialized later)
 socketio = SocketIO(
     cors_allowed_origins="*",
@@ -32,25 +52,27 @@ socketio = SocketIO(
     cors_credentials=False,  # Disable CORS credentials requirement
     # Additional settings for better connection stability
     compression_threshold=1024,  # Compress messages > 1KB
-    compression_level=6  # Balanced compression
+    compression_level=6,  # Balanced compression
+    # Every emit is encoded once and the same bytes are written to each recipient; with msgpack
+    # all clients must connect with socket.io-msgpack-parser
+    serializer=_packet_serializer()
 )
 
 # Add connection and disconnection event handlers
 @socketio.on('connect')
-def on_connect():
+def on_connect(auth=None):
     try:
-        # Import Flask-Login for authentication
+        # Resolve the user once; every later event on this socket reuses the identity
         from flask_login import current_user
+        identity = socket_sessions.bind(request.sid, current_user)
         
         # Get client IP for logging
         client_ip = get_client_ip(request.sid)
         
         # Check if user is authenticated (optional - allow both authenticated and anonymous connections)
-        user_id = None
-        username = None
-        if current_user.is_authenticated:
-            user_id = current_user.id
-            username = current_user.username
+        user_id = identity.id
+        username = identity.username
+        if identity.is_authenticated:
             logging.info(f"Authenticated user {username} (ID: {user_id}) connected from {client_ip}")
         else:
             logging.info(f"Anonymous user connected from {client_ip}")
@@ -63,19 +85,26 @@ def on_connect():
                 'ip': client_ip,
                 'user_id': user_id,
                 'username': username,
-                'authenticated': current_user.is_authenticated
+                'authenticated': identity.is_authenticated
             }
             connection_manager.register_connection(connection_id, "websocket", metadata)
         except Exception as e:
             logging.warning(f"Failed to register connection: {request.sid}, error: {e}")
             # Don't reject connection if registration fails
+        presence.connect(request.sid, user_id, username)
+
+        # A reconnecting client sends the last sequence number it saw; rooms it rejoins are caught up from there
+        resume = auth.get('replay') if isinstance(auth, dict) else None
+        if isinstance(resume, dict) and not replay_log.resume(request.sid, resume.get('epoch'), resume.get('seq')):
+            emit('replay_refetch', {'rooms': None})
         
         # Send connection confirmation with user info
         emit('connected', {
             'message': 'Connected to YuuZone server',
-            'authenticated': current_user.is_authenticated,
+            'authenticated': identity.is_authenticated,
             'user_id': user_id,
-            'username': username
+            'username': username,
+            'replay': replay_log.position()
         })
         
         logging.info(f"Client {request.sid} connected successfully")
@@ -96,6 +125,13 @@ def on_disconnect(reason=None):
         except Exception as e:
             logging.warning(f"Failed to remove connection from manager: {e}")
         
+        room_registry.drop(request.sid)
+        feed_registry.drop(request.sid)
+        presence.disconnect(request.sid)
+        event_limiter.drop(request.sid)
+        socket_sessions.drop(request.sid)
+        replay_log.drop(request.sid)
+
         # Force cleanup of any remaining rooms for this client
         try:
             # Get all rooms for this client and leave them
@@ -146,9 +182,10 @@ def handle_disconnect_error(error):
         logging.error(f"Error handling disconnect error: {e}")
 
 @socketio.on('join')
+@throttled('join')
 def on_join(data):
     try:
-        from flask_login import current_user
+        identity = socket_user()
         
         # Handle different data types gracefully
         if isinstance(data, str):
@@ -167,35 +204,25 @@ def on_join(data):
             emit('error', {'message': 'Invalid join data'})
             return
 
-        # Validate room name format
-        if not isinstance(room, str) or len(room) > 100:
-            logging.error(f"Invalid room name format from {request.sid}: {room}")
-            emit('error', {'message': 'Invalid room name'})
-            return
-
-        # Check authentication for user-specific rooms
-        if room.startswith('user_') and not current_user.is_authenticated:
-            logging.warning(f"Unauthenticated user tried to join user room: {room}")
-            emit('error', {'message': 'Authentication required for user rooms'})
-            return
-
-        # Check authentication for chat rooms
-        if room.startswith('chat_') and not current_user.is_authenticated:
-            logging.warning(f"Unauthenticated user tried to join chat room: {room}")
-            emit('error', {'message': 'Authentication required for chat rooms'})
+        # Typed room names only (sub:, post:, chat:, user:, settings:), within the per-socket limits
+        error = room_registry.add(request.sid, room, identity)
+        if error:
+            logging.warning(f"Rejected join of room {room!r} from {request.sid}: {error}")
+            emit('error', {'message': error})
             return
 
         join_room(room)
+        presence.join(request.sid, room)
+        catch_up([room])
         # Get client IP address safely
         ip_address = get_client_ip(request.sid)
         
         # Log room join with user info
-        if current_user.is_authenticated:
-            logging.info(f"User {current_user.username} (ID: {current_user.id}) joined room {room} from IP: {ip_address}")
+        if identity.is_authenticated:
+            logging.info(f"User {identity.username} (ID: {identity.id}) joined room {room} from IP: {ip_address}")
         else:
             logging.info(f"Anonymous user joined room {room} from IP: {ip_address}")
         
-        emit('status', {'msg': f'User has entered the room {room}'}, room=room)
         emit('join_success', {'room': room})
         
     except Exception as e:
@@ -204,6 +231,7 @@ def on_join(data):
         # Don't re-raise the exception to prevent WSGI errors
 
 @socketio.on('leave')
+@throttled('leave')
 def on_leave(data):
     try:
         # Handle different data types gracefully
@@ -229,12 +257,13 @@ def on_leave(data):
             emit('error', {'message': 'Invalid room name'})
             return
 
+        room_registry.remove(request.sid, room)
+        presence.leave(request.sid, room)
         leave_room(room)
         # Get client IP address safely
         ip_address = get_client_ip(request.sid)
         # print(f"f🔥 YUUZONE DEBUG: User {request.sid} left room {room} from IP: {ip_address}")
         #logging.info(f"User left room {room} from IP: {ip_address}")
-        emit('status', {'msg': f'User has left the room {room}'}, room=room)
         emit('leave_success', {'room': room})
         # print(f"f🔥 YUUZONE DEBUG: Sent leave_success to {request.sid} for room {room}")
     except Exception as e:
@@ -242,9 +271,47 @@ def on_leave(data):
         emit('error', {'message': 'Failed to leave room'})
         # Don't re-raise the exception to prevent WSGI errors
 
+@socketio.on('view_feed')
+@throttled('view_feed')
+def on_view_feed(data):
+    """Register the feed (home, all, popular, or None) this socket is viewing; its post events arrive as *_global"""
+    try:
+        feed = data.get('feed') if isinstance(data, dict) else data
+        if feed is not None and feed not in FEEDS:
+            emit('error', {'message': 'Unknown feed'})
+            return
+
+        try:
+            joined, left = feed_registry.view(request.sid, feed, socket_user())
+        except ValueError as e:
+            emit('error', {'message': str(e)})
+            return
+        for subthread_id in left:
+            leave_room(feed_room(subthread_id))
+        for subthread_id in joined:
+            join_room(feed_room(subthread_id))
+        catch_up([feed_room(subthread_id) for subthread_id in joined])
+        emit('feed_registered', {'feed': feed})
+    except Exception as e:
+        logging.error(f"Error in on_view_feed: {e}")
+        emit('error', {'message': 'Failed to register feed'})
+
+@socketio.on('presence_heartbeat')
+@throttled('presence_heartbeat')
+def on_presence_heartbeat(data=None):
+    """Clients beat while their tab is visible; sockets that stop beating stop counting as present"""
+    try:
+        if presence.heartbeat(request.sid):
+            connection_manager.update_connection_activity(f"websocket_{request.sid}")
+    except Exception as e:
+        logging.error(f"Error in on_presence_heartbeat: {e}")
+
 @socketio.on('join_chat')
+@throttled('join_chat')
 def on_join_chat(data):
     try:
+        identity = socket_user()
+
         if not data or not isinstance(data, dict):
             logging.error("Invalid data received in on_join_chat")
             return
@@ -254,15 +321,26 @@ def on_join_chat(data):
             logging.error("No room specified in join_chat")
             return
 
+        if not room.startswith('chat:'):
+            emit('error', {'message': 'Not a chat room'})
+            return
+        error = room_registry.add(request.sid, room, identity)
+        if error:
+            logging.warning(f"Rejected join of chat room {room!r} from {request.sid}: {error}")
+            emit('error', {'message': error})
+            return
+
         join_room(room)
+        presence.join(request.sid, room)
+        catch_up([room])
         ip_address = get_client_ip(request.sid)
         #logging.info(f"User {request.sid} joined chat room {room} from IP: {ip_address}")
-        emit('status', {'msg': f'User joined chat room {room}'}, room=room)
     except Exception as e:
         logging.error(f"❌ Error in on_join_chat: {e}")
         # Don't re-raise the exception to prevent WSGI errors
 
 @socketio.on('leave_chat')
+@throttled('leave_chat')
 def on_leave_chat(data):
     try:
         if not data or not isinstance(data, dict):
@@ -274,15 +352,17 @@ def on_leave_chat(data):
             logging.error("No room specified in leave_chat")
             return
 
+        room_registry.remove(request.sid, room)
+        presence.leave(request.sid, room)
         leave_room(room)
         ip_address = get_client_ip(request.sid)
         #logging.info(f"User left chat room {room} from IP: {ip_address}")
-        emit('status', {'msg': f'User left chat room {room}'}, room=room)
     except Exception as e:
         logging.error(f"Error in on_leave_chat: {e}")
         # Don't re-raise the exception to prevent WSGI errors
 
 @socketio.on('new_message')
+@throttled('new_message')
 def on_new_message(data):
     try:
         if not data or not isinstance(data, dict):
@@ -314,6 +394,10 @@ def on_new_message(data):
             emit('error', {'message': 'Room name required'})
             return
 
+        if not in_chat_room(room):
+            emit('error', {'message': 'Join the chat room first'})
+            return
+
         # Allow empty message if media is present, but message must be a string
         if not isinstance(message, str):
             logging.error(f"Invalid message content type from {request.sid}: {type(message)}")
@@ -365,6 +449,7 @@ def on_new_message(data):
         # Don't re-raise the exception to prevent WSGI errors
 
 @socketio.on('typing')
+@throttled('typing')
 def on_typing(data):
     try:
         if not data or not isinstance(data, dict):
@@ -378,6 +463,9 @@ def on_typing(data):
             logging.error("Missing room or user in typing event")
             return
 
+        if not in_chat_room(room):
+            return
+
         # Broadcast typing indicator to the room (excluding sender)
         emit('user_typing', {
             'user': user,
@@ -390,6 +478,7 @@ def on_typing(data):
         # Don't re-raise the exception to prevent WSGI errors
 
 @socketio.on('stop_typing')
+@throttled('stop_typing')
 def on_stop_typing(data):
     try:
         if not data or not isinstance(data, dict):
@@ -403,6 +492,9 @@ def on_stop_typing(data):
             logging.error("Missing room or user in stop_typing event")
             return
 
+        if not in_chat_room(room):
+            return
+
         # Broadcast stop typing indicator to the room (excluding sender)
         emit('user_stop_typing', {
             'user': user,
@@ -414,6 +506,18 @@ def on_stop_typing(data):
         logging.error(f"Error in on_stop_typing: {e}")
         # Don't re-raise the exception to prevent WSGI errors
 
+def catch_up(rooms):
+    """Send a reconnected socket what it missed in rooms it just rejoined, or which of them to refetch"""
+    events, refetch = replay_log.catch_up(request.sid, rooms)
+    if events:
+        emit(BATCH_EVENT, {'events': events, 'replay': True})
+    if refetch:
+        emit('replay_refetch', {'rooms': refetch})
+
+def in_chat_room(room) -> bool:
+    """Client-relayed chat events only go to a chat room the sending socket has joined"""
+    return isinstance(room, str) and room.startswith('chat:') and room_registry.is_member(request.sid, room)
+
 def get_client_ip(sid):
     """Safely get client IP address from Socket.IO session"""
     try:
@@ -460,6 +564,7 @@ def get_client_ip(sid):
 
 # Message edit/delete handlers
 @socketio.on('edit_message')
+@throttled('edit_message')
 def handle_edit_message(data):
     """Handle message edit events"""
     try:
@@ -473,6 +578,9 @@ def handle_edit_message(data):
             logging.error("Missing required fields for message edit")
             return
 
+        if not in_chat_room(room):
+            return
+
         # Broadcast the edit to the chat room
         emit('message_edited', {
             'message_id': message_id,
@@ -488,6 +596,7 @@ def handle_edit_message(data):
 
 
 @socketio.on('delete_message')
+@throttled('delete_message')
 def handle_delete_message(data):
     """Handle message delete events"""
     try:
@@ -499,6 +608,9 @@ def handle_delete_message(data):
             logging.error("Missing required fields for message delete")
             return
 
+        if not in_chat_room(room):
+            return
+
         # Broadcast the deletion to the chat room
         emit('message_deleted', {
             'message_id': message_id,
@@ -516,6 +628,7 @@ def handle_delete_message(data):
 # ============================================================================
 
 @socketio.on('post_vote')
+@throttled('post_vote')
 def handle_post_vote(data):
     """Handle real-time post voting events"""
     try:
@@ -535,7 +648,7 @@ def handle_post_vote(data):
             'user_id': user_id,
             'is_upvote': is_upvote,
             'vote_type': vote_type
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         #logging.info(f"Post {post_id} vote {vote_type} by user {user_id} in subthread {subthread_id}")
 
@@ -543,6 +656,7 @@ def handle_post_vote(data):
         logging.error(f"Error handling post vote: {e}")
 
 @socketio.on('comment_vote')
+@throttled('comment_vote')
 def handle_comment_vote(data):
     """Handle real-time comment voting events"""
     try:
@@ -563,7 +677,7 @@ def handle_comment_vote(data):
             'user_id': user_id,
             'is_upvote': is_upvote,
             'vote_type': vote_type
-        }, room=f'{post_id}')
+        }, room=post_room(post_id))
 
         #logging.info(f"Comment {comment_id} vote {vote_type} by user {user_id} in post {post_id}")
 
@@ -571,6 +685,7 @@ def handle_comment_vote(data):
         logging.error(f"Error handling comment vote: {e}")
 
 @socketio.on('post_delete')
+@throttled('post_delete')
 def handle_post_delete(data):
     """Handle real-time post deletion events"""
     try:
@@ -586,7 +701,7 @@ def handle_post_delete(data):
         emit('post_deleted', {
             'post_id': post_id,
             'deleted_by': deleted_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         #logging.info(f"Post {post_id} deleted by {deleted_by} in subthread {subthread_id}")
 
@@ -594,6 +709,7 @@ def handle_post_delete(data):
         logging.error(f"Error handling post delete: {e}")
 
 @socketio.on('comment_delete')
+@throttled('comment_delete')
 def handle_comment_delete(data):
     """Handle real-time comment deletion events"""
     try:
@@ -609,7 +725,7 @@ def handle_comment_delete(data):
         emit('comment_deleted', {
             'comment_id': comment_id,
             'deleted_by': deleted_by
-        }, room=f'{post_id}')
+        }, room=post_room(post_id))
 
         #logging.info(f"Comment {comment_id} deleted by {deleted_by} in post {post_id}")
 
@@ -617,6 +733,7 @@ def handle_comment_delete(data):
         logging.error(f"Error handling comment delete: {e}")
 
 @socketio.on('comment_edit')
+@throttled('comment_edit')
 def handle_comment_edit(data):
     """Handle real-time comment edit events"""
     try:
@@ -636,7 +753,7 @@ def handle_comment_edit(data):
             'content': content,
             'edited_by': edited_by,
             'edited_at': edited_at
-        }, room=f'{post_id}')
+        }, room=post_room(post_id))
 
         #logging.info(f"Comment {comment_id} edited by {edited_by} in post {post_id}")
 
@@ -649,6 +766,7 @@ def handle_comment_edit(data):
 # ============================================================================
 
 @socketio.on('user_banned')
+@throttled('user_banned')
 def handle_user_banned(data):
     """Handle real-time user ban events"""
     try:
@@ -666,14 +784,14 @@ def handle_user_banned(data):
             'username': username,
             'banned_by': banned_by,
             'reason': reason
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         # Also emit to the banned user's personal room
         emit('you_were_banned', {
             'subthread_id': subthread_id,
             'banned_by': banned_by,
             'reason': reason
-        }, room=f'user_{username}')
+        }, room=user_room(username))
 
         #logging.info(f"User {username} banned from subthread {subthread_id} by {banned_by}")
 
@@ -681,6 +799,7 @@ def handle_user_banned(data):
         logging.error(f"Error handling user ban: {e}")
 
 @socketio.on('user_unbanned')
+@throttled('user_unbanned')
 def handle_user_unbanned(data):
     """Handle real-time user unban events"""
     try:
@@ -696,13 +815,13 @@ def handle_user_unbanned(data):
         emit('user_unbanned', {
             'username': username,
             'unbanned_by': unbanned_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         # Also emit to the unbanned user's personal room
         emit('you_were_unbanned', {
             'subthread_id': subthread_id,
             'unbanned_by': unbanned_by
-        }, room=f'user_{username}')
+        }, room=user_room(username))
 
         #logging.info(f"User {username} unbanned from subthread {subthread_id} by {unbanned_by}")
 
@@ -710,6 +829,7 @@ def handle_user_unbanned(data):
         logging.error(f"Error handling user unban: {e}")
 
 @socketio.on('mod_removed')
+@throttled('mod_removed')
 def handle_mod_removed(data):
     """Handle real-time mod removal events"""
     try:
@@ -725,14 +845,14 @@ def handle_mod_removed(data):
         emit('mod_removed', {
             'username': username,
             'removed_by': removed_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         # Also emit to the removed mod's personal room
         emit('you_were_demoted', {
             'subthread_id': subthread_id,
             'removed_by': removed_by,
             'role': 'mod'
-        }, room=f'user_{username}')
+        }, room=user_room(username))
 
         #logging.info(f"Mod {username} removed from subthread {subthread_id} by {removed_by}")
 
@@ -740,6 +860,7 @@ def handle_mod_removed(data):
         logging.error(f"Error handling mod removal: {e}")
 
 @socketio.on('admin_transferred')
+@throttled('admin_transferred')
 def handle_admin_transferred(data):
     """Handle real-time admin transfer events"""
     try:
@@ -755,18 +876,18 @@ def handle_admin_transferred(data):
         emit('admin_transferred', {
             'old_admin': old_admin,
             'new_admin': new_admin
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         # Emit to both users' personal rooms
         emit('you_lost_admin', {
             'subthread_id': subthread_id,
             'new_admin': new_admin
-        }, room=f'user_{old_admin}')
+        }, room=user_room(old_admin))
 
         emit('you_became_admin', {
             'subthread_id': subthread_id,
             'old_admin': old_admin
-        }, room=f'user_{new_admin}')
+        }, room=user_room(new_admin))
 
         #logging.info(f"Admin transferred from {old_admin} to {new_admin} in subthread {subthread_id}")
 
@@ -779,6 +900,7 @@ def handle_admin_transferred(data):
 # ============================================================================
 
 @socketio.on('profile_updated')
+@throttled('profile_updated')
 def handle_profile_updated(data):
     """Handle real-time profile update events"""
     try:
@@ -803,34 +925,12 @@ def handle_profile_updated(data):
     except Exception as e:
         logging.error(f"Error handling profile update: {e}")
 
-@socketio.on('user_status_changed')
-def handle_user_status_changed(data):
-    """Handle real-time user status changes (online/offline)"""
-    try:
-        username = data.get('username')
-        status = data.get('status')  # 'online', 'offline', 'away'
-
-        if not all([username, status]):
-            logging.error("Missing required fields for user status change")
-            return
-
-        # Broadcast status change to all relevant rooms
-        emit('user_status_changed', {
-            'username': username,
-            'status': status
-        }, broadcast=True)
-
-        #logging.info(f"User {username} status changed to {status}")
-
-    except Exception as e:
-        logging.error(f"Error handling user status change: {e}")
-
-
 # ============================================================================
 # SUBTHREAD REAL-TIME EVENTS
 # ============================================================================
 
 @socketio.on('subthread_created')
+@throttled('subthread_created')
 def handle_subthread_created(data):
     """Handle real-time subthread creation events"""
     try:
@@ -857,6 +957,7 @@ def handle_subthread_created(data):
         logging.error(f"Error handling subthread creation: {e}")
 
 @socketio.on('subthread_updated')
+@throttled('subthread_updated')
 def handle_subthread_updated(data):
     """Handle real-time subthread update events"""
     try:
@@ -872,7 +973,7 @@ def handle_subthread_updated(data):
         emit('subthread_updated', {
             'updated_fields': updated_fields,
             'updated_by': updated_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         #logging.info(f"Subthread {subthread_id} updated by {updated_by}")
 
@@ -885,6 +986,7 @@ def handle_subthread_updated(data):
 # ============================================================================
 
 @socketio.on('notification')
+@throttled('notification')
 def handle_notification(data):
     """Handle real-time notification events"""
     try:
@@ -907,7 +1009,7 @@ def handle_notification(data):
             'action_url': action_url,
             'sender': sender,
             'timestamp': data.get('timestamp')
-        }, room=f'user_{recipient_username}')
+        }, room=user_room(recipient_username))
 
         #logging.info(f"Notification sent to {recipient_username}: {notification_type}")
 
@@ -919,6 +1021,7 @@ def handle_notification(data):
 # ============================================================================
 
 @socketio.on('post_edit')
+@throttled('post_edit')
 def handle_post_edit(data):
     """Handle real-time post edit events"""
     try:
@@ -942,7 +1045,7 @@ def handle_post_edit(data):
             'new_title': new_title,
             'new_content': new_content,
             'new_media': new_media
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         #logging.info(f"Post {post_id} edited by {edited_by} in subthread {subthread_id}")
 
@@ -950,6 +1053,7 @@ def handle_post_edit(data):
         logging.error(f"Error handling post edit: {e}")
 
 @socketio.on('subthread_stats_update')
+@throttled('subthread_stats_update')
 def handle_subthread_stats_update(data):
     """Handle real-time subthread statistics updates"""
     try:
@@ -967,7 +1071,7 @@ def handle_subthread_stats_update(data):
             'stats_type': stats_type,
             'new_value': new_value,
             'updated_by': updated_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         #logging.info(f"Subthread {subthread_id} stats updated: {stats_type} = {new_value}")
 
@@ -975,6 +1079,7 @@ def handle_subthread_stats_update(data):
         logging.error(f"Error handling subthread stats update: {e}")
 
 @socketio.on('user_activity')
+@throttled('user_activity')
 def handle_user_activity(data):
     """Handle real-time user activity tracking"""
     try:
@@ -994,45 +1099,22 @@ def handle_user_activity(data):
             'timestamp': data.get('timestamp')
         }
 
-        if subthread_id:
-            emit('user_activity', activity_data, room=f'{subthread_id}')
-        
-        if post_id:
-            emit('user_activity', activity_data, room=f'{post_id}')
+        # One emit to both rooms: encoded once, and sockets in both get one copy
+        rooms = ([sub_room(subthread_id)] if subthread_id else []) + ([post_room(post_id)] if post_id else [])
+        if rooms:
+            emit('user_activity', activity_data, to=rooms)
 
         #logging.info(f"User {username} activity: {activity_type}")
 
     except Exception as e:
         logging.error(f"Error handling user activity: {e}")
 
-@socketio.on('live_user_count')
-def handle_live_user_count(data):
-    """Handle real-time live user count updates"""
-    try:
-        subthread_id = data.get('subthread_id')
-        user_count = data.get('user_count')
-        active_users = data.get('active_users', [])
-
-        if not all([subthread_id, user_count]):
-            logging.error("Missing required fields for live user count")
-            return
-
-        # Broadcast live user count to subthread room
-        emit('live_user_count_updated', {
-            'user_count': user_count,
-            'active_users': active_users
-        }, room=f'{subthread_id}')
-
-        #logging.info(f"Live user count updated for subthread {subthread_id}: {user_count}")
-
-    except Exception as e:
-        logging.error(f"Error handling live user count: {e}")
-
 # ============================================================================
 # ENHANCED NOTIFICATION AND INTERACTION EVENTS
 # ============================================================================
 
 @socketio.on('subthread_joined')
+@throttled('subthread_joined')
 def handle_subthread_joined(data):
     """Handle real-time subthread join events for sidebar updates"""
     try:
@@ -1057,6 +1139,7 @@ def handle_subthread_joined(data):
         logging.error(f"Error handling subthread_joined event: {e}")
 
 @socketio.on('subthread_left')
+@throttled('subthread_left')
 def handle_subthread_left(data):
     """Handle real-time subthread leave events for sidebar updates"""
     try:
@@ -1081,6 +1164,7 @@ def handle_subthread_left(data):
         logging.error(f"Error handling subthread_left event: {e}")
 
 @socketio.on('user_subscription_changed')
+@throttled('user_subscription_changed')
 def handle_user_subscription_changed(data):
     """Handle real-time user subscription changes for sidebar updates"""
     try:
@@ -1109,6 +1193,7 @@ def handle_user_subscription_changed(data):
         logging.error(f"Error handling user_subscription_changed event: {e}")
 
 @socketio.on('internal_subthread_update')
+@throttled('internal_subthread_update')
 def handle_internal_subthread_update(data):
     """Handle internal subthread updates from routes and broadcast to all clients"""
     try:
@@ -1168,7 +1253,7 @@ def handle_internal_subthread_update(data):
             emit('subthread_updated', {
                 'updated_fields': data.get('updated_fields'),
                 'updated_by': username
-            }, room=f'{subthread_id}')
+            }, room=sub_room(subthread_id))
             
         elif update_type == 'deleted':
             logging.info(f"📤 Broadcasting subthread_deleted event for subthread {subthread_id}")
@@ -1182,6 +1267,7 @@ def handle_internal_subthread_update(data):
         logging.error(f"❌ Error handling internal_subthread_update event: {e}")
 
 @socketio.on('mention')
+@throttled('mention')
 def handle_mention(data):
     """Handle real-time user mentions"""
     try:
@@ -1202,7 +1288,7 @@ def handle_mention(data):
             'comment_id': comment_id,
             'content': content,
             'timestamp': data.get('timestamp')
-        }, room=f'user_{mentioned_user}')
+        }, room=user_room(mentioned_user))
 
         #logging.info(f"User {mentioned_user} mentioned by {mentioned_by}")
 
@@ -1210,6 +1296,7 @@ def handle_mention(data):
         logging.error(f"Error handling mention: {e}")
 
 @socketio.on('post_shared')
+@throttled('post_shared')
 def handle_post_shared(data):
     """Handle real-time post sharing events"""
     try:
@@ -1227,7 +1314,7 @@ def handle_post_shared(data):
             'post_id': post_id,
             'shared_by': shared_by,
             'share_platform': share_platform
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         #logging.info(f"Post {post_id} shared by {shared_by} on {share_platform}")
 
@@ -1239,6 +1326,7 @@ def handle_post_shared(data):
 # ============================================================================
 
 @socketio.on('system_status')
+@throttled('system_status')
 def handle_system_status(data):
     """Handle real-time system status updates"""
     try:
@@ -1264,6 +1352,7 @@ def handle_system_status(data):
         logging.error(f"Error handling system status: {e}")
 
 @socketio.on('performance_metrics')
+@throttled('performance_metrics')
 def handle_performance_metrics(data):
     """Handle real-time performance metrics"""
     try:
@@ -1294,6 +1383,7 @@ def handle_performance_metrics(data):
 # ============================================================================
 
 @socketio.on('join_room')
+@throttled('join_room')
 def handle_join_room(data):
     """Handle joining specific rooms for settings updates"""
     try:
@@ -1314,13 +1404,16 @@ def handle_join_room(data):
             emit('error', {'message': 'Invalid join_room data'})
             return
 
-        # Validate room name format
-        if not isinstance(room, str) or len(room) > 100:
-            logging.error(f"Invalid room name format from {request.sid}: {room}")
-            emit('error', {'message': 'Invalid room name'})
+        identity = socket_user()
+        error = room_registry.add(request.sid, room, identity)
+        if error:
+            logging.warning(f"Rejected join of room {room!r} from {request.sid}: {error}")
+            emit('error', {'message': error})
             return
 
         join_room(room)
+        presence.join(request.sid, room)
+        catch_up([room])
         emit('room_joined', {'room': room})
         logging.info(f"Client {request.sid} joined room: {room}")
 
@@ -1329,6 +1422,7 @@ def handle_join_room(data):
         emit('error', {'message': 'Failed to join room'})
 
 @socketio.on('leave_room')
+@throttled('leave_room')
 def handle_leave_room(data):
     """Handle leaving specific rooms"""
     try:
@@ -1355,6 +1449,8 @@ def handle_leave_room(data):
             emit('error', {'message': 'Invalid room name'})
             return
 
+        room_registry.remove(request.sid, room)
+        presence.leave(request.sid, room)
         leave_room(room)
         emit('room_left', {'room': room})
         logging.info(f"Client {request.sid} left room: {room}")
@@ -1366,7 +1462,7 @@ def handle_leave_room(data):
 def emit_theme_updated(user_id, theme_data):
     """Emit theme update event to specific user"""
     try:
-        emit('theme_updated', theme_data, room=f'user_settings_{user_id}')
+        emit('theme_updated', theme_data, room=settings_room(user_id))
         logging.info(f"Theme updated for user {user_id}")
     except Exception as e:
         logging.error(f"Error emitting theme_updated: {e}")
@@ -1374,7 +1470,7 @@ def emit_theme_updated(user_id, theme_data):
 def emit_subscription_updated(user_id, subscription_data):
     """Emit subscription update event to specific user"""
     try:
-        emit('subscription_updated', subscription_data, room=f'user_settings_{user_id}')
+        emit('subscription_updated', subscription_data, room=settings_room(user_id))
         logging.info(f"Subscription updated for user {user_id}")
     except Exception as e:
         logging.error(f"Error emitting subscription_updated: {e}")
@@ -1382,7 +1478,7 @@ def emit_subscription_updated(user_id, subscription_data):
 def emit_custom_theme_updated(user_id, theme_data):
     """Emit custom theme update event to specific user"""
     try:
-        emit('custom_theme_updated', theme_data, room=f'user_settings_{user_id}')
+        emit('custom_theme_updated', theme_data, room=settings_room(user_id))
         logging.info(f"Custom theme updated for user {user_id}")
     except Exception as e:
         logging.error(f"Error emitting custom_theme_updated: {e}")
@@ -1390,7 +1486,7 @@ def emit_custom_theme_updated(user_id, theme_data):
 def emit_user_preference_updated(user_id, preference_data):
     """Emit user preference update event to specific user"""
     try:
-        emit('user_preference_updated', preference_data, room=f'user_settings_{user_id}')
+        emit('user_preference_updated', preference_data, room=settings_room(user_id))
         logging.info(f"User preference updated for user {user_id}")
     except Exception as e:
         logging.error(f"Error emitting user_preference_updated: {e}")
@@ -1398,7 +1494,7 @@ def emit_user_preference_updated(user_id, preference_data):
 def emit_translation_stats_updated(user_id, stats_data):
     """Emit translation stats update event to specific user"""
     try:
-        emit('translation_stats_updated', stats_data, room=f'user_settings_{user_id}')
+        emit('translation_stats_updated', stats_data, room=settings_room(user_id))
         logging.info(f"Translation stats updated for user {user_id}")
     except Exception as e:
         logging.error(f"Error emitting translation_stats_updated: {e}")
@@ -1,6 +1,7 @@
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask import request
 import logging
+from .utils.rooms import post_room, sub_room, user_room
 
 # Optimized Socket.IO configuration for better performance
 try:
@@ -300,7 +301,7 @@ def handle_post_vote(data):
             'user_id': user_id,
             'is_upvote': data.get('is_upvote'),
             'vote_type': data.get('vote_type')
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
     except Exception as e:
         logging.error(f"Error handling post vote: {e}")
 
@@ -320,7 +321,7 @@ def handle_comment_vote(data):
             'user_id': user_id,
             'is_upvote': data.get('is_upvote'),
             'vote_type': data.get('vote_type')
-        }, room=f'{post_id}')
+        }, room=post_room(post_id))
     except Exception as e:
         logging.error(f"Error handling comment vote: {e}")
 
@@ -337,7 +338,7 @@ def handle_post_delete(data):
         emit('post_deleted', {
             'post_id': post_id,
             'deleted_by': deleted_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
     except Exception as e:
         logging.error(f"Error handling post delete: {e}")
 
@@ -354,7 +355,7 @@ def handle_comment_delete(data):
         emit('comment_deleted', {
             'comment_id': comment_id,
             'deleted_by': deleted_by
-        }, room=f'{post_id}')
+        }, room=post_room(post_id))
     except Exception as e:
         logging.error(f"Error handling comment delete: {e}")
 
@@ -374,7 +375,7 @@ def handle_comment_edit(data):
             'content': content,
             'edited_by': edited_by,
             'edited_at': data.get('edited_at')
-        }, room=f'{post_id}')
+        }, room=post_room(post_id))
     except Exception as e:
         logging.error(f"Error handling comment edit: {e}")
 
@@ -393,13 +394,13 @@ def handle_user_banned(data):
             'username': username,
             'banned_by': banned_by,
             'reason': data.get('reason')
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         emit('you_were_banned', {
             'subthread_id': subthread_id,
             'banned_by': banned_by,
             'reason': data.get('reason')
-        }, room=f'user_{username}')
+        }, room=user_room(username))
     except Exception as e:
         logging.error(f"Error handling user ban: {e}")
 
@@ -416,12 +417,12 @@ def handle_user_unbanned(data):
         emit('user_unbanned', {
             'username': username,
             'unbanned_by': unbanned_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         emit('you_were_unbanned', {
             'subthread_id': subthread_id,
             'unbanned_by': unbanned_by
-        }, room=f'user_{username}')
+        }, room=user_room(username))
     except Exception as e:
         logging.error(f"Error handling user unban: {e}")
 
@@ -438,13 +439,13 @@ def handle_mod_removed(data):
         emit('mod_removed', {
             'username': username,
             'removed_by': removed_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         emit('you_were_demoted', {
             'subthread_id': subthread_id,
             'removed_by': removed_by,
             'role': 'mod'
-        }, room=f'user_{username}')
+        }, room=user_room(username))
     except Exception as e:
         logging.error(f"Error handling mod removal: {e}")
 
@@ -461,17 +462,17 @@ def handle_admin_transferred(data):
         emit('admin_transferred', {
             'old_admin': old_admin,
             'new_admin': new_admin
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
 
         emit('you_lost_admin', {
             'subthread_id': subthread_id,
             'new_admin': new_admin
-        }, room=f'user_{old_admin}')
+        }, room=user_room(old_admin))
 
         emit('you_became_admin', {
             'subthread_id': subthread_id,
             'old_admin': old_admin
-        }, room=f'user_{new_admin}')
+        }, room=user_room(new_admin))
     except Exception as e:
         logging.error(f"Error handling admin transfer: {e}")
 
@@ -540,7 +541,7 @@ def handle_subthread_updated(data):
         emit('subthread_updated', {
             'updated_fields': updated_fields,
             'updated_by': updated_by
-        }, room=f'{subthread_id}')
+        }, room=sub_room(subthread_id))
     except Exception as e:
         logging.error(f"Error handling subthread update: {e}")
 
@@ -680,7 +681,7 @@ def handle_internal_subthread_update(data):
             emit('subthread_updated', {
                 'updated_fields': data.get('updated_fields'),
                 'updated_by': username
-            }, room=f'{subthread_id}')
+            }, room=sub_room(subthread_id))
             
         elif update_type == 'deleted':
             logging.info(f"📤 Broadcasting subthread_deleted event for subthread {subthread_id}")
@@ -712,7 +713,7 @@ def handle_notification(data):
             'action_url': data.get('action_url'),
             'sender': data.get('sender'),
             'timestamp': data.get('timestamp')
-        }, room=f'user_{recipient_username}')
+        }, room=user_room(recipient_username))
     except Exception as e:
         logging.error(f"Error handling notification: {e}")
 
@@ -732,7 +733,7 @@ def handle_coin_update(data):
             'new_balance': new_balance,
             'transaction_type': transaction_type,
             'amount': amount
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling coin update: {e}")
 
@@ -751,7 +752,7 @@ def handle_coin_purchase_complete(data):
             'new_balance': new_balance,
             'package_name': package_name,
             'coin_amount': coin_amount
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling coin purchase: {e}")
 
@@ -770,7 +771,7 @@ def handle_avatar_purchased(data):
             'new_balance': new_balance,
             'avatar_name': avatar_name,
             'cost': cost
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling avatar purchase: {e}")
 
@@ -791,7 +792,7 @@ def handle_post_boosted(data):
             'new_balance': new_balance,
             'post_title': post_title,
             'cost': cost
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling post boost: {e}")
 
@@ -814,7 +815,7 @@ def handle_tip_transaction(data):
             'tip_amount': tip_amount,
             'recipient_username': recipient_username,
             'is_sender': True
-        }, room=f'user_{sender_id}')
+        }, room=user_room(sender_id))
 
         # Emit to recipient's room
         emit('tip_transaction', {
@@ -822,7 +823,7 @@ def handle_tip_transaction(data):
             'tip_amount': tip_amount,
             'recipient_username': recipient_username,
             'is_sender': False
-        }, room=f'user_{recipient_id}')
+        }, room=user_room(recipient_id))
     except Exception as e:
         logging.error(f"Error handling tip transaction: {e}")
 
@@ -841,7 +842,7 @@ def handle_new_purchase(data):
         emit('new_purchase', {
             'purchase_type': purchase_type,
             'purchase_data': purchase_data
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling new purchase: {e}")
 
@@ -861,7 +862,7 @@ def handle_purchase_status_updated(data):
             'purchase_id': purchase_id,
             'purchase_type': purchase_type,
             'new_status': new_status
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling purchase status update: {e}")
 
@@ -885,7 +886,7 @@ def handle_payment_completed(data):
             'amount': amount,
             'new_balance': new_balance,
             'tier_name': tier_name
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
         
         logging.info(f"Payment completion event emitted for user {user_id}: {payment_type} payment {payment_reference}")
     except Exception as e:
@@ -911,7 +912,7 @@ def handle_subscription_purchased(data):
             'amount': amount,
             'currency': currency or 'VND',
             'payment_status': payment_status or 'pending'
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling subscription purchase: {e}")
 
@@ -931,6 +932,6 @@ def handle_tier_purchased(data):
             'tier_name': tier_name,
             'tier_slug': tier_slug,
             'cost': cost
-        }, room=f'user_{user_id}')
+        }, room=user_room(user_id))
     except Exception as e:
         logging.error(f"Error handling tier purchase: {e}") 
\ No newline at end of file
@@ -7,6 +7,7 @@ from yuuzone import db, socketio
 import logging
 from datetime import datetime
 import os
+from yuuzone.utils.rooms import settings_room, user_room
 
 subscription = Blueprint('subscription', __name__)
 subscription_service = SubscriptionService()
@@ -380,7 +381,7 @@ def create_custom_theme():
             'theme_id': new_theme.id,
             'action': 'created',
             'theme_data': theme_data
-        }, room=f'user_settings_{current_user.id}')
+        }, room=settings_room(current_user.id))
         
         return jsonify({
             "message": "Theme created successfully",
@@ -433,7 +434,7 @@ def update_custom_theme(theme_id):
             'theme_id': theme.id,
             'action': 'updated',
             'theme_data': theme_data
-        }, room=f'user_settings_{current_user.id}')
+        }, room=settings_room(current_user.id))
         
         return jsonify({
             "message": "Theme updated successfully",
@@ -466,7 +467,7 @@ def delete_custom_theme(theme_id):
         socketio.emit('custom_theme_updated', {
             'theme_id': theme_id,
             'action': 'deleted'
-        }, room=f'user_settings_{current_user.id}')
+        }, room=settings_room(current_user.id))
         
         return jsonify({"message": "Theme deleted successfully"}), 200
         
@@ -501,7 +502,7 @@ def activate_custom_theme(theme_id):
             'theme_id': theme.id,
             'action': 'activated',
             'theme_data': theme_data
-        }, room=f'user_settings_{current_user.id}')
+        }, room=settings_room(current_user.id))
         
         return jsonify({
             "message": "Theme activated successfully",
@@ -524,7 +525,7 @@ def deactivate_custom_theme():
         # Emit real-time event for theme deactivation
         socketio.emit('custom_theme_updated', {
             'action': 'deactivated'
-        }, room=f'user_settings_{current_user.id}')
+        }, room=settings_room(current_user.id))
         
         return jsonify({"message": "All themes deactivated successfully"}), 200
     except Exception as e:
@@ -698,7 +699,7 @@ def test_payment_completion():
                     'amount': amount,
                     'tier_name': 'Test Tier' if payment_type == 'subscription' else None,
                     'new_balance': 1000  # Test balance
-                }, room=f'user_{current_user.id}')
+                }, room=user_room(current_user.id))
                 
                 return jsonify({
                     "success": True,
@@ -10,6 +10,7 @@ import string
 import traceback
 import json
 import re
+from yuuzone.utils.rooms import user_room
 
 class SubscriptionService:
     def __init__(self):
@@ -263,7 +264,7 @@ class SubscriptionService:
                         'amount': float(payment.amount) if payment.amount else 0,
                         'currency': payment.currency or 'VND',
                         'payment_status': payment.payment_status
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
                     
                     # Emit purchase history event
                     socketio.emit('new_purchase', {
@@ -282,7 +283,7 @@ class SubscriptionService:
                             'paid_at': payment.paid_at.isoformat() if payment.paid_at else None,
                             'description': f"Subscription to {tier.name}"
                         }
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
             except Exception as e:
                 logging.error(f"Error emitting subscription purchase event: {e}")
             
@@ -445,7 +446,7 @@ class SubscriptionService:
                                 logging.info(f"🔍 DEBUG: Event data: {event_data}")
                                 
                                 # Emit only ONE event to specific user room to prevent spam
-                                socketio.emit('payment_completed', event_data, room=f'user_{payment.user_id}')
+                                socketio.emit('payment_completed', event_data, room=user_room(payment.user_id))
                                 logging.info(f"✅ DEBUG: Payment completion event emitted to room user_{payment.user_id}")
                                 
                             else:
@@ -466,7 +467,7 @@ class SubscriptionService:
                                         'tier_slug': payment.tier.slug,
                                         'user_subscription_types': user_subscription_types
                                     }
-                                    alt_socketio.emit('payment_completed', event_data, room=f'user_{payment.user_id}')
+                                    alt_socketio.emit('payment_completed', event_data, room=user_room(payment.user_id))
                                     logging.info(f"✅ DEBUG: Alternative payment completion event emitted for user {payment.user_id}")
                             except Exception as alt_socket_error:
                                 logging.error(f"❌ DEBUG: Alternative socket emission also failed: {alt_socket_error}")
@@ -486,7 +487,7 @@ class SubscriptionService:
                                 'user_subscription_types': user_subscription_types
                             }
                             # Only emit to user room, not globally to prevent spam
-                            socketio.emit('payment_completed', event_data, room=f'user_{payment.user_id}')
+                            socketio.emit('payment_completed', event_data, room=user_room(payment.user_id))
                             logging.info(f"✅ DEBUG: Payment completion event emitted to user room only")
                     except Exception as global_socket_error:
                         logging.error(f"❌ DEBUG: Error emitting global payment completion event: {global_socket_error}")
@@ -1160,7 +1161,7 @@ class SubscriptionService:
                             logging.info(f"🔍 DEBUG: Event data: {event_data}")
                             
                             # Emit to specific user room
-                            socketio.emit('payment_completed', event_data, room=f'user_{payment.user_id}')
+                            socketio.emit('payment_completed', event_data, room=user_room(payment.user_id))
                             logging.info(f"✅ DEBUG: Payment completion event emitted to room user_{payment.user_id}")
                             
                         else:
@@ -1178,7 +1179,7 @@ class SubscriptionService:
                                     'payment_type': 'coin',
                                     'amount': payment.coin_amount,
                                     'new_balance': coin_service.get_wallet_balance(payment.user_id)
-                                }, room=f'user_{payment.user_id}')
+                                }, room=user_room(payment.user_id))
                                 logging.info(f"✅ DEBUG: Alternative payment completion event emitted for user {payment.user_id}")
                         except Exception as alt_socket_error:
                             logging.error(f"❌ DEBUG: Alternative socket emission also failed: {alt_socket_error}")
@@ -1262,7 +1263,7 @@ class SubscriptionService:
                         'amount': coin_cost,
                         'currency': 'coins',
                         'payment_status': 'completed'
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
                     
                     # Emit purchase history event
                     socketio.emit('new_purchase', {
@@ -1280,7 +1281,7 @@ class SubscriptionService:
                             'created_at': subscription.created_at.isoformat() if subscription.created_at else None,
                             'description': f"Subscription to {tier.name} (purchased with coins)"
                         }
-                    }, room=f'user_{user_id}')
+                    }, room=user_room(user_id))
             except Exception as e:
                 logging.error(f"Error emitting subscription purchase event: {e}")
             
@@ -86,6 +86,7 @@ class Subthread(db.Model):
         if form_data.get("description"):
             self.description = form_data.get("description")
         db.session.commit()
+        self.schedule_default_logo()
         # Note: SubthreadInfo is a view that automatically updates, no manual sync needed
 
     def handle_logo(self, content_type, image=None, url=None):
@@ -137,197 +138,18 @@ class Subthread(db.Model):
                     # Don't raise the exception, just set logo to None and continue
                     self.logo = None
         else:
-            try:
-                # Generate default logo with pixel art background and first 3 letters
-                self.delete_logo()
-                img_size = (720, 720)
-
-                # Generate a random base color with good saturation
-                import colorsys
-                base_hue = random.randint(0, 360)  # Random hue (0-360)
-                base_saturation = random.randint(70, 100)  # High saturation (70-100%)
-                base_value = random.randint(60, 90)  # Medium-high value (60-90%)
-
-                #logging.info(f"Base color for {self.name}: Hue={base_hue}°, Saturation={base_saturation}%, Value={base_value}%")
-
-                # Create base background color (darker version of the main color)
-                bg_r, bg_g, bg_b = colorsys.hsv_to_rgb(base_hue/360, base_saturation/100, max(20, base_value-40)/100)
-                background_color = (int(bg_r*255), int(bg_g*255), int(bg_b*255))
-
-                # Create image with tonal background instead of black
-                img = Image.new("RGB", img_size, background_color)
-                draw = ImageDraw.Draw(img)
-
-                # Generate pixel art background
-                pixel_size = 24  # Size of each pixel block (30x30 grid)
-
-                # Create pixelated background with tonal variations
-                for y in range(0, img_size[1], pixel_size):
-                    for x in range(0, img_size[0], pixel_size):
-                        # Always draw a pixel (100% coverage, no black gaps)
-                        # Vary only the saturation and value within the same hue tone
-                        # Keep hue the same for tonal consistency
-                        pixel_hue = base_hue  # Same hue for all pixels
-
-                        # Vary saturation within ±25% of base saturation
-                        saturation_variation = 25
-                        pixel_saturation = max(30, min(100, base_saturation + random.randint(-saturation_variation, saturation_variation)))
-
-                        # Vary value (brightness) within ±30% of base value
-                        value_variation = 30
-                        pixel_value = max(25, min(95, base_value + random.randint(-value_variation, value_variation)))
-
-                        # Convert HSV to RGB for this pixel
-                        r, g, b = colorsys.hsv_to_rgb(pixel_hue/360, pixel_saturation/100, pixel_value/100)
-                        pixel_color = (int(r*255), int(g*255), int(b*255))
-
-                        # Draw the pixel block
-                        draw.rectangle([x, y, x + pixel_size - 1, y + pixel_size - 1], fill=pixel_color)
-
-                # Use a random truetype font from 5 main font types (including pixel fonts)
-                font_types = [
-                    # Type 1: Arial (Sans-serif, clean)
-                    [("arial.ttf", "Arial"), ("C:/Windows/Fonts/arial.ttf", "Arial"),
-                     ("/System/Library/Fonts/Arial.ttf", "Arial"), ("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", "Liberation Sans")],
-
-                    # Type 2: Arial Bold (Sans-serif, bold)
-                    [("arialbd.ttf", "Arial Bold"), ("C:/Windows/Fonts/arialbd.ttf", "Arial Bold"),
-                     ("/Library/Fonts/Arial Bold.ttf", "Arial Bold"), ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", "DejaVu Sans Bold")],
-
-                    # Type 3: Times (Serif, classic)
-                    [("times.ttf", "Times New Roman"), ("C:/Windows/Fonts/times.ttf", "Times New Roman"),
-                     ("/System/Library/Fonts/Times.ttc", "Times"), ("/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf", "Liberation Serif")],
-
-                    # Type 4: Calibri (Modern sans-serif)
-                    [("calibri.ttf", "Calibri"), ("C:/Windows/Fonts/calibri.ttf", "Calibri"),
-                     ("/System/Library/Fonts/Helvetica.ttc", "Helvetica"), ("/usr/share/fonts/truetype/ubuntu/Ubuntu-R.ttf", "Ubuntu")],
-
-                    # Type 5: Bold serif
-                    [("timesbd.ttf", "Times Bold"), ("C:/Windows/Fonts/timesbd.ttf", "Times Bold"),
-                     ("/usr/share/fonts/truetype/liberation/LiberationSerif-Bold.ttf", "Liberation Serif Bold"), ("/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf", "DejaVu Serif Bold")]
-                ]
-
-                # Randomly select one of the 5 font types
-                selected_font_type = random.choice(font_types)
-
-                # Shuffle the options within the selected type
-                random.shuffle(selected_font_type)
-
-                font = None
-                font_name = "Default"
-
-                # Calculate font size to make text 88% of logo size
-                target_size = int(img_size[0] * 0.88)  # 88% of 720 = 633 pixels
-
-                # Try to load fonts from the selected type in random order
-                for font_path, name in selected_font_type:
-                    try:
-                        font = ImageFont.truetype(font_path, 500)  # Start with very large font
-                        font_name = name
-                        #logging.info(f"Using font '{name}' for subthread {self.name}")
-                        break
-                    except (IOError, OSError):
-                        continue
-
-                # Fallback to default font if none found
-                if font is None:
-                    font = ImageFont.load_default()
-                    font_name = "Default"
-                    #logging.info(f"Using default font for subthread {self.name}")
-
-                text = (self.name[2:5].upper() if len(self.name) > 4 else self.name[2:].upper()) or "SUB"
-
-                # Dynamically adjust font size to make text 88% of logo size
-                if font and hasattr(font, 'path'):
-                    #logging.info(f"Adjusting font size to make text 88% of logo size for {self.name}...")
-
-                    # Binary search for optimal font size
-                    min_size = 50
-                    max_size = 800
-                    optimal_size = 500
-
-                    for _ in range(15):  # Max 15 iterations
-                        try:
-                            test_font = ImageFont.truetype(font.path, optimal_size)
-
-                            # Get text dimensions
-                            try:
-                                bbox = draw.textbbox((0, 0), text, font=test_font)
-                                text_width = bbox[2] - bbox[0]
-                                text_height = bbox[3] - bbox[1]
-                            except AttributeError:
-                                text_width, text_height = draw.textsize(text, font=test_font)
-
-                            # Check if text size is close to 88% of logo
-                            max_dimension = max(text_width, text_height)
-
-                            if abs(max_dimension - target_size) < 15:  # Close enough
-                                font = test_font
-                                #logging.info(f"Optimal font size found: {optimal_size}px (text size: {max_dimension}px) for {self.name}")
-                                break
-                            elif max_dimension < target_size:
-                                min_size = optimal_size
-                            else:
-                                max_size = optimal_size
-
-                            optimal_size = (min_size + max_size) // 2
-
-                        except (IOError, OSError):
-                            break
-                # Use textbbox for newer Pillow versions (10.0.0+), fallback to textsize for older versions
-                try:
-                    bbox = draw.textbbox((0, 0), text, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
-                except AttributeError:
-                    # Fallback for older Pillow versions that still have textsize
-                    try:
-                        text_width, text_height = draw.textsize(text, font=font)
-                    except AttributeError:
-                        # Ultimate fallback if neither method exists - estimate text size
-                        logging.warning(f"Neither textbbox nor textsize available, using estimated text size for {self.name}")
-                        # Rough estimation for massive font: assume each character is about 300 pixels wide and 500 pixels tall
-                        text_width = len(text) * 300
-                        text_height = 500
-                text_x = (img_size[0] - text_width) / 2
-                text_y = (img_size[1] - text_height) / 2
-
-                # Draw text with black outline for better visibility on pixel background
-                # Much larger outline proportional to massive text size
-                outline_offset = max(20, int(max(text_width, text_height) * 0.03))  # 3% of text size
-                #logging.info(f"Using outline offset: {outline_offset}px for text size: {max(text_width, text_height)}px on {self.name}")
-
-                for offset_x, offset_y in [(0, outline_offset), (outline_offset, 0),
-                                          (0, -outline_offset), (-outline_offset, 0),
-                                          (outline_offset, outline_offset), (-outline_offset, -outline_offset),
-                                          (outline_offset, -outline_offset), (-outline_offset, outline_offset)]:
-                    draw.text((text_x + offset_x, text_y + offset_y), text, font=font, fill=(0, 0, 0))
-
-                # Draw main text with white color
-                draw.text((text_x, text_y), text, font=font, fill=(255, 255, 255))
-
-                # Save image to bytes buffer
-                buffer = io.BytesIO()
-                img.save(buffer, format="PNG")
-                buffer.seek(0)
-
-                # Upload to Cloudinary
-                image_data = uploader.upload(buffer, public_id=f"default_logo_{uuid.uuid4().hex}", resource_type="image")
-                if not image_data or not image_data.get('public_id'):
-                    raise ValueError("Cloudinary upload failed: no public_id returned")
-                url = f"https://res.cloudinary.com/{app.config['CLOUDINARY_NAME']}/image/upload/f_auto,q_auto/{image_data.get('public_id')}"
-                self.logo = url
-            except Exception as e:
-                error_str = str(e).lower()
-                if "nameresolutionerror" in error_str or "lookup timed out" in error_str or "api.cloudinary.com" in error_str:
-                    logging.error(f"Error generating or uploading default logo for subthread {self.name}: Cloudinary connection failed - {e}")
-                    #logging.info(f"Setting fallback logo URL for subthread {self.name}")
-                    # Use a fallback logo URL or generate a simple data URL
-                    self.logo = self._generate_fallback_logo()
-                else:
-                    logging.error(f"Error generating or uploading default logo for subthread {self.name}: Unexpected error - {e}")
-                    # Don't raise the exception, just set logo to None and continue
-                    self.logo = None
+            # Default logo: keep a lightweight placeholder until the logo engine has rendered
+            # and uploaded the pixel-art logo (see schedule_default_logo)
+            self.delete_logo()
+            self.logo = self._generate_fallback_logo()
+            self._needs_default_logo = True
+
+    def schedule_default_logo(self):
+        """Queue default logo generation; must be called after the subthread has been committed"""
+        if getattr(self, "_needs_default_logo", False) and self.id:
+            from yuuzone.utils.logo_engine import logo_engine
+            logo_engine.enqueue(self.id, self.name)
+            self._needs_default_logo = False
 
     def _generate_fallback_logo(self):
         """Generate a simple fallback logo when Cloudinary is unavailable"""
@@ -450,12 +272,10 @@ class Subthread(db.Model):
 
         if cur_user_id:
             try:
-                from yuuzone.subthreads.models import Subscription, SubthreadBan
-                data["has_subscribed"] = bool(
-                    Subscription.query.filter_by(user_id=cur_user_id, subthread_id=self.id).first()
-                )
-                banned = SubthreadBan.query.filter_by(user_id=cur_user_id, subthread_id=self.id).first()
-                data["is_banned"] = bool(banned)
+                from yuuzone.subthreads.service import access_cache
+                access = access_cache.get(cur_user_id)
+                data["has_subscribed"] = access.is_member(self.id)
+                data["is_banned"] = access.is_banned(self.id)
             except Exception as e:
                 logging.error(f"Error checking subscription or ban status in Subthread.as_dict: {e}")
 
@@ -1,6 +1,7 @@
 import logging
 import time
 from yuuzone.subthreads.models import Subthread, SubthreadInfo, Subscription
+from yuuzone.subthreads.service import subthread_header_cache, access_cache
 # Socket.IO will be handled in WSGI - use try/except for graceful fallback
 try:
     from yuuzone.socketio_app import socketio
@@ -13,9 +14,12 @@ from flask import Blueprint, jsonify, request
 from yuuzone.models import UserRole
 from yuuzone import db
 from yuuzone.auth.decorators import auth_role
+from yuuzone.auth.permissions import permission_index
 
 # Import rate limiting utilities
 from yuuzone.utils.rate_limiter import rate_limit, combined_protection
+from yuuzone.utils.emit_scheduler import emit_scheduler
+from yuuzone.utils.rooms import sub_room, user_room
 
 threads = Blueprint("threads", __name__, url_prefix="/api")
 thread_name_regex = re.compile(r"^\w{3,}$")
@@ -39,14 +43,13 @@ def create_ban_response(subthread_id):
 @login_required
 @rate_limit("join_subthread")
 def new_subscription(tid):
+    access = access_cache.get(current_user.id)
     # Check if user is banned from this subthread
-    banned = check_user_banned(current_user.id, tid)
-    if banned:
+    if access.is_banned(tid):
         return create_ban_response(tid)
 
     # Check if user already subscribed to avoid duplicate key error
-    existing_sub = Subscription.query.filter_by(user_id=current_user.id, subthread_id=tid).first()
-    if existing_sub:
+    if access.is_member(tid):
         return jsonify({"message": "Already subscribed"}), 200
 
     Subscription.add(tid, current_user.id)
@@ -58,6 +61,7 @@ def new_subscription(tid):
         db.session.rollback()
         logging.error(f"Failed to save subscription: {e}")
         return jsonify({"message": "Failed to join subthread. Please try again."}), 500
+    subthread_header_cache.invalidate(tid)
 
     # Emit socket event for join (if Socket.IO available)
     if socketio:
@@ -72,19 +76,19 @@ def new_subscription(tid):
             })
             
             # Emit enhanced real-time events
-            socketio.emit('subthread_stats_update', {
+            emit_scheduler.emit('subthread_stats_update', {
                 'subthread_id': tid,
                 'stats_type': 'subscriber_count',
                 'new_value': 1,  # Increment by 1
                 'updated_by': current_user.username
-            }, room=f'{tid}')
+            }, room=sub_room(tid))
             
-            socketio.emit('user_activity', {
+            emit_scheduler.emit('user_activity', {
                 'username': current_user.username,
                 'activity_type': 'joining',
                 'subthread_id': tid,
                 'timestamp': None
-            }, room=f'{tid}')
+            }, room=sub_room(tid))
             
         except Exception as e:
             logging.error(f"Failed to emit internal_subthread_update event: {e}")
@@ -124,6 +128,7 @@ def del_subscription(tid):
     # Remove subscription
     db.session.delete(subscription)
     db.session.commit()
+    subthread_header_cache.invalidate(tid)
 
     # Emit socket event for leave (if Socket.IO available)
     if socketio:
@@ -481,169 +486,34 @@ def get_all_thread():
 
 @threads.route("/threads/<thread_name>")
 def get_thread_by_name(thread_name):
-    thread_info = SubthreadInfo.query.filter_by(name=f"t/{thread_name}").first()
-    subthread = Subthread.query.filter_by(name=f"t/{thread_name}").first()
-    if not thread_info or not subthread:
+    header = subthread_header_cache.get_by_name(f"t/{thread_name}")
+    if not header:
         return jsonify({"message": "Thread not found"}), 404
-    thread_info_dict = thread_info.as_dict(current_user.id if current_user.is_authenticated else None)
-    subthread_dict = subthread.as_dict(current_user.id if current_user.is_authenticated else None)
 
-    # Fetch detailed mod/admin roles for this subthread
-    from yuuzone.models import UserRole
-    try:
-        mod_roles = UserRole.query.filter(
-            UserRole.subthread_id == subthread.id,
-            UserRole.role.has(slug="mod") | UserRole.role.has(slug="admin")
-        ).all()
-    except Exception as e:
-        logging.error(f"Error fetching mod roles for subthread {subthread.id}: {e}")
-        mod_roles = []
-
-    # Create detailed mod list with role information, consolidating users with multiple roles
-    user_roles_dict = {}
-    for role in mod_roles:
-        try:
-            if role.user and role.role:  # Ensure both user and role exist
-                username = role.user.username
-                if username not in user_roles_dict:
-                    user_roles_dict[username] = {
-                        "username": username,
-                        "isMod": False,
-                        "isAdmin": False,
-                        "avatar": role.user.avatar if role.user.avatar else None
-                    }
-
-                # Set role flags
-                if role.role.slug == "mod":
-                    user_roles_dict[username]["isMod"] = True
-                elif role.role.slug == "admin":
-                    user_roles_dict[username]["isAdmin"] = True
-        except Exception as e:
-            logging.error(f"Error processing mod role {role.id}: {e}")
-            continue
-
-    mod_list = list(user_roles_dict.values())
-
-    # Get current user's roles in this subthread (can have multiple roles)
-    current_user_roles = []
-    current_user_role = None  # Keep for backward compatibility
+    viewer = {"currentUserRole": None, "currentUserRoles": [], "isOwner": False}
     if current_user.is_authenticated:
-        user_roles = UserRole.query.filter_by(
-            user_id=current_user.id,
-            subthread_id=subthread.id
-        ).join(UserRole.role).all()
-
-        for user_role in user_roles:
-            if user_role.role.slug == "admin":
-                current_user_roles.append("admin")
-                current_user_role = "admin"  # Admin takes precedence for backward compatibility
-            elif user_role.role.slug == "mod":
-                current_user_roles.append("mod")
-                if current_user_role != "admin":  # Only set if not already admin
-                    current_user_role = "mod"
-
-    # Add created_by_username for frontend admin display
-    created_by_user = User.query.filter_by(id=subthread.created_by, is_email_verified=True).first()
-    created_by_username = created_by_user.username if created_by_user else None
-
-    # Enhanced thread data with detailed mod information
-    combined_dict = {
-        **thread_info_dict,
-        **subthread_dict,
-        "modList": mod_list,  # Detailed mod list with roles
-        "currentUserRole": current_user_role,  # Keep for backward compatibility
-        "currentUserRoles": current_user_roles,  # New: all roles for the user
-        "created_by_username": created_by_username,
-        "isOwner": current_user.is_authenticated and subthread.created_by == current_user.id
-    }
-    return jsonify({"threadData": combined_dict}), 200
+        viewer.update(subthread_header_cache.viewer_flags(current_user.id, [header["id"]]).get(header["id"], {}))
+
+    return jsonify({"threadData": {**header, **viewer}}), 200
 
 
 @threads.route("/thread/<int:thread_id>", methods=["GET"])
 def get_thread_by_id(thread_id):
     """Get thread data by ID with detailed mod list and current user role"""
-    subthread = Subthread.query.filter_by(id=thread_id).first()
-    if not subthread:
+    header = subthread_header_cache.get(thread_id)
+    if not header:
         return jsonify({"message": "Thread not found"}), 404
 
-    # Check if current user is banned from this subthread
+    viewer = {"currentUserRole": None, "currentUserRoles": [], "isOwner": False}
     if current_user.is_authenticated:
-        banned = check_user_banned(current_user.id, thread_id)
-        if banned:
+        flags = subthread_header_cache.viewer_flags(current_user.id, [thread_id]).get(thread_id, {})
+        # Check if current user is banned from this subthread
+        if flags.get("is_banned"):
             return create_ban_response(thread_id)
+        flags.pop("user_id", None)
+        viewer.update(flags)
 
-    # Get basic thread data
-    thread_data = subthread.as_dict(current_user.id if current_user.is_authenticated else None)
-
-    # Fetch detailed mod/admin roles for this subthread
-    from yuuzone.models import UserRole
-    try:
-        mod_roles = UserRole.query.filter(
-            UserRole.subthread_id == thread_id,
-            UserRole.role.has(slug="mod") | UserRole.role.has(slug="admin")
-        ).all()
-    except Exception as e:
-        logging.error(f"Error fetching mod roles for subthread {thread_id}: {e}")
-        mod_roles = []
-
-    # Create detailed mod list with role information, consolidating users with multiple roles
-    user_roles_dict = {}
-    for role in mod_roles:
-        try:
-            if role.user and role.role:  # Ensure both user and role exist
-                username = role.user.username
-                if username not in user_roles_dict:
-                    user_roles_dict[username] = {
-                        "username": username,
-                        "isMod": False,
-                        "isAdmin": False,
-                        "avatar": role.user.avatar if role.user.avatar else None
-                    }
-
-                # Set role flags
-                if role.role.slug == "mod":
-                    user_roles_dict[username]["isMod"] = True
-                elif role.role.slug == "admin":
-                    user_roles_dict[username]["isAdmin"] = True
-        except Exception as e:
-            logging.error(f"Error processing mod role {role.id}: {e}")
-            continue
-
-    mod_list = list(user_roles_dict.values())
-
-    # Get current user's roles in this subthread (can have multiple roles)
-    current_user_roles = []
-    current_user_role = None  # Keep for backward compatibility
-    if current_user.is_authenticated:
-        user_roles = UserRole.query.filter_by(
-            user_id=current_user.id,
-            subthread_id=thread_id
-        ).join(UserRole.role).all()
-
-        for user_role in user_roles:
-            if user_role.role.slug == "admin":
-                current_user_roles.append("admin")
-                current_user_role = "admin"  # Admin takes precedence for backward compatibility
-            elif user_role.role.slug == "mod":
-                current_user_roles.append("mod")
-                if current_user_role != "admin":  # Only set if not already admin
-                    current_user_role = "mod"
-
-    # Add created_by_username for frontend admin display
-    created_by_user = User.query.filter_by(id=subthread.created_by, is_email_verified=True).first()
-    created_by_username = created_by_user.username if created_by_user else None
-
-    # Enhanced thread data with detailed mod information
-    enhanced_data = {
-        **thread_data,
-        "modList": mod_list,  # Detailed mod list with roles
-        "currentUserRole": current_user_role,  # Keep for backward compatibility
-        "currentUserRoles": current_user_roles,  # New: all roles for the user
-        "created_by_username": created_by_username,
-        "isOwner": current_user.is_authenticated and subthread.created_by == current_user.id
-    }
-
-    return jsonify({"threadData": enhanced_data}), 200
+    return jsonify({"threadData": {**header, **viewer}}), 200
 
 
 @threads.route("/thread", methods=["POST"])
@@ -658,7 +528,10 @@ def new_thread():
 
         subthread = Subthread.add(form_data, image, current_user.id)
         if subthread:
+            db.session.flush()  # Assign the subthread id before adding the role
             UserRole.add_moderator(current_user.id, subthread.id)
+            db.session.commit()
+            subthread.schedule_default_logo()
             return jsonify({"message": "Subthread created successfully"}), 200
         return jsonify({"message": "Failed to create subthread. Please try again or contact support if the problem persists."}), 500
     except ValueError as e:
@@ -693,6 +566,7 @@ def new_subthread():
                 Subscription.add(subthread.id, current_user.id)
                 # Commit all changes at once
                 db.session.commit()
+                subthread.schedule_default_logo()
                 #logging.info(f"Subthread {subthread.name} created successfully")
 
                 # Emit real-time subthread creation event
@@ -771,6 +645,7 @@ def update_thread(tid):
     form_data = request.form.to_dict()
     try:
         thread.patch(form_data, image)
+        subthread_header_cache.invalidate(thread.id)
         
         # Emit socket event for subthread update
         if socketio:
@@ -801,7 +676,10 @@ def update_thread(tid):
         jsonify(
             {
                 "message": "Thread updated",
-                "new_data": {"threadData": thread.as_dict(current_user.id if current_user.is_authenticated else None)},
+                "new_data": {"threadData": {
+                    **subthread_header_cache.get(thread.id),
+                    **subthread_header_cache.viewer_flags(current_user.id, [thread.id]).get(thread.id, {}),
+                }},
             }
         ),
         200,
@@ -831,6 +709,7 @@ def delete_thread(tid):
         # This avoids SQLAlchemy trying to update the subthread_info view
         db.session.execute(db.text("DELETE FROM subthreads WHERE id = :tid"), {"tid": tid})
         db.session.commit()
+        subthread_header_cache.invalidate(tid)
 
         # Emit socket event for subthread deletion
         if socketio:
@@ -908,6 +787,8 @@ def transfer_ownership(tid, username):
     # Transfer ownership
     thread.created_by = user.id
     db.session.commit()
+    subthread_header_cache.invalidate(tid)
+    permission_index.invalidate()
     return jsonify({"message": f"Ownership transferred to {username}"}), 200
 
 
@@ -928,6 +809,9 @@ def new_mod(tid, username):
         if not subscription:
             return jsonify({"message": "User must join the subthread before being added as a mod"}), 400
         UserRole.add_moderator(user.id, tid)
+        db.session.commit()
+        subthread_header_cache.invalidate(tid)
+        permission_index.invalidate()
         # Emit socket event for mod added (if Socket.IO available)
         if socketio:
             try:
@@ -959,6 +843,8 @@ def delete_mod(tid, username):
             return jsonify({"message": "Cannot Remove Thread Creator"}), 400
         UserRole.query.filter_by(user_id=user.id, subthread_id=tid).delete()
         db.session.commit()
+        subthread_header_cache.invalidate(tid)
+        permission_index.invalidate()
         # Emit socket event for mod removed (if Socket.IO available)
         if socketio:
             try:
@@ -968,7 +854,7 @@ def delete_mod(tid, username):
                     'subthread_id': tid,
                     'removed_by': current_user.username,
                     'role': 'mod'
-                }, room=f'user_{username}')
+                }, room=user_room(username))
             except Exception as e:
                 logging.error(f"Failed to emit mod_removed or demotion event: {e}")
         return jsonify({"message": "Moderator deleted"}), 200
@@ -1082,6 +968,8 @@ def ban_user(tid, username):
         UserRole.query.filter_by(user_id=user.id, subthread_id=tid).delete()
 
         db.session.commit()
+        subthread_header_cache.invalidate(tid)
+        permission_index.invalidate()
 
         # Emit real-time ban event
         if socketio:
@@ -1091,14 +979,14 @@ def ban_user(tid, username):
                     'subthread_id': tid,
                     'banned_by': current_user.username,
                     'reason': reason.strip()
-                }, room=f'{tid}')
+                }, room=sub_room(tid))
 
                 # Also emit to the banned user's personal room
                 socketio.emit('you_were_banned', {
                     'subthread_id': tid,
                     'banned_by': current_user.username,
                     'reason': reason.strip()
-                }, room=f'user_{username}')
+                }, room=user_room(username))
             except Exception as e:
                 logging.error(f"Failed to emit ban event: {e}")
 
@@ -1150,13 +1038,13 @@ def unban_user(tid, username):
                     'username': username,
                     'subthread_id': tid,
                     'unbanned_by': current_user.username
-                }, room=f'{tid}')
+                }, room=sub_room(tid))
 
                 # Also emit to the unbanned user's personal room
                 socketio.emit('you_were_unbanned', {
                     'subthread_id': tid,
                     'unbanned_by': current_user.username
-                }, room=f'user_{username}')
+                }, room=user_room(username))
             except Exception as e:
                 logging.error(f"Failed to emit unban event: {e}")
 
@@ -1382,11 +1270,13 @@ def get_mutual_subthreads(username):
         db.session.query(other_user_subthreads.c.subthread_id)
     ).all()
 
-    # Get the actual subthread objects
-    mutual_subthreads = []
-    for (subthread_id,) in mutual_subthread_ids:
-        subthread = Subthread.query.get(subthread_id)
-        if subthread:
-            mutual_subthreads.append(subthread.as_dict(current_user.id))
+    # Get the headers for all mutual subthreads in one batch
+    ids = [subthread_id for (subthread_id,) in mutual_subthread_ids]
+    headers = subthread_header_cache.get_many(ids)
+    flags = subthread_header_cache.viewer_flags(current_user.id, headers.keys())
+    mutual_subthreads = [
+        {**headers[subthread_id], **flags.get(subthread_id, {})}
+        for subthread_id in sorted(headers, key=lambda sid: headers[sid]["name"])
+    ]
 
     return jsonify(mutual_subthreads), 200
@@ -0,0 +1,385 @@
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional
+from flask import g, has_app_context
+from sqlalchemy import exists, and_, event
+from sqlalchemy.orm import Session, object_session
+from yuuzone import db
+from yuuzone.models import Role, UserRole
+from yuuzone.subthreads.models import Subthread, SubthreadInfo, Subscription, SubthreadBan
+from yuuzone.users.models import User
+from yuuzone.utils.cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+
+class SubthreadHeaderCache:
+    """Cached header projection (name, logo, counters, mod list, creator) per subthread"""
+
+    def __init__(self, ttl: int = 60, size_limit: int = 2000):
+        self.ttl = ttl  # Counters come from the subthread_info view, keep them reasonably fresh
+        self.size_limit = size_limit
+        self.headers: Dict[int, Dict] = {}
+        self.name_index: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subthread_id) -> Optional[Dict]:
+        """Get the header for a single subthread, loading it on a miss"""
+        try:
+            subthread_id = int(subthread_id)
+        except (TypeError, ValueError):
+            return None
+        return self.get_many([subthread_id]).get(subthread_id)
+
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """Get the header for a subthread by its full name (including the t/ prefix)"""
+        with self.lock:
+            subthread_id = self.name_index.get(name)
+        if subthread_id is None:
+            row = db.session.query(Subthread.id).filter(Subthread.name == name).first()
+            if not row:
+                return None
+            subthread_id = row.id
+        return self.get(subthread_id)
+
+    def get_many(self, subthread_ids: Iterable) -> Dict[int, Dict]:
+        """Get headers for many subthreads at once; all misses are loaded in one batch"""
+        ids = {int(sid) for sid in subthread_ids if sid is not None}
+        found: Dict[int, Dict] = {}
+        now = time.time()
+
+        with self.lock:
+            for sid in ids:
+                entry = self.headers.get(sid)
+                if entry and now - entry['timestamp'] < self.ttl:
+                    found[sid] = entry['data']
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+
+        missing = ids - found.keys()
+        if missing:
+            loaded = self._load(missing)
+            self._store(loaded)
+            found.update(loaded)
+
+        # Hand out shallow copies so callers can merge viewer flags without touching the cache
+        return {sid: dict(header) for sid, header in found.items()}
+
+    def invalidate(self, subthread_id) -> None:
+        """Drop the cached header after a mod, ban, transfer or patch change"""
+        try:
+            subthread_id = int(subthread_id)
+        except (TypeError, ValueError):
+            return
+        self._drop(subthread_id)
+        cluster.publish('subthread_header_cache', subthread_id)
+
+    def _drop(self, subthread_id: int) -> None:
+        with self.lock:
+            entry = self.headers.pop(subthread_id, None)
+            if entry:
+                self.name_index.pop(entry['data']['name'], None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.headers.clear()
+            self.name_index.clear()
+
+    def viewer_flags(self, user_id, subthread_ids: Iterable) -> Dict[int, Dict]:
+        """Resolve subscription, ban, role and ownership flags for one viewer in a single query"""
+        ids = {int(sid) for sid in subthread_ids if sid is not None}
+        if not user_id or not ids:
+            return {}
+
+        def has_role(slug):
+            return exists().where(and_(
+                UserRole.subthread_id == Subthread.id,
+                UserRole.user_id == user_id,
+                UserRole.role_id == Role.id,
+                Role.slug == slug,
+            ))
+
+        rows = db.session.query(
+            Subthread.id,
+            exists().where(and_(Subscription.subthread_id == Subthread.id, Subscription.user_id == user_id)).label("has_subscribed"),
+            exists().where(and_(SubthreadBan.subthread_id == Subthread.id, SubthreadBan.user_id == user_id)).label("is_banned"),
+            has_role("mod").label("is_mod"),
+            has_role("admin").label("is_admin"),
+            (Subthread.created_by == user_id).label("is_owner"),
+        ).filter(Subthread.id.in_(ids)).all()
+
+        flags = {}
+        for row in rows:
+            roles = []
+            if row.is_admin:
+                roles.append("admin")
+            if row.is_mod:
+                roles.append("mod")
+            flags[row.id] = {
+                "user_id": user_id,
+                "has_subscribed": bool(row.has_subscribed),
+                "is_banned": bool(row.is_banned),
+                "currentUserRoles": roles,
+                "currentUserRole": roles[0] if roles else None,  # Admin takes precedence
+                "isOwner": bool(row.is_owner),
+            }
+        return flags
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'cached_headers': len(self.headers),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def _load(self, ids) -> Dict[int, Dict]:
+        """Build headers for the given ids with one subthread query and one role query"""
+        rows = (
+            db.session.query(
+                Subthread.id,
+                Subthread.name,
+                Subthread.description,
+                Subthread.created_at,
+                Subthread.logo,
+                User.username.label("creator_username"),
+                User.is_email_verified.label("creator_verified"),
+                SubthreadInfo.members_count,
+                SubthreadInfo.posts_count,
+                SubthreadInfo.comments_count,
+            )
+            .outerjoin(User, User.id == Subthread.created_by)
+            .outerjoin(SubthreadInfo, SubthreadInfo.id == Subthread.id)
+            .filter(Subthread.id.in_(ids))
+            .all()
+        )
+
+        headers: Dict[int, Dict] = {}
+        for row in rows:
+            headers[row.id] = {
+                "id": row.id,
+                "name": row.name,
+                "description": row.description,
+                "created_at": row.created_at,
+                "logo": row.logo,
+                "subscriberCount": row.members_count or 0,
+                "PostsCount": row.posts_count or 0,
+                "CommentsCount": row.comments_count or 0,
+                "created_by": row.creator_username,
+                "created_by_username": row.creator_username if row.creator_verified else None,
+                "modList": [],
+            }
+        if not headers:
+            return headers
+
+        # Consolidate users holding both mod and admin into one entry per subthread
+        mod_entries: Dict[tuple, Dict] = {}
+        try:
+            role_rows = (
+                db.session.query(UserRole.subthread_id, Role.slug, User.username, User.avatar)
+                .join(Role, Role.id == UserRole.role_id)
+                .join(User, User.id == UserRole.user_id)
+                .filter(UserRole.subthread_id.in_(headers.keys()), Role.slug.in_(["mod", "admin"]))
+                .order_by(UserRole.id)
+                .all()
+            )
+        except Exception as e:
+            logger.error(f"Error fetching mod roles for subthreads {sorted(headers)}: {e}")
+            role_rows = []
+
+        for subthread_id, slug, username, avatar in role_rows:
+            key = (subthread_id, username)
+            entry = mod_entries.get(key)
+            if entry is None:
+                entry = {"username": username, "isMod": False, "isAdmin": False, "avatar": avatar or None}
+                mod_entries[key] = entry
+                headers[subthread_id]["modList"].append(entry)
+            if slug == "mod":
+                entry["isMod"] = True
+            elif slug == "admin":
+                entry["isAdmin"] = True
+
+        return headers
+
+    def _store(self, headers: Dict[int, Dict]) -> None:
+        now = time.time()
+        with self.lock:
+            if len(self.headers) + len(headers) > self.size_limit:
+                # Evict the oldest entries to make room
+                overflow = len(self.headers) + len(headers) - self.size_limit
+                oldest = sorted(self.headers, key=lambda k: self.headers[k]['timestamp'])[:max(overflow, 100)]
+                for sid in oldest:
+                    entry = self.headers.pop(sid)
+                    self.name_index.pop(entry['data']['name'], None)
+            for sid, header in headers.items():
+                self.headers[sid] = {'data': header, 'timestamp': now}
+                self.name_index[header['name']] = sid
+
+
+class AccessContext(NamedTuple):
+    """A user's banned and joined subthread ids"""
+    user_id: int
+    banned: FrozenSet[int]
+    subscribed: FrozenSet[int]
+
+    def is_banned(self, subthread_id) -> bool:
+        try:
+            return int(subthread_id) in self.banned
+        except (TypeError, ValueError):
+            return False
+
+    def is_member(self, subthread_id) -> bool:
+        try:
+            return int(subthread_id) in self.subscribed
+        except (TypeError, ValueError):
+            return False
+
+
+class AccessContextCache:
+    """Per-user ban and membership sets, loaded once per request and cached briefly across requests"""
+
+    def __init__(self, ttl: int = 60, size_limit: int = 5000):
+        self.ttl = ttl
+        self.size_limit = size_limit
+        self.contexts: Dict[int, Dict] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id) -> AccessContext:
+        user_id = int(user_id)
+        memo = g.setdefault('_access_contexts', {}) if has_app_context() else {}
+        if user_id in memo:
+            return memo[user_id]
+
+        now = time.time()
+        with self.lock:
+            entry = self.contexts.get(user_id)
+            if entry and now - entry['timestamp'] < self.ttl:
+                self.hits += 1
+                context = entry['data']
+            else:
+                self.misses += 1
+                context = None
+
+        if context is None:
+            context = self._load(user_id)
+            self._store(context)
+        memo[user_id] = context
+        return context
+
+    def apply(self, user_id, banned_add=(), banned_remove=(), subscribed_add=(), subscribed_remove=()) -> None:
+        """Apply committed ban/unban/join/leave changes to the cached context"""
+        user_id = int(user_id)
+        with self.lock:
+            entry = self.contexts.get(user_id)
+            if entry:
+                context = entry['data']
+                entry['data'] = context._replace(
+                    banned=(context.banned | frozenset(banned_add)) - frozenset(banned_remove),
+                    subscribed=(context.subscribed | frozenset(subscribed_add)) - frozenset(subscribed_remove),
+                )
+        self._forget_request_memo(user_id)
+        # Other workers reload instead of patching
+        cluster.publish('access_cache', user_id)
+
+    def invalidate(self, user_id) -> None:
+        user_id = int(user_id)
+        self._drop(user_id)
+        cluster.publish('access_cache', user_id)
+
+    def _drop(self, user_id: int) -> None:
+        with self.lock:
+            self.contexts.pop(user_id, None)
+        self._forget_request_memo(user_id)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.contexts.clear()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'cached_users': len(self.contexts),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+    @staticmethod
+    def _forget_request_memo(user_id: int) -> None:
+        if has_app_context():
+            g.get('_access_contexts', {}).pop(user_id, None)
+
+    def _load(self, user_id: int) -> AccessContext:
+        banned = db.session.query(SubthreadBan.subthread_id).filter(SubthreadBan.user_id == user_id).all()
+        subscribed = db.session.query(Subscription.subthread_id).filter(Subscription.user_id == user_id).all()
+        return AccessContext(
+            user_id=user_id,
+            banned=frozenset(row.subthread_id for row in banned),
+            subscribed=frozenset(row.subthread_id for row in subscribed),
+        )
+
+    def _store(self, context: AccessContext) -> None:
+        now = time.time()
+        with self.lock:
+            if len(self.contexts) >= self.size_limit:
+                # Evict the oldest entries to make room
+                oldest = sorted(self.contexts, key=lambda k: self.contexts[k]['timestamp'])[:max(len(self.contexts) // 10, 1)]
+                for uid in oldest:
+                    self.contexts.pop(uid, None)
+            self.contexts[context.user_id] = {'data': context, 'timestamp': now}
+
+
+# Global instances
+subthread_header_cache = SubthreadHeaderCache()
+access_cache = AccessContextCache()
+cluster.subscribe('subthread_header_cache', subthread_header_cache._drop)
+cluster.subscribe('access_cache', access_cache._drop)
+
+
+def _record_access_change(target, kind: str, added: bool) -> None:
+    session = object_session(target)
+    if session is not None and target.user_id is not None and target.subthread_id is not None:
+        # Routes often build rows straight from URL parameters, so ids may still be strings here
+        session.info.setdefault('access_changes', []).append((int(target.user_id), kind, int(target.subthread_id), added))
+
+
+@event.listens_for(SubthreadBan, "after_insert")
+def _ban_added(mapper, connection, target):
+    _record_access_change(target, 'banned', True)
+
+
+@event.listens_for(SubthreadBan, "after_delete")
+def _ban_removed(mapper, connection, target):
+    _record_access_change(target, 'banned', False)
+
+
+@event.listens_for(Subscription, "after_insert")
+def _subscription_added(mapper, connection, target):
+    _record_access_change(target, 'subscribed', True)
+
+
+@event.listens_for(Subscription, "after_delete")
+def _subscription_removed(mapper, connection, target):
+    _record_access_change(target, 'subscribed', False)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_access_changes(session):
+    # Applied in order so a ban that also removes the subscription lands as one consistent state
+    for user_id, kind, subthread_id, added in session.info.pop('access_changes', ()):
+        access_cache.apply(user_id, **{f"{kind}_{'add' if added else 'remove'}": [subthread_id]})
+
+
+@event.listens_for(Session, "after_rollback")
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_access_changes(session, *_):
+    # Rolled-back rows never reached the table; the next commit on this session must not apply them
+    session.info.pop('access_changes', None)
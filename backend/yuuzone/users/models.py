@@ -25,9 +25,46 @@ class UserBlock(db.Model):
         self.blocked_id = blocked_id
 
 
+class AccountDeletionJob(db.Model):
+    __tablename__ = "account_deletion_jobs"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, nullable=False)  # No FK, the job outlives the user row
+    mode = db.Column(db.Text, nullable=False, default="purge")  # purge: remove everything, anonymize: keep content
+    status = db.Column(db.Text, nullable=False, default="pending")  # pending, running, done, failed
+    stage = db.Column(db.Text)
+    rows_deleted = db.Column(db.Integer, nullable=False, default=0)
+    assets_deleted = db.Column(db.Integer, nullable=False, default=0)
+    pending_assets = db.Column(db.Text)  # JSON list of Cloudinary URLs whose rows are already gone
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now())
+    finished_at = db.Column(db.DateTime(timezone=True))
+
+    def __init__(self, user_id, mode="purge", pending_assets=None):
+        self.user_id = user_id
+        self.mode = mode
+        self.pending_assets = pending_assets
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "mode": self.mode,
+            "status": self.status,
+            "stage": self.stage,
+            "rows_deleted": self.rows_deleted,
+            "assets_deleted": self.assets_deleted,
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    # Snapshot from the identity cache; the ORM row is loaded lazily when a route needs it
+    from yuuzone.users.service import identity_cache
+    return identity_cache.get(user_id)
 
 
 class User(db.Model, UserMixin):
@@ -177,80 +214,14 @@ class User(db.Model, UserMixin):
         return role in {r.role.slug for r in self.user_role}
 
     @classmethod
-    def get_all(cls):
-        all_users: list[dict] = []
-        for user in cls.query.filter_by(deleted=False).all():
-            all_users.append(user.as_dict(include_all=True))
-        return all_users
+    def get_page(cls, after_id: int = 0, limit: int = 100) -> list[dict]:
+        """Keyset page of non-deleted users ordered by id"""
+        from yuuzone.users.service import iter_user_pages
+        return [user for chunk in iter_user_pages(after_id, limit) for user in chunk]
 
     def as_dict(self, include_all=False) -> dict:
-        # Safely get karma data or provide defaults
-        karma_data = {
-            "user_karma": 0,
-            "comments_count": 0,
-            "comments_karma": 0,
-            "posts_count": 0,
-            "posts_karma": 0,
-        }
-
-        try:
-            if hasattr(self, 'user_karma') and self.user_karma:
-                # Handle both list and single object cases
-                if isinstance(self.user_karma, list) and len(self.user_karma) > 0:
-                    karma_data = self.user_karma[0].as_dict()
-                elif hasattr(self.user_karma, 'as_dict'):
-                    karma_data = self.user_karma.as_dict()
-        except (IndexError, AttributeError, TypeError):
-            # If there's any issue with karma data, use defaults
-            pass
-
-        # Get subscription types
-        subscription_types = []
-        try:
-            from yuuzone.subscriptions.service import SubscriptionService
-            subscription_service = SubscriptionService()
-            subscription_types = subscription_service.get_user_subscription_types(self.id)
-        except Exception:
-            # If there's any issue with subscription data, use empty list
-            pass
-
-        # Get wallet information
-        wallet_data = {}
-        try:
-            from yuuzone.coins.models import UserWallet
-            wallet = UserWallet.query.filter_by(user_id=self.id).first()
-            if wallet:
-                wallet_data = wallet.as_dict()
-            else:
-                # Create wallet if it doesn't exist
-                from yuuzone.coins.service import CoinService
-                coin_service = CoinService()
-                coin_service.get_or_create_wallet(self.id)
-                wallet = UserWallet.query.filter_by(user_id=self.id).first()
-                if wallet:
-                    wallet_data = wallet.as_dict()
-        except Exception:
-            # If there's any issue with wallet data, use defaults
-            wallet_data = {"coin_balance": 0}
-
-        base = {
-            "username": self.username,
-            "avatar": self.avatar,
-            "bio": self.bio,
-            "language_preference": self.language_preference,
-            "theme": self.theme,
-            "registrationDate": self.registration_date,
-            "karma": karma_data,
-            "deleted": self.deleted,
-            "subscription_types": subscription_types,  # Add subscription information
-            "wallet": wallet_data,  # Add wallet information
-        }
-        if include_all:
-            base["id"] = self.id
-            # Do NOT include email in API output
-            # base["email"] = self.email
-        return base
-
+        from yuuzone.users.service import serialize_users
+        return serialize_users([self], include_all=include_all)[0]
 
 def username_validator(username: str):
     if db.session.query(User).filter(func.lower(User.username) == username.lower()).first():
@@ -1,9 +1,10 @@
-from flask import Blueprint, request, jsonify, url_for, make_response, Flask, redirect, current_app, session
+from flask import Blueprint, request, jsonify, url_for, make_response, Flask, redirect, current_app, session, Response, stream_with_context
 from yuuzone import db
 from yuuzone.users.models import (
     UserLoginValidator,
     UserRegisterValidator,
     User,
+    AccountDeletionJob,
 )
 from yuuzone.auth.decorators import auth_role
 from yuuzone.utils.translations import get_translation, get_user_language
@@ -16,10 +17,14 @@ from yuuzone.utils.email import (
     send_account_deletion_email,
     send_account_deletion_verification_email
 )
-from bcrypt import hashpw, checkpw, gensalt
+from yuuzone.utils.password_hasher import password_hasher, PasswordHasherBusy
+from yuuzone.users.service import iter_user_pages
+from yuuzone.subthreads.service import access_cache
+from yuuzone.utils.account_deleter import account_deleter
 from flask_login import login_user, logout_user, current_user, login_required
 from itsdangerous import URLSafeTimedSerializer
 import requests
+import json
 import logging
 from datetime import datetime, timedelta, timezone
 # Socket.IO will be handled in WSGI - use try/except for graceful fallback
@@ -33,6 +38,7 @@ serializer = URLSafeTimedSerializer(SECRET_KEY)
 
 # Import rate limiting utilities
 from yuuzone.utils.rate_limiter import combined_protection, rate_limit
+from yuuzone.utils.rooms import settings_room, user_room
 from sqlalchemy import func
 
 user = Blueprint("users", __name__, url_prefix="/api")
@@ -84,7 +90,7 @@ def user_login():
             }), 404
         
         # Check if user exists and password is correct
-        if user_info and checkpw(password_trimmed.encode(), user_info.password_hash.encode()):
+        if user_info and password_hasher.verify_user(user_info, password_trimmed):
             if not user_info.is_email_verified:
                 if user_info.registration_date and (datetime.now(timezone.utc) - user_info.registration_date).total_seconds() > 600:
                     db.session.delete(user_info)
@@ -198,7 +204,7 @@ def user_register():
             new_user = User(
                 register_form.get("username"),
                 email_lower,
-                hashpw(register_form.get("password").encode(), gensalt()).decode("utf-8"),
+                password_hasher.hash(register_form.get("password")),
             )
             new_user.add()
 
@@ -226,6 +232,8 @@ def user_register():
                 "user": new_user.as_dict(include_all=True)
             }), 201
 
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Registration failed for {register_form.get('username')}: {str(e)}")
             db.session.rollback()
@@ -305,7 +313,7 @@ def reset_password(token):
         user = User.query.filter_by(email=email).first()
         if user:
             new_password = request.json.get("password")
-            user.password_hash = hashpw(new_password.encode(), gensalt()).decode("utf-8")
+            user.password_hash = password_hasher.hash(new_password)
             db.session.commit()
             
             # Send change confirmation email
@@ -317,6 +325,8 @@ def reset_password(token):
             
             return jsonify({"message": "Password reset successfully."}), 200
         return jsonify({"message": "Invalid token or user not found."}), 400
+    except PasswordHasherBusy:
+        raise
     except Exception:
         return jsonify({"message": "Reset link expired or invalid."}), 400
 
@@ -344,7 +354,7 @@ def user_patch():
                     'username': current_user.username,
                     'updated_fields': updated_fields,
                     'avatar_url': new_data.get('avatar')
-                }, room=f'user_{current_user.id}')
+                }, room=user_room(current_user.id))
         except Exception as e:
             import logging
             logging.error(f"Failed to emit profile update: {e}")
@@ -365,127 +375,36 @@ def user_logout():
 def user_delete():
     try:
         user_id = current_user.id
-        username = current_user.username
-        
-        # Store user info for email before deletion
-        user_email = current_user.email
-        user_username = current_user.username
-        
-        # Handle subthread ownership and mod rights before deletion
-        from yuuzone.subthreads.models import Subthread
-        from yuuzone.models import UserRole, Role
-        
-        # Get all subthreads where user is admin
-        admin_subthreads = UserRole.query.filter_by(
-            user_id=user_id
-        ).join(UserRole.role).filter(
-            UserRole.role.has(slug="admin")
-        ).all()
-        
-        # Get all subthreads where user is mod
-        mod_subthreads = UserRole.query.filter_by(
-            user_id=user_id
-        ).join(UserRole.role).filter(
-            UserRole.role.has(slug="mod")
-        ).all()
-        
-        # Handle admin subthreads
-        for admin_role in admin_subthreads:
-            subthread_id = admin_role.subthread_id
-            subthread = Subthread.query.get(subthread_id)
-            
-            if subthread:
-                # Check if there are other mods in this subthread
-                other_mods = UserRole.query.filter_by(
-                    subthread_id=subthread_id
-                ).join(UserRole.role).filter(
-                    UserRole.role.has(slug="mod")
-                ).filter(
-                    UserRole.user_id != user_id
-                ).all()
-                
-                if other_mods:
-                    # Transfer ownership to the first mod
-                    transfer_to_user_id = other_mods[0].user_id
-                    # Remove the mod role from the transfer target
-                    db.session.delete(other_mods[0])
-                    # Make them admin
-                    admin_role_transfer = UserRole(
-                        user_id=transfer_to_user_id,
-                        subthread_id=subthread_id,
-                        role_id=2  # admin role
-                    )
-                    db.session.add(admin_role_transfer)
-                    # Update subthread created_by
-                    subthread.created_by = transfer_to_user_id
-                else:
-                    # No other mods, mark as abandoned
-                    subthread.created_by = None
-        
-        # Remove all user roles (mod and admin)
-        UserRole.query.filter_by(user_id=user_id).delete()
-        
-        # Remove all subscriptions
-        from yuuzone.subthreads.models import Subscription
-        Subscription.query.filter_by(user_id=user_id).delete()
-        
-        # Anonymize all posts by this user
-        from yuuzone.posts.models import Posts
-        user_posts = Posts.query.filter_by(user_id=user_id).all()
-        for post in user_posts:
-            # Since PostInfo is a view, we need to update the underlying Posts table
-            # The view will automatically show NULL for user info when user is deleted
-            # But we need to handle the case where we want to show [deleted] instead
-            # For now, we'll let the view show NULL and handle it in the frontend
-            pass
-        
-        # Anonymize all comments by this user
-        from yuuzone.comments.models import Comments
-        user_comments = Comments.query.filter_by(user_id=user_id).all()
-        for comment in user_comments:
-            # Since CommentInfo is a view, we need to update the underlying Comments table
-            # The view will automatically show NULL for user info when user is deleted
-            # But we need to handle the case where we want to show [deleted] instead
-            # For now, we'll let the view show NULL and handle it in the frontend
-            pass
-        
-        # Remove all reactions by this user
-        from yuuzone.reactions.models import Reactions
-        Reactions.query.filter_by(user_id=user_id).delete()
-        
-        # Remove all saved posts by this user
-        from yuuzone.posts.models import SavedPosts
-        SavedPosts.query.filter_by(user_id=user_id).delete()
-        
-        # Remove all messages by this user
-        from yuuzone.messages.models import Messages
-        Messages.query.filter_by(sender_id=user_id).delete()
-        Messages.query.filter_by(receiver_id=user_id).delete()
-        
-        # Remove all user blocks
-        from yuuzone.users.models import UserBlock
-        UserBlock.query.filter_by(blocker_id=user_id).delete()
-        UserBlock.query.filter_by(blocked_id=user_id).delete()
-        
-        # Remove all subthread bans
-        from yuuzone.subthreads.models import SubthreadBan
-        SubthreadBan.query.filter_by(user_id=user_id).delete()
-        SubthreadBan.query.filter_by(banned_by=user_id).delete()
-        
-        # Hard delete the user
-        db.session.delete(current_user)
+        user = db.session.get(User, user_id)
+
+        # Store user info for email before the account is retired
+        user_email = user.email
+        user_username = user.username
+
+        # Retire the account right away; the worker purges its data in batches afterwards
+        import secrets
+        user.deleted = True
+        user.deleted_at = datetime.now(timezone.utc)
+        user.password_hash = "deleted"
+        # Free the email and username immediately so they can be registered again while the purge runs
+        user.email = f"deleted_{user.id}_{int(datetime.now().timestamp())}@deleted.com"
+        user.username = f"del_{secrets.token_hex(4)}"
+        job = AccountDeletionJob(user_id=user_id, mode="purge")
+        db.session.add(job)
         db.session.commit()
-        
+        account_deleter.enqueue(job.id)
+        access_cache.invalidate(user_id)
+
         # Send deletion email
         try:
             send_account_deletion_email(user_email, user_username, None)
         except Exception as e:
             import logging
             logging.error(f"Failed to send account deletion email: {e}")
-        
+
         logout_user()
-        return jsonify({"message": "Account deleted successfully"}), 200
-        
+        return jsonify({"message": "Account deleted successfully", "deletion_job": job.as_dict()}), 202
+
     except Exception as e:
         db.session.rollback()
         import logging
@@ -518,7 +437,7 @@ def user_update_username():
             return jsonify({"message": "Username cannot start with 'del_' prefix (reserved for deleted accounts)"}), 400
 
         # Verify current password
-        if not checkpw(current_password.encode(), current_user.password_hash.encode()):
+        if not password_hasher.verify_user(current_user, current_password):
             return jsonify({"message": "Current password is incorrect"}), 400
 
         # Check if username already exists (case-insensitive)
@@ -539,6 +458,8 @@ def user_update_username():
             # Don't return error, just log it and continue
 
         return jsonify(current_user.as_dict(include_all=True)), 200
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         import logging
         logging.error(f"Error in user_update_username: {str(e)}")
@@ -557,11 +478,11 @@ def user_update_password():
             return jsonify({"message": "Both current and new passwords are required"}), 400
 
         # Verify current password
-        if not checkpw(current_password.encode(), current_user.password_hash.encode()):
+        if not password_hasher.verify_user(current_user, current_password):
             return jsonify({"message": "Current password is incorrect"}), 400
 
         # Update password
-        current_user.password_hash = hashpw(new_password.encode(), gensalt()).decode("utf-8")
+        current_user.password_hash = password_hasher.hash(new_password)
         db.session.commit()
         
         # Send change confirmation email (don't let email failure break the request)
@@ -573,6 +494,8 @@ def user_update_password():
             # Don't return error, just log it and continue
 
         return jsonify({"message": "Password updated successfully"}), 200
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         import logging
         logging.error(f"Error in user_update_password: {str(e)}")
@@ -592,7 +515,7 @@ def user_update_email():
             return jsonify({"message": "Email and current password are required"}), 400
 
         # Verify current password
-        if not checkpw(current_password.encode(), current_user.password_hash.encode()):
+        if not password_hasher.verify_user(current_user, current_password):
             return jsonify({"message": "Current password is incorrect"}), 400
 
         # Check if email already exists
@@ -613,6 +536,8 @@ def user_update_email():
             # Don't return error, just log it and continue
 
         return jsonify(current_user.as_dict(include_all=True)), 200
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         import logging
         logging.error(f"Error in user_update_email: {str(e)}")
@@ -658,7 +583,7 @@ def update_language_preference():
         socketio.emit('user_preference_updated', {
             'preference_type': 'language_preference',
             'value': language
-        }, room=f'user_settings_{current_user.id}')
+        }, room=settings_room(current_user.id))
 
     user_lang = get_user_language()
     return jsonify({
@@ -768,7 +693,23 @@ def get_user_by_username(username):
 @login_required
 @auth_role(["admin"])
 def users_get():
-    return jsonify(User.get_all()), 200
+    after_id = request.args.get("after_id", default=0, type=int)
+    limit = min(max(request.args.get("limit", default=100, type=int), 1), 500)
+
+    def generate():
+        # Stream the page as it is serialized so memory stays bounded by the chunk size
+        yield '{"users": ['
+        last_id = None
+        count = 0
+        for chunk in iter_user_pages(after_id, limit):
+            for user_data in chunk:
+                yield ("," if count else "") + current_app.json.dumps(user_data)
+                last_id = user_data["id"]
+                count += 1
+        next_after_id = last_id if count == limit else None
+        yield f'], "next_after_id": {current_app.json.dumps(next_after_id)}}}'
+
+    return Response(stream_with_context(generate()), mimetype="application/json"), 200
 
 
 @user.route("/user/search/<search>")
@@ -1021,77 +962,29 @@ def verify_account_deletion(token):
         # Commit immediately to make changes permanent
         db.session.commit()
         
-        # Now clean up all related data
-        from yuuzone.models import UserRole
-        from yuuzone.subthreads.models import Subscription, SubthreadBan, Subthread
-        from yuuzone.posts.models import Posts, SavedPosts
-        from yuuzone.comments.models import Comments
-        from yuuzone.reactions.models import Reactions
-        from yuuzone.messages.models import Messages
-        from yuuzone.users.models import UserBlock, UsersKarma
-        
-        # Delete user roles
-        UserRole.query.filter_by(user_id=user.id).delete()
-        
-        # Delete subscriptions
-        Subscription.query.filter_by(user_id=user.id).delete()
-        
-        # Delete subthread bans
-        SubthreadBan.query.filter_by(user_id=user.id).delete()
-        SubthreadBan.query.filter_by(banned_by=user.id).delete()
-        
-        # Anonymize posts (keep them but mark as deleted)
-        user_posts = Posts.query.filter_by(user_id=user.id).all()
-        for post in user_posts:
-            post.username = "deleted"  # Use valid characters only
-        
-        # Anonymize comments (keep them but mark as deleted)
-        user_comments = Comments.query.filter_by(user_id=user.id).all()
-        for comment in user_comments:
-            comment.username = "deleted"  # Use valid characters only
-        
-        # Delete reactions
-        Reactions.query.filter_by(user_id=user.id).delete()
-        
-        # Delete saved posts
-        SavedPosts.query.filter_by(user_id=user.id).delete()
-        
-        # Delete messages
-        Messages.query.filter_by(sender_id=user.id).delete()
-        Messages.query.filter_by(receiver_id=user.id).delete()
-        
-        # Delete user blocks
-        UserBlock.query.filter_by(blocker_id=user.id).delete()
-        UserBlock.query.filter_by(blocked_id=user.id).delete()
-        
-        # Remove user from all subthreads they joined
-        user_subscriptions = Subscription.query.filter_by(user_id=user.id).all()
-        for subscription in user_subscriptions:
-            # Remove from subthread members list
-            subthread = Subthread.query.get(subscription.subthread_id)
-            if subthread and subthread.members:
-                # Parse members list and remove the user
-                members_list = subthread.members.split(',') if subthread.members else []
-                members_list = [member.strip() for member in members_list if member.strip() != user.username]
-                subthread.members = ','.join(members_list) if members_list else None
-                
-                # Update member count
-                if subthread.member_count and subthread.member_count > 0:
-                    subthread.member_count -= 1
-        
         # Complete the GONE protocol
         import secrets
         import hashlib
         random_hash = secrets.token_hex(4)  # Generate 8-character random hex
         user.username = f"del_{random_hash}"  # Unique random hash format
         user.password_hash = hashlib.sha512(f"deleted_{secrets.token_hex(16)}".encode()).hexdigest()  # Impossible to guess SHA-512 hash
+        old_avatar = user.avatar
         user.avatar = None  # Remove avatar
         user.bio = None  # Remove bio
         
         logger.info(f"GONE protocol applied: username={user.username}, password_hash length={len(user.password_hash)}")
         
-        # Final commit to save all changes
+        # Posts and comments stay; roles, subscriptions, bans, reactions, saved posts, messages
+        # and blocks are removed in batches by the deletion worker
+        job = AccountDeletionJob(
+            user_id=user.id,
+            mode="anonymize",
+            pending_assets=json.dumps([old_avatar]) if old_avatar else None,
+        )
+        db.session.add(job)
         db.session.commit()
+        account_deleter.enqueue(job.id)
+        access_cache.invalidate(user.id)
         
         # Send confirmation email to the original email (before it was changed)
         send_account_deletion_email(original_email, user.username, user)
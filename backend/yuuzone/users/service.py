@@ -0,0 +1,268 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from yuuzone import db
+from yuuzone.users.models import User, UsersKarma
+from yuuzone.utils.cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+
+class UserSnapshot(NamedTuple):
+    """Immutable per-user identity shared across requests"""
+    id: int
+    username: str
+    email: str
+    avatar: Optional[str]
+    language_preference: Optional[str]
+    theme: Optional[str]
+    is_email_verified: bool
+    deleted: bool
+
+
+SNAPSHOT_FIELDS = frozenset(UserSnapshot._fields)
+
+
+class CachedUser(UserMixin):
+    """current_user backed by a snapshot; the ORM row is loaded only for fields outside it or for writes"""
+
+    def __init__(self, snapshot: UserSnapshot, cache: "IdentityCache"):
+        object.__setattr__(self, "_snapshot", snapshot)
+        object.__setattr__(self, "_cache", cache)
+        object.__setattr__(self, "_user", None)
+
+    def get_id(self):
+        return str(self._snapshot.id)
+
+    def load(self) -> User:
+        """Full ORM object for this request, needed to write or to hand to the session"""
+        if self._user is None:
+            user = db.session.get(User, self._snapshot.id)
+            if user is None:
+                raise LookupError(f"User {self._snapshot.id} no longer exists")
+            object.__setattr__(self, "_user", user)
+            self._cache.record_orm_load()
+        return self._user
+
+    def __getattr__(self, name):
+        # Once the ORM row is loaded it wins, so writes made earlier in the request are visible
+        if self._user is None and name in SNAPSHOT_FIELDS:
+            return getattr(self._snapshot, name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __repr__(self):
+        return f"<CachedUser {self._snapshot.id} {self._snapshot.username}>"
+
+
+class IdentityCache:
+    """Short-TTL cache of user snapshots for the Flask-Login user_loader"""
+
+    def __init__(self, ttl: int = 30, size_limit: int = 5000):
+        self.ttl = ttl
+        self.size_limit = size_limit
+        self.snapshots: Dict[int, Dict] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.orm_loads = 0
+        self.invalidations = 0
+
+    def get(self, user_id) -> Optional[CachedUser]:
+        """Return a CachedUser for the id, loading the snapshot on a miss"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        now = time.time()
+        with self.lock:
+            entry = self.snapshots.get(user_id)
+            if entry and now - entry['timestamp'] < self.ttl:
+                self.hits += 1
+                return CachedUser(entry['data'], self)
+            self.misses += 1
+
+        snapshot = self._load(user_id)
+        if snapshot is None:
+            return None
+        self._store(snapshot)
+        return CachedUser(snapshot, self)
+
+    def invalidate(self, user_id) -> None:
+        """Drop the snapshot after a profile or username change"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return
+        self._drop(user_id)
+        cluster.publish('identity_cache', user_id)
+
+    def _drop(self, user_id: int) -> None:
+        with self.lock:
+            if self.snapshots.pop(user_id, None):
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.snapshots.clear()
+
+    def record_orm_load(self) -> None:
+        with self.lock:
+            self.orm_loads += 1
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'cached_users': len(self.snapshots),
+                'hits': self.hits,
+                'misses': self.misses,
+                'orm_loads': self.orm_loads,
+                'invalidations': self.invalidations,
+                # Each hit skips the user lookup; ORM fallbacks cost one query back
+                'queries_saved': self.hits - self.orm_loads,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def _load(self, user_id: int) -> Optional[UserSnapshot]:
+        row = (
+            db.session.query(
+                User.id, User.username, User.email, User.avatar, User.language_preference,
+                User.theme, User.is_email_verified, User.deleted,
+            )
+            .filter(User.id == user_id)
+            .first()
+        )
+        if row is None:
+            return None
+        return UserSnapshot(
+            id=row.id,
+            username=row.username,
+            email=row.email,
+            avatar=row.avatar,
+            language_preference=row.language_preference,
+            theme=row.theme,
+            is_email_verified=bool(row.is_email_verified),
+            deleted=bool(row.deleted),
+        )
+
+    def _store(self, snapshot: UserSnapshot) -> None:
+        now = time.time()
+        with self.lock:
+            if len(self.snapshots) >= self.size_limit:
+                # Evict the oldest entries to make room
+                oldest = sorted(self.snapshots, key=lambda k: self.snapshots[k]['timestamp'])[:max(len(self.snapshots) // 10, 1)]
+                for uid in oldest:
+                    self.snapshots.pop(uid, None)
+            self.snapshots[snapshot.id] = {'data': snapshot, 'timestamp': now}
+
+
+# Global instance
+identity_cache = IdentityCache()
+cluster.subscribe('identity_cache', identity_cache._drop)
+
+
+def _mark_changed(target, user_id) -> None:
+    session = object_session(target)
+    if session is not None and user_id is not None:
+        session.info.setdefault('identity_changed', set()).add(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    _mark_changed(target, target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    # Invalidate only after commit so a concurrent miss cannot re-cache the old row
+    for user_id in session.info.pop('identity_changed', ()):
+        identity_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, *_):
+    session.info.pop('identity_changed', None)
+
+DEFAULT_KARMA = {
+    "user_karma": 0,
+    "comments_count": 0,
+    "comments_karma": 0,
+    "posts_count": 0,
+    "posts_karma": 0,
+}
+
+
+def serialize_users(users: List[User], include_all: bool = False) -> List[dict]:
+    """Serialize many users with one karma, one subscription tier and one wallet query"""
+    from yuuzone.coins.models import UserWallet
+    from yuuzone.subscriptions.models import UserSubscription, UserTier
+
+    ids = [user.id for user in users]
+    if not ids:
+        return []
+
+    karma = {row.user_id: row.as_dict() for row in UsersKarma.query.filter(UsersKarma.user_id.in_(ids))}
+
+    tiers: Dict[int, List[str]] = {}
+    try:
+        tier_rows = (
+            db.session.query(UserSubscription.user_id, UserTier.slug)
+            .join(UserTier, UserTier.id == UserSubscription.tier_id)
+            .filter(
+                UserSubscription.user_id.in_(ids),
+                UserSubscription.is_active == True,
+                UserSubscription.expires_at > datetime.now(timezone.utc),
+            )
+            .order_by(UserSubscription.id)
+        )
+        for user_id, slug in tier_rows:
+            if slug:
+                tiers.setdefault(user_id, []).append(slug)
+    except Exception as e:
+        logger.error(f"Error loading subscription tiers for {len(ids)} users: {e}")
+
+    # Wallets are created by the coin write paths; a user without one simply has no coins yet
+    wallets = {wallet.user_id: wallet.as_dict() for wallet in UserWallet.query.filter(UserWallet.user_id.in_(ids))}
+
+    result = []
+    for user in users:
+        data = {
+            "username": user.username,
+            "avatar": user.avatar,
+            "bio": user.bio,
+            "language_preference": user.language_preference,
+            "theme": user.theme,
+            "registrationDate": user.registration_date,
+            "karma": karma.get(user.id, dict(DEFAULT_KARMA)),
+            "deleted": user.deleted,
+            "subscription_types": tiers.get(user.id, []),
+            "wallet": wallets.get(user.id, {"coin_balance": 0}),
+        }
+        if include_all:
+            data["id"] = user.id
+        result.append(data)
+    return result
+
+
+def iter_user_pages(after_id: int = 0, limit: int = 100, chunk_size: int = 100) -> Iterator[List[dict]]:
+    """Keyset-paged listing of non-deleted users, streamed from the database in serialized chunks"""
+    result = db.session.execute(
+        select(User)
+        .where(User.deleted == False, User.id > after_id)
+        .order_by(User.id)
+        .limit(limit)
+        .execution_options(yield_per=chunk_size)
+    )
+    for chunk in result.scalars().partitions():
+        yield serialize_users(chunk, include_all=True)
@@ -0,0 +1,446 @@
+"""
+Account Deletion Pipeline
+Removes a deleted account's data in bounded batches off the request path.
+Progress is stored on the job row, so an interrupted job resumes where it stopped.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOUDINARY_BATCH = 100  # Cloudinary's limit for delete_resources
+
+
+class Stage(NamedTuple):
+    name: str
+    model: type
+    column: str  # Column holding the deleted user's id
+    touches: Tuple[str, ...] = ()  # Columns whose values need cache invalidation after the batch
+    media_column: Optional[str] = None  # Legacy single-media column on the row
+    media_fk: Optional[str] = None  # Media table column pointing at the row
+    modes: Tuple[str, ...] = ("purge", "anonymize")
+
+
+def build_stages() -> List[Stage]:
+    """Ordered deletion stages; models are imported lazily to avoid import cycles"""
+    from yuuzone.comments.models import Comments
+    from yuuzone.messages.models import Conversation, Messages
+    from yuuzone.models import UserRole
+    from yuuzone.posts.models import Posts, SavedPosts
+    from yuuzone.reactions.models import Reactions
+    from yuuzone.subthreads.models import Subscription, SubthreadBan
+    from yuuzone.users.models import UserBlock
+
+    return [
+        Stage("roles", UserRole, "user_id", touches=("subthread_id",)),
+        Stage("subscriptions", Subscription, "user_id", touches=("subthread_id",)),
+        Stage("bans", SubthreadBan, "user_id"),
+        Stage("bans_issued", SubthreadBan, "banned_by", touches=("user_id",)),
+        Stage("reactions", Reactions, "user_id"),
+        Stage("saved", SavedPosts, "user_id"),
+        Stage("conversations_low", Conversation, "user_low_id"),
+        Stage("conversations_high", Conversation, "user_high_id"),
+        Stage("messages_sent", Messages, "sender_id"),
+        Stage("messages_received", Messages, "receiver_id"),
+        Stage("blocks_made", UserBlock, "blocker_id"),
+        Stage("blocks_received", UserBlock, "blocked_id"),
+        Stage("comments", Comments, "user_id", media_column="media", media_fk="comment_id", modes=("purge",)),
+        Stage("posts", Posts, "user_id", media_column="media", media_fk="post_id", modes=("purge",)),
+    ]
+
+
+def cloudinary_asset(url: Optional[str], cloud_name: Optional[str], default_avatar: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """(resource_type, public_id) for a URL hosted on our Cloudinary account, None for anything else"""
+    prefix = f"https://res.cloudinary.com/{cloud_name}/"
+    if not url or not cloud_name or not url.startswith(prefix) or url == default_avatar:
+        return None
+    resource_type = url[len(prefix):].split("/", 1)[0]
+    public_id = url.rsplit("/", 1)[-1]
+    if "." in public_id:
+        public_id = public_id.rsplit(".", 1)[0]
+    return (resource_type if resource_type in ("image", "video") else "image"), public_id
+
+
+class AccountDeleter:
+    """Background worker that runs account deletion jobs in small committed batches"""
+
+    def __init__(self, app=None, batch_size: int = 500, pause_ms: int = 50,
+                 max_attempts: int = 5, lease_seconds: int = 300, rescan_interval: int = 60):
+        self.app = app
+        self.batch_size = batch_size
+        self.pause = pause_ms / 1000  # Yield between batches so request traffic keeps the database
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds  # A running job untouched this long is abandoned; also the retry backoff
+        self.rescan_interval = rescan_interval
+        self.jobs: "queue.Queue[Optional[int]]" = queue.Queue()
+        self.thread = None
+        self.running = False
+        self.active_job: Optional[int] = None
+        self.assets_deferred = False  # Set after a failed Cloudinary call so the rest of the run skips it
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.rows_deleted = 0
+        self.assets_deleted = 0
+        self.last_batch_ms: Optional[float] = None
+        self.max_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+
+    def start(self, app):
+        self.app = app
+        if self.thread is None or not self.thread.is_alive():
+            self.running = True
+            self.thread = threading.Thread(target=self._worker_loop, daemon=True)
+            self.thread.start()
+            logger.info("Account deletion worker started")
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.jobs.put(None)  # Wake the worker so it can exit
+            self.thread.join(timeout=5)
+            logger.info("Account deletion worker stopped")
+
+    def enqueue(self, job_id: int) -> None:
+        """Hand a committed job to the worker; unqueued jobs are still picked up by the periodic rescan"""
+        self.jobs.put(job_id)
+
+    def _worker_loop(self):
+        self._rescan()
+        while self.running:
+            try:
+                job_id = self.jobs.get(timeout=self.rescan_interval)
+            except queue.Empty:
+                self._rescan()
+                continue
+            if job_id is None:
+                continue
+            self._run_job(job_id)
+
+    def _rescan(self):
+        """Queue unfinished jobs, including ones interrupted by a restart"""
+        try:
+            with self.app.app_context():
+                from yuuzone import db
+                from yuuzone.users.models import AccountDeletionJob
+                rows = (
+                    db.session.query(AccountDeletionJob.id)
+                    .filter(AccountDeletionJob.status != "done", AccountDeletionJob.attempts < self.max_attempts)
+                    .order_by(AccountDeletionJob.id)
+                    .all()
+                )
+                db.session.remove()
+            for row in rows:
+                self.jobs.put(row.id)
+        except Exception as e:
+            logger.error(f"Failed to scan for pending account deletion jobs: {e}")
+
+    def _claim(self, job_id: int):
+        """Mark the job running unless it was touched within the lease (held by a worker, or failed recently)"""
+        from sqlalchemy import or_
+        from yuuzone import db
+        from yuuzone.users.models import AccountDeletionJob
+
+        now = datetime.now(timezone.utc)
+        claimed = AccountDeletionJob.query.filter(
+            AccountDeletionJob.id == job_id,
+            AccountDeletionJob.status != "done",
+            AccountDeletionJob.attempts < self.max_attempts,
+            or_(AccountDeletionJob.status == "pending",
+                AccountDeletionJob.updated_at < now - timedelta(seconds=self.lease_seconds)),
+        ).update({
+            AccountDeletionJob.status: "running",
+            AccountDeletionJob.attempts: AccountDeletionJob.attempts + 1,
+            AccountDeletionJob.updated_at: now,
+        }, synchronize_session=False)
+        db.session.commit()
+        return db.session.get(AccountDeletionJob, job_id) if claimed else None
+
+    def _run_job(self, job_id: int):
+        with self.app.app_context():
+            from yuuzone import db
+            try:
+                job = self._claim(job_id)
+                if job is None:
+                    return
+                self.active_job = job_id
+                self.assets_deferred = False
+                self._process(job)
+                job.status = "done"
+                job.stage = None
+                job.error = None
+                job.finished_at = datetime.now(timezone.utc)
+                db.session.commit()
+                self.processed += 1
+                logger.info(f"Account deletion job {job.id} finished for user {job.user_id}: {job.rows_deleted} rows, {job.assets_deleted} assets")
+            except Exception as e:
+                db.session.rollback()
+                self.failed += 1
+                logger.error(f"Account deletion job {job_id} failed: {e}")
+                self._mark_failed(job_id, str(e))
+            finally:
+                self.active_job = None
+                db.session.remove()
+
+    def _mark_failed(self, job_id: int, error: str):
+        from yuuzone import db
+        from yuuzone.users.models import AccountDeletionJob
+        try:
+            AccountDeletionJob.query.filter(AccountDeletionJob.id == job_id).update({
+                AccountDeletionJob.status: "failed",
+                AccountDeletionJob.error: error[:1000],
+                AccountDeletionJob.updated_at: datetime.now(timezone.utc),
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to record failure of account deletion job {job_id}: {e}")
+
+    def _process(self, job):
+        from yuuzone.auth.permissions import permission_index
+        from yuuzone.subthreads.service import access_cache
+
+        if job.mode == "purge":
+            self._set_stage(job, "ownership")
+            while self._transfer_ownership_batch(job):
+                self._pause()
+            permission_index.invalidate()
+
+        for stage in build_stages():
+            if job.mode not in stage.modes:
+                continue
+            self._set_stage(job, stage.name)
+            while self._delete_batch(job, stage):
+                self._pause()
+            if stage.name == "roles":
+                permission_index.invalidate()
+        access_cache.invalidate(job.user_id)
+
+        if job.mode == "purge":
+            self._set_stage(job, "user")
+            self._delete_user(job)
+
+        self._set_stage(job, "assets")
+        self._flush_assets(job, force=True)
+
+    def _pause(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def _set_stage(self, job, name: str):
+        from yuuzone import db
+        if job.stage != name:
+            job.stage = name
+            job.updated_at = datetime.now(timezone.utc)
+            db.session.commit()
+
+    def _record_batch(self, job, rows: int, assets: Iterable[str], started: float):
+        """Add the batch to the job's progress; committed in the same transaction as the delete"""
+        job.rows_deleted = (job.rows_deleted or 0) + rows
+        new_assets = [url for url in assets if url]
+        if new_assets:
+            job.pending_assets = json.dumps(json.loads(job.pending_assets or "[]") + new_assets)
+        job.updated_at = datetime.now(timezone.utc)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.rows_deleted += rows
+        self.last_batch_ms = elapsed_ms
+        self.max_batch_ms = max(self.max_batch_ms, elapsed_ms)
+        self.total_batch_ms += elapsed_ms
+
+    def _transfer_ownership_batch(self, job) -> bool:
+        """Hand admin rights of a batch of owned subthreads to their longest-serving mod"""
+        from sqlalchemy import case, func
+        from yuuzone import db
+        from yuuzone.auth.permissions import permission_index
+        from yuuzone.models import UserRole
+        from yuuzone.subthreads.models import Subthread
+        from yuuzone.subthreads.service import subthread_header_cache
+
+        admin_id = permission_index.role_id("admin")
+        mod_id = permission_index.role_id("mod")
+        if admin_id is None:
+            return False
+
+        started = time.perf_counter()
+        owned = [
+            row.subthread_id for row in
+            db.session.query(UserRole.subthread_id)
+            .filter(UserRole.user_id == job.user_id, UserRole.role_id == admin_id, UserRole.subthread_id.isnot(None))
+            .order_by(UserRole.id)
+            .limit(self.batch_size)
+        ]
+        if not owned:
+            return False
+
+        successor_rows = (
+            db.session.query(func.min(UserRole.id))
+            .filter(UserRole.subthread_id.in_(owned), UserRole.role_id == mod_id, UserRole.user_id != job.user_id)
+            .group_by(UserRole.subthread_id)
+        )
+        successors = {
+            row.subthread_id: row.user_id for row in
+            db.session.query(UserRole.subthread_id, UserRole.user_id).filter(UserRole.id.in_(successor_rows.scalar_subquery()))
+        }
+
+        if successors:
+            # Promote the mod row in place instead of deleting it and inserting an admin row
+            UserRole.query.filter(UserRole.id.in_(successor_rows.scalar_subquery())).update(
+                {UserRole.role_id: admin_id}, synchronize_session=False)
+            Subthread.query.filter(Subthread.id.in_(list(successors))).update(
+                {Subthread.created_by: case(successors, value=Subthread.id)}, synchronize_session=False)
+        orphaned = [sid for sid in owned if sid not in successors]
+        if orphaned:
+            Subthread.query.filter(Subthread.id.in_(orphaned)).update({Subthread.created_by: None}, synchronize_session=False)
+
+        # Dropping the admin rows in the same transaction keeps a resumed run from promoting a second mod
+        deleted = UserRole.query.filter(
+            UserRole.user_id == job.user_id, UserRole.role_id == admin_id, UserRole.subthread_id.in_(owned),
+        ).delete(synchronize_session=False)
+        self._record_batch(job, deleted, (), started)
+        db.session.commit()
+
+        for sid in owned:
+            subthread_header_cache.invalidate(sid)
+        return True
+
+    def _delete_batch(self, job, stage: Stage) -> bool:
+        """DELETE ... WHERE id IN (batch) for one stage; False when nothing is left"""
+        from yuuzone import db
+        from yuuzone.subthreads.service import access_cache, subthread_header_cache
+
+        started = time.perf_counter()
+        model = stage.model
+        columns = [model.id] + [getattr(model, name) for name in stage.touches]
+        if stage.media_column:
+            columns.append(getattr(model, stage.media_column))
+        rows = (
+            db.session.query(*columns)
+            .filter(getattr(model, stage.column) == job.user_id)
+            .order_by(model.id)
+            .limit(self.batch_size)
+            .all()
+        )
+        if not rows:
+            return False
+
+        ids = [row.id for row in rows]
+        assets = self._collect_media(stage, rows, ids)
+        db.session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        self._record_batch(job, len(ids), assets, started)
+        db.session.commit()
+
+        # Bulk deletes skip the mapper events that normally keep these caches in step
+        if "subthread_id" in stage.touches:
+            for sid in {row.subthread_id for row in rows}:
+                subthread_header_cache.invalidate(sid)
+        if "user_id" in stage.touches:
+            for uid in {row.user_id for row in rows}:
+                access_cache.invalidate(uid)
+
+        if not self.assets_deferred and len(json.loads(job.pending_assets or "[]")) >= CLOUDINARY_BATCH:
+            try:
+                self._flush_assets(job)
+            except Exception as e:
+                # Keep purging rows; the assets stay on the job and the final stage retries them
+                db.session.rollback()
+                self.assets_deferred = True
+                logger.warning(f"Deferring Cloudinary cleanup for account deletion job {job.id}: {e}")
+        return len(ids) == self.batch_size
+
+    def _collect_media(self, stage: Stage, rows, ids: List[int]) -> List[str]:
+        """Media URLs of the batch; Media rows have no FK cascade in the schema, so they are removed here too"""
+        if not stage.media_fk:
+            return []
+        from yuuzone import db
+        from yuuzone.posts.models import Media
+
+        urls = [getattr(row, stage.media_column) for row in rows]
+        fk = getattr(Media, stage.media_fk)
+        urls.extend(row.media_url for row in db.session.query(Media.media_url).filter(fk.in_(ids)))
+        db.session.query(Media).filter(fk.in_(ids)).delete(synchronize_session=False)
+        return urls
+
+    def _delete_user(self, job):
+        """Remove the user row; the remaining small per-user tables go with it through ON DELETE CASCADE"""
+        from yuuzone import db
+        from yuuzone.users.models import User
+        from yuuzone.users.service import identity_cache
+
+        started = time.perf_counter()
+        avatar = db.session.query(User.avatar).filter(User.id == job.user_id).scalar()
+        deleted = User.query.filter(User.id == job.user_id).delete(synchronize_session=False)
+        self._record_batch(job, deleted, [avatar], started)
+        db.session.commit()
+        identity_cache.invalidate(job.user_id)
+
+    def _flush_assets(self, job, force: bool = False):
+        """Delete pending Cloudinary assets in batches; on failure they stay on the job for the next attempt"""
+        from yuuzone import db
+
+        pending = json.loads(job.pending_assets or "[]")
+        if not pending or (not force and len(pending) < CLOUDINARY_BATCH):
+            return
+
+        cloud_name = self.app.config.get("CLOUDINARY_NAME")
+        default_avatar = self.app.config.get("DEFAULT_AVATAR_URL")
+        grouped: Dict[str, Set[str]] = {}
+        for url in pending:
+            asset = cloudinary_asset(url, cloud_name, default_avatar)
+            if asset:
+                grouped.setdefault(asset[0], set()).add(asset[1])
+
+        deleted = 0
+        if grouped:
+            import cloudinary.api
+            for resource_type, public_ids in grouped.items():
+                public_ids = sorted(public_ids)
+                for i in range(0, len(public_ids), CLOUDINARY_BATCH):
+                    chunk = public_ids[i:i + CLOUDINARY_BATCH]
+                    cloudinary.api.delete_resources(chunk, resource_type=resource_type)
+                    deleted += len(chunk)
+
+        job.pending_assets = None
+        job.assets_deleted = (job.assets_deleted or 0) + deleted
+        job.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+        self.assets_deleted += deleted
+
+    def get_status(self) -> Dict:
+        return {
+            "running": self.running,
+            "queued": self.jobs.qsize(),
+            "active_job": self.active_job,
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "rows_deleted": self.rows_deleted,
+            "assets_deleted": self.assets_deleted,
+            "last_batch_ms": round(self.last_batch_ms, 2) if self.last_batch_ms is not None else None,
+            "max_batch_ms": round(self.max_batch_ms, 2),
+            "avg_batch_ms": round(self.total_batch_ms / self.batches, 2) if self.batches else None,
+        }
+
+
+def _create_account_deleter() -> AccountDeleter:
+    from yuuzone.config import ACCOUNT_DELETION_BATCH_SIZE, ACCOUNT_DELETION_PAUSE_MS
+    return AccountDeleter(batch_size=ACCOUNT_DELETION_BATCH_SIZE, pause_ms=ACCOUNT_DELETION_PAUSE_MS)
+
+
+# Global instance
+account_deleter = _create_account_deleter()
+
+
+def init_account_deleter(app):
+    """Start the account deletion worker for the given app"""
+    account_deleter.start(app)
+    import atexit
+    atexit.register(account_deleter.stop)
+    return account_deleter
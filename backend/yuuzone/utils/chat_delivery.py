@@ -0,0 +1,69 @@
+"""
+Chat Delivery Router
+Sends a chat event (new, edited or deleted message, media ready) once to every socket in the chat room
+or in either participant's user room. The socket.io manager takes the union of the rooms, encodes the
+packet once and writes it once per socket; with a message queue each worker resolves its own sockets.
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from yuuzone.utils.rooms import chat_room, user_room
+
+logger = logging.getLogger(__name__)
+
+
+def chat_targets(user_ids: Iterable, usernames: Optional[Sequence[str]] = None) -> List[str]:
+    """The chat room of two usernames (when both are known) followed by each user's own room"""
+    rooms = [chat_room(*usernames)] if usernames and len(usernames) == 2 and all(usernames) else []
+    rooms.extend(user_room(user_id) for user_id in dict.fromkeys(user_ids) if user_id is not None)
+    return rooms
+
+
+class ChatDeliveryRouter:
+    """One emit per chat event to the union of its rooms, with counts of the duplicates that saves"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events: Dict[str, int] = {}
+        self.deliveries = 0  # Sockets on this worker that received an event
+        self.duplicates_avoided = 0  # Extra copies one emit per room would have sent them
+
+    @staticmethod
+    def _local_fanout(socketio, rooms: List[str]):
+        """(room memberships, distinct sockets) among this worker's sockets in `rooms`"""
+        namespace = socketio.server.manager.rooms.get('/', {})
+        members = [namespace[room] for room in rooms if room in namespace]
+        return sum(len(sids) for sids in members), len(set().union(*members)) if members else 0
+
+    def deliver(self, event: str, data: Dict, user_ids: Iterable, usernames: Optional[Sequence[str]] = None) -> int:
+        """Send `event` to the chat and both users' rooms; returns the local sockets reached"""
+        from yuuzone.socketio_app import socketio
+
+        rooms = chat_targets(user_ids, usernames)
+        if not rooms:
+            return 0
+        try:
+            memberships, recipients = self._local_fanout(socketio, rooms)
+        except Exception as e:
+            logger.debug(f"Could not count recipients of {event}: {e}")
+            memberships = recipients = 0
+        socketio.emit(event, data, to=rooms)
+        with self.lock:
+            self.events[event] = self.events.get(event, 0) + 1
+            self.deliveries += recipients
+            self.duplicates_avoided += memberships - recipients
+        return recipients
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'events': dict(self.events),
+                'deliveries': self.deliveries,
+                'duplicates_avoided': self.duplicates_avoided,
+            }
+
+
+# Global instance
+chat_delivery = ChatDeliveryRouter()
@@ -0,0 +1,399 @@
+"""
+Cluster Coordination
+State shared by every worker process: the Socket.IO message queue, rate-limit windows,
+cache invalidations and connection counts. Backend is picked from MESSAGE_QUEUE_URL.
+"""
+
+import json
+import logging
+import os
+import pickle
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """In-process stand-in for RedisManager: managers on the same channel in one process share emits"""
+
+    name = 'local'
+    inboxes: Dict[str, List[queue.Queue]] = defaultdict(list)
+    inboxes_lock = threading.Lock()
+
+    def __init__(self, channel: str = 'socketio', write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.inbox: Optional[queue.Queue] = None
+        if not write_only:
+            self.inbox = queue.Queue()
+            with self.inboxes_lock:
+                self.inboxes[channel].append(self.inbox)
+
+    def _publish(self, data):
+        message = pickle.dumps(data)
+        with self.inboxes_lock:
+            inboxes = list(self.inboxes[self.channel])
+        for inbox in inboxes:
+            inbox.put(message)
+
+    def _listen(self):
+        while True:
+            yield self.inbox.get()
+
+
+class LocalBackend:
+    """Single-process backend; with memory:// every LocalBackend in the process acts as one cluster"""
+
+    name = 'local'
+    peers: List['LocalBackend'] = []
+    peers_lock = threading.Lock()
+
+    def __init__(self, shared: bool = False, channel: str = 'socketio'):
+        self.shared = shared
+        self.channel = channel
+        self.lock = threading.Lock()
+        self.windows: Dict[str, deque] = defaultdict(deque)
+        self.entries: Dict[str, deque] = defaultdict(deque)
+        self.counts: Dict[str, int] = {}
+        self.group_counts: Dict[str, Dict[str, int]] = {}
+        self.handlers: Dict[str, Callable] = {}
+        self.worker_id = uuid.uuid4().hex[:8]
+        if shared:
+            with self.peers_lock:
+                self.peers.append(self)
+
+    def _cluster(self) -> List['LocalBackend']:
+        if not self.shared:
+            return [self]
+        with self.peers_lock:
+            return list(self.peers)
+
+    def _owner(self) -> 'LocalBackend':
+        # Shared windows live on the first peer so every "worker" sees the same state
+        return self._cluster()[0]
+
+    def hit_window(self, key: str, limit: int, window: float, record: bool = True) -> Tuple[bool, int, float]:
+        """Sliding-window log: (allowed, attempts in window, seconds until the oldest attempt expires)"""
+        owner = self._owner()
+        now = time.time()
+        with owner.lock:
+            attempts = owner.windows[key]
+            while attempts and attempts[0] <= now - window:
+                attempts.popleft()
+            allowed = len(attempts) < limit
+            if record and allowed:
+                attempts.append(now)
+            if not attempts:
+                owner.windows.pop(key, None)
+                return allowed, 0, 0.0
+            return allowed, len(attempts), max(0.0, attempts[0] + window - now)
+
+    def recent_entries(self, key: str, window: float) -> List[Dict]:
+        owner = self._owner()
+        cutoff = time.time() - window
+        with owner.lock:
+            entries = owner.entries[key]
+            while entries and entries[0][0] <= cutoff:
+                entries.popleft()
+            return [data for _timestamp, data in entries]
+
+    def add_entry(self, key: str, data: Dict, window: float) -> None:
+        owner = self._owner()
+        with owner.lock:
+            owner.entries[key].append((time.time(), data))
+
+    def publish(self, topic: str, payload) -> None:
+        for peer in self._cluster():
+            if peer is not self and topic in peer.handlers:
+                try:
+                    peer.handlers[topic](payload)
+                except Exception as e:
+                    logger.error(f"Error handling cluster message {topic}: {e}")
+
+    def subscribe(self, topic: str, handler: Callable) -> None:
+        self.handlers[topic] = handler
+
+    def report_count(self, name: str, value: int) -> int:
+        """Store this worker's value and return the sum over the other workers"""
+        self.counts[name] = value
+        return sum(peer.counts.get(name, 0) for peer in self._cluster() if peer is not self)
+
+    def report_counts(self, group: str, counts: Dict[str, int], ttl: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """Replace this worker's counts in `group` and return every other worker's, by worker id"""
+        self.group_counts[group] = dict(counts)
+        return {
+            peer.worker_id: dict(peer.group_counts.get(group, {}))
+            for peer in self._cluster() if peer is not self
+        }
+
+    def socketio_manager(self):
+        # A single process needs no queue; memory:// gets the in-process stand-in
+        from yuuzone.utils.replay_log import ReplayLocalPubSubManager, ReplayManager
+        return ReplayLocalPubSubManager(channel=self.channel) if self.shared else ReplayManager()
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def get_status(self) -> Dict:
+        return {'backend': 'memory' if self.shared else self.name, 'workers': len(self._cluster())}
+
+
+# Sliding-window log on a sorted set; uses the server clock so every worker agrees on the window
+HIT_WINDOW_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < limit then
+    allowed = 1
+    if ARGV[3] == '1' then
+        redis.call('ZADD', KEYS[1], now, ARGV[4])
+        count = count + 1
+    end
+end
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+local reset = 0
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+return {allowed, count, tostring(reset)}
+"""
+
+
+class RedisBackend:
+    """Redis (or any Redis-protocol server) shared by all workers"""
+
+    name = 'redis'
+
+    def __init__(self, url: str, channel: str = 'socketio', prefix: str = 'yuuzone',
+                 report_ttl: float = 10.0):
+        import redis
+        self.url = url
+        self.channel = channel
+        self.prefix = prefix
+        self.report_ttl = report_ttl  # Counts from workers silent this long are dropped
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Bounded timeouts: these calls sit on request paths and must not hang on an unreachable queue
+        self.redis = redis.Redis.from_url(url, socket_connect_timeout=2, socket_timeout=2)
+        self.listener_redis = redis.Redis.from_url(url, socket_connect_timeout=2, socket_keepalive=True)
+        self.errors = (redis.RedisError, OSError)
+        self.hit_script = self.redis.register_script(HIT_WINDOW_SCRIPT)
+        self.handlers: Dict[str, Callable] = {}
+        self.reported = set()
+        self.reported_groups = set()
+        self.attempt_seq = 0
+        self.published = 0
+        self.received = 0
+        self.listener_thread = None
+        self.is_running = False
+
+    def _key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + tuple(str(part) for part in parts))
+
+    def hit_window(self, key: str, limit: int, window: float, record: bool = True) -> Tuple[bool, int, float]:
+        """Sliding-window log: (allowed, attempts in window, seconds until the oldest attempt expires)"""
+        self.attempt_seq += 1
+        try:
+            allowed, count, reset = self.hit_script(
+                keys=[self._key('rl', key)],
+                args=[window, limit, '1' if record else '0', f"{self.worker_id}:{self.attempt_seq}"],
+            )
+        except self.errors as e:
+            # Fail open: an unreachable queue should not turn every limited route into a 500
+            logger.error(f"Rate-limit window unavailable: {e}")
+            return True, 0, 0.0
+        return bool(allowed), int(count), max(0.0, float(reset))
+
+    def recent_entries(self, key: str, window: float) -> List[Dict]:
+        redis_key = self._key('recent', key)
+        cutoff = time.time() - window
+        try:
+            pipe = self.redis.pipeline()
+            pipe.zremrangebyscore(redis_key, '-inf', cutoff)
+            pipe.zrange(redis_key, 0, -1)
+            _, raw_entries = pipe.execute()
+        except self.errors as e:
+            logger.error(f"Recent submissions unavailable: {e}")
+            return []
+        return [json.loads(raw) for raw in raw_entries]
+
+    def add_entry(self, key: str, data: Dict, window: float) -> None:
+        redis_key = self._key('recent', key)
+        entry = json.dumps({'id': uuid.uuid4().hex, **data}, default=str)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.zadd(redis_key, {entry: time.time()})
+            pipe.pexpire(redis_key, int(window * 1000))
+            pipe.execute()
+        except self.errors as e:
+            logger.error(f"Could not record submission: {e}")
+
+    def publish(self, topic: str, payload) -> None:
+        message = json.dumps({'origin': self.worker_id, 'topic': topic, 'payload': payload})
+        try:
+            self.redis.publish(self._key('events'), message)
+            self.published += 1
+        except self.errors as e:
+            # Peers fall back to their cache TTLs
+            logger.error(f"Could not publish {topic}: {e}")
+
+    def subscribe(self, topic: str, handler: Callable) -> None:
+        self.handlers[topic] = handler
+
+    def _listen_loop(self):
+        while self.is_running:
+            try:
+                pubsub = self.listener_redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._key('events'))
+                for message in pubsub.listen():
+                    if not self.is_running:
+                        break
+                    event = json.loads(message['data'])
+                    handler = self.handlers.get(event.get('topic'))
+                    if handler is None or event.get('origin') == self.worker_id:
+                        continue
+                    self.received += 1
+                    try:
+                        handler(event.get('payload'))
+                    except Exception as e:
+                        logger.error(f"Error handling cluster message {event.get('topic')}: {e}")
+            except Exception as e:
+                logger.error(f"Cluster listener error, reconnecting: {e}")
+                time.sleep(1)
+
+    def report_count(self, name: str, value: int) -> int:
+        """Store this worker's value and return the sum over the other live workers"""
+        redis_key = self._key('counts', name)
+        self.reported.add(name)
+        now = time.time()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(redis_key, self.worker_id, f"{value}:{now}")
+            pipe.hgetall(redis_key)
+            _, fields = pipe.execute()
+        except self.errors as e:
+            logger.error(f"Could not report {name}: {e}")
+            return 0
+        others = 0
+        stale = []
+        for worker_id, raw in fields.items():
+            worker_id = worker_id.decode()
+            if worker_id == self.worker_id:
+                continue
+            count, reported_at = raw.decode().split(':')
+            if now - float(reported_at) > self.report_ttl:
+                stale.append(worker_id)
+            else:
+                others += int(count)
+        if stale:
+            try:
+                self.redis.hdel(redis_key, *stale)
+            except self.errors as e:
+                # Stale fields are skipped on read anyway; the next report retries
+                logger.error(f"Could not drop stale {name} counts: {e}")
+        return others
+
+    def report_counts(self, group: str, counts: Dict[str, int], ttl: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """Replace this worker's counts in `group` and return every other live worker's, by worker id
+
+        Each worker keeps one hash per group that expires unless rewritten within `ttl`, so names it
+        stops reporting and workers that die leave nothing behind. Two round trips whatever the number of names.
+        """
+        ttl = ttl or self.report_ttl
+        workers_key = self._key('counts', group, 'workers')
+        own_key = self._key('counts', group, self.worker_id)
+        self.reported_groups.add(group)
+        now = time.time()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(own_key)
+            if counts:
+                pipe.hset(own_key, mapping=counts)
+                pipe.pexpire(own_key, int(ttl * 1000))
+            pipe.zadd(workers_key, {self.worker_id: now})
+            pipe.zremrangebyscore(workers_key, '-inf', now - ttl)
+            pipe.pexpire(workers_key, int(ttl * 1000))
+            pipe.zrange(workers_key, 0, -1)
+            peers = [worker_id.decode() for worker_id in pipe.execute()[-1] if worker_id.decode() != self.worker_id]
+            if not peers:
+                return {}
+            pipe = self.redis.pipeline()
+            for worker_id in peers:
+                pipe.hgetall(self._key('counts', group, worker_id))
+            fields = pipe.execute()
+        except self.errors as e:
+            logger.error(f"Could not report {group} counts: {e}")
+            return {}
+        return {
+            worker_id: {name.decode(): int(value) for name, value in values.items()}
+            for worker_id, values in zip(peers, fields)
+        }
+
+    def socketio_manager(self):
+        from yuuzone.utils.replay_log import ReplayRedisManager
+        return ReplayRedisManager(self.url, channel=self.channel)
+
+    def start(self) -> None:
+        if self.listener_thread is None or not self.listener_thread.is_alive():
+            self.is_running = True
+            self.listener_thread = threading.Thread(target=self._listen_loop, daemon=True)
+            self.listener_thread.start()
+            logger.info(f"Cluster listener started ({self.worker_id})")
+
+    def stop(self) -> None:
+        self.is_running = False
+        # Withdraw this worker's counts instead of waiting for them to go stale
+        try:
+            for name in self.reported:
+                self.redis.hdel(self._key('counts', name), self.worker_id)
+            for group in self.reported_groups:
+                self.redis.delete(self._key('counts', group, self.worker_id))
+                self.redis.zrem(self._key('counts', group, 'workers'), self.worker_id)
+        except Exception as e:
+            logger.debug(f"Could not withdraw worker counts: {e}")
+
+    def get_status(self) -> Dict:
+        return {
+            'backend': self.name,
+            'worker_id': self.worker_id,
+            'listening': bool(self.listener_thread and self.listener_thread.is_alive()),
+            'published': self.published,
+            'received': self.received,
+        }
+
+
+def _create_cluster():
+    from yuuzone.config import MESSAGE_QUEUE_URL, SOCKETIO_CHANNEL, CLUSTER_KEY_PREFIX
+    if not MESSAGE_QUEUE_URL:
+        return LocalBackend(channel=SOCKETIO_CHANNEL)
+    if MESSAGE_QUEUE_URL.startswith('memory://'):
+        return LocalBackend(shared=True, channel=SOCKETIO_CHANNEL)
+    if MESSAGE_QUEUE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(MESSAGE_QUEUE_URL, channel=SOCKETIO_CHANNEL, prefix=CLUSTER_KEY_PREFIX)
+    raise ValueError(f"Unsupported MESSAGE_QUEUE_URL scheme: {MESSAGE_QUEUE_URL}")
+
+
+# Global instance
+cluster = _create_cluster()
+
+
+def init_cluster(app):
+    """Start listening for other workers' messages"""
+    cluster.start()
+    import atexit
+    atexit.register(cluster.stop)
+    return cluster
@@ -0,0 +1,263 @@
+"""
+Connection Registry
+Sharded table of live connections with heap-scheduled idle/age expiry and incrementally maintained counters.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEALTH_LOW = 20  # Connections below this score are expired on the next sweep
+
+HEALTH_BUCKETS = ('excellent', 'good', 'poor', 'critical')
+
+
+def _health_bucket(score: int) -> str:
+    if score >= 80:
+        return 'excellent'
+    if score >= 60:
+        return 'good'
+    if score >= 30:
+        return 'poor'
+    return 'critical'
+
+
+class ConnectionRecord:
+    """One live connection; timestamps are time.monotonic() seconds"""
+
+    __slots__ = ('id', 'type', 'created_at', 'last_activity', 'metadata', 'cleanup_callback',
+                 'health_score', 'error_count', 'seq')
+
+    def __init__(self, connection_id: str, connection_type: str, now: float,
+                 metadata: Optional[Dict] = None, cleanup_callback: Optional[Callable] = None):
+        self.id = connection_id
+        self.type = connection_type
+        self.created_at = now
+        self.last_activity = now
+        self.metadata = metadata or {}
+        self.cleanup_callback = cleanup_callback
+        self.health_score = 100
+        self.error_count = 0
+        self.seq = 0  # Sequence of the record's live heap entry; older entries are skipped
+
+
+class _Shard:
+    __slots__ = ('lock', 'records')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Insertion-ordered: the first record is the shard's oldest, the last its newest
+        self.records: Dict[str, ConnectionRecord] = {}
+
+
+class ConnectionRegistry:
+    """Live connections keyed by id, expired by idle time and age without scanning the table"""
+
+    def __init__(self, shards: int = 16, idle_timeout: float = 300, max_age: float = 3600):
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.shards = [_Shard() for _ in range(max(1, shards))]
+
+        # Expiry heap of (deadline, seq, connection_id); touches do not push, entries are re-checked when they fall due
+        self.heap: List[Tuple[float, int, str]] = []
+        self.heap_lock = threading.Lock()
+        self.seq = itertools.count(1)
+
+        # Counters updated on every change so stats never walk the table
+        self.counter_lock = threading.Lock()
+        self.total = 0
+        self.type_counts: Dict[str, int] = {}
+        self.health_counts: Dict[str, int] = {bucket: 0 for bucket in HEALTH_BUCKETS}
+        self.registered = 0
+        self.removed = 0
+        self.expired: Dict[str, int] = {}
+        self.rescheduled = 0
+
+    def _shard(self, connection_id: str) -> _Shard:
+        return self.shards[hash(connection_id) % len(self.shards)]
+
+    def _deadline(self, record: ConnectionRecord) -> float:
+        return min(record.created_at + self.max_age, record.last_activity + self.idle_timeout)
+
+    def _schedule(self, record: ConnectionRecord, deadline: float) -> None:
+        seq = next(self.seq)
+        record.seq = seq
+        with self.heap_lock:
+            heapq.heappush(self.heap, (deadline, seq, record.id))
+            # Removed connections leave their entries behind; rebuild once they outnumber live ones
+            if len(self.heap) > 2 * self.total + 1024:
+                self._compact()
+
+    def _compact(self) -> None:
+        live = []
+        for shard in self.shards:
+            with shard.lock:
+                live.extend((self._deadline(r), r.seq, r.id) for r in shard.records.values())
+        heapq.heapify(live)
+        self.heap = live
+
+    def _count(self, record: ConnectionRecord, delta: int) -> None:
+        with self.counter_lock:
+            self.total += delta
+            count = self.type_counts.get(record.type, 0) + delta
+            if count:
+                self.type_counts[record.type] = count
+            else:
+                self.type_counts.pop(record.type, None)
+            self.health_counts[_health_bucket(record.health_score)] += delta
+            if delta > 0:
+                self.registered += 1
+            else:
+                self.removed += 1
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __contains__(self, connection_id: str) -> bool:
+        return connection_id in self._shard(connection_id).records
+
+    def add(self, connection_id: str, connection_type: str, metadata: Optional[Dict] = None,
+            cleanup_callback: Optional[Callable] = None) -> ConnectionRecord:
+        """Register a connection, replacing any previous record with the same id"""
+        record = ConnectionRecord(connection_id, connection_type, time.monotonic(), metadata, cleanup_callback)
+        shard = self._shard(connection_id)
+        with shard.lock:
+            previous = shard.records.pop(connection_id, None)
+            shard.records[connection_id] = record
+        if previous is not None:
+            self._count(previous, -1)
+        self._count(record, 1)
+        self._schedule(record, self._deadline(record))
+        logger.debug(f"Connection registered: {connection_id} ({connection_type})")
+        return record
+
+    def touch(self, connection_id: str, health_score: Optional[int] = None) -> bool:
+        """Record activity and optionally a new health score"""
+        shard = self._shard(connection_id)
+        with shard.lock:
+            record = shard.records.get(connection_id)
+            if record is None:
+                return False
+            record.last_activity = time.monotonic()
+            if health_score is None:
+                return True
+            health_score = max(0, min(100, health_score))
+            old_bucket = _health_bucket(record.health_score)
+            record.health_score = health_score
+        new_bucket = _health_bucket(health_score)
+        if new_bucket != old_bucket:
+            with self.counter_lock:
+                self.health_counts[old_bucket] -= 1
+                self.health_counts[new_bucket] += 1
+        if health_score < HEALTH_LOW:
+            self._schedule(record, 0.0)
+        return True
+
+    def pop(self, connection_id: str) -> Optional[ConnectionRecord]:
+        """Remove and return a connection's record"""
+        shard = self._shard(connection_id)
+        with shard.lock:
+            record = shard.records.pop(connection_id, None)
+        if record is not None:
+            self._count(record, -1)
+        return record
+
+    def pop_expired(self) -> List[Tuple[ConnectionRecord, str]]:
+        """Remove connections past their idle, age or health limits; work is proportional to the entries due"""
+        now = time.monotonic()
+        expired = []
+        while True:
+            with self.heap_lock:
+                if not self.heap or self.heap[0][0] > now:
+                    break
+                _deadline, seq, connection_id = heapq.heappop(self.heap)
+
+            shard = self._shard(connection_id)
+            reason = None
+            with shard.lock:
+                record = shard.records.get(connection_id)
+                if record is None or record.seq != seq:
+                    continue  # Removed, or superseded by a newer entry
+                if now - record.created_at > self.max_age:
+                    reason = "max_age_exceeded"
+                elif record.health_score < HEALTH_LOW:
+                    reason = "health_score_low"
+                elif now - record.last_activity > self.idle_timeout:
+                    reason = "inactive"
+                if reason:
+                    del shard.records[connection_id]
+
+            if reason is None:
+                # Active since it was scheduled: push it back at its current deadline
+                self.rescheduled += 1
+                self._schedule(record, self._deadline(record))
+                continue
+            self._count(record, -1)
+            with self.counter_lock:
+                self.expired[reason] = self.expired.get(reason, 0) + 1
+            expired.append((record, reason))
+        return expired
+
+    def drain(self) -> List[ConnectionRecord]:
+        """Remove and return every record"""
+        drained = []
+        for shard in self.shards:
+            with shard.lock:
+                records = list(shard.records.values())
+                shard.records.clear()
+            drained.extend(records)
+        for record in drained:
+            self._count(record, -1)
+        with self.heap_lock:
+            self.heap = []
+        return drained
+
+    def _edge(self, newest: bool) -> Optional[ConnectionRecord]:
+        # Each shard's dict is in insertion order, so the global oldest/newest is one of len(shards) candidates
+        best = None
+        for shard in self.shards:
+            with shard.lock:
+                if not shard.records:
+                    continue
+                key = next(reversed(shard.records)) if newest else next(iter(shard.records))
+                record = shard.records[key]
+            if best is None or (record.created_at > best.created_at if newest else record.created_at < best.created_at):
+                best = record
+        return best
+
+    def get_stats(self) -> Dict:
+        now = time.monotonic()
+
+        def describe(record: Optional[ConnectionRecord]) -> Optional[Dict]:
+            if record is None:
+                return None
+            return {
+                'age_seconds': int(now - record.created_at),
+                'type': record.type,
+                'health_score': record.health_score,
+            }
+
+        with self.counter_lock:
+            stats = {
+                'total_connections': self.total,
+                'connection_types': dict(self.type_counts),
+                'health_distribution': dict(self.health_counts),
+                'registered': self.registered,
+                'removed': self.removed,
+                'expired': dict(self.expired),
+                'rescheduled': self.rescheduled,
+            }
+        with self.heap_lock:
+            stats['scheduled_entries'] = len(self.heap)
+        stats['oldest_connection'] = describe(self._edge(newest=False))
+        stats['newest_connection'] = describe(self._edge(newest=True))
+        return stats
+
+
+# Global instance
+connection_registry = ConnectionRegistry()
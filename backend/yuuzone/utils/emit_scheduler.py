@@ -0,0 +1,174 @@
+"""
+Emit Scheduler
+Buffers high-rate Socket.IO events per room for one tick, merges updates to the same entity
+and sends one frame per room per tick.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Event name clients unpack into the individual events of a multi-event frame
+BATCH_EVENT = 'batch'
+
+
+class EmitPolicy(NamedTuple):
+    """How buffered events of one type combine within a tick"""
+    key: Tuple[str, ...] = ()  # Payload fields identifying the entity; empty keeps every event
+    merge: str = 'latest'  # 'latest' keeps the newest payload, 'sum' adds sum_fields onto the buffered one
+    sum_fields: Tuple[str, ...] = ()
+
+
+DEFAULT_POLICIES: Dict[str, EmitPolicy] = {
+    # Vote payloads carry absolute counts, so only the newest per entity matters
+    'post_vote_updated': EmitPolicy(key=('post_id',)),
+    'comment_vote_updated': EmitPolicy(key=('comment_id',)),
+    'karma_updated': EmitPolicy(key=('user_id',)),
+    # Counter deltas add up
+    'subthread_stats_update': EmitPolicy(key=('subthread_id', 'stats_type'), merge='sum', sum_fields=('new_value',)),
+    'user_activity': EmitPolicy(key=('username', 'activity_type', 'subthread_id')),
+    # Post creation, updates and deletes are not listed: they go out immediately and in order
+}
+
+
+class EmitScheduler:
+    """Per-room buffers flushed by a background thread every tick"""
+
+    def __init__(self, tick_ms: int = 150, policies: Optional[Dict[str, EmitPolicy]] = None):
+        self.tick = tick_ms / 1000.0
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        self.rooms: Dict[Tuple[str, str], "OrderedDict[tuple, list]"] = {}
+        self.lock = threading.Lock()
+        self.sequence = itertools.count()
+        self.flush_thread = None
+        self.is_running = False
+        self.events_in = 0
+        self.events_merged = 0
+        self.events_immediate = 0
+        self.frames_sent = 0
+        self.batch_frames = 0
+        self.last_flush_ms: Optional[float] = None
+
+    def emit(self, event: str, data: Dict, room: Optional[str] = None, namespace: str = '/') -> None:
+        """Drop-in for socketio.emit; events without a policy, or without a room, go out immediately"""
+        policy = self.policies.get(event)
+        if policy is None or room is None or not self.is_running:
+            self.events_immediate += 1
+            self._send(event, data, room, namespace)
+            return
+
+        if policy.key:
+            key = (event,) + tuple(data.get(field) for field in policy.key)
+        else:
+            key = (event, next(self.sequence))
+        with self.lock:
+            self.events_in += 1
+            entries = self.rooms.setdefault((namespace, room), OrderedDict())
+            buffered = entries.get(key)
+            if buffered is None:
+                entries[key] = [event, data]
+                return
+            self.events_merged += 1
+            if policy.merge == 'sum':
+                merged = dict(data)
+                for field in policy.sum_fields:
+                    merged[field] = (buffered[1].get(field) or 0) + (data.get(field) or 0)
+                buffered[1] = merged
+            else:
+                buffered[1] = data
+
+    @staticmethod
+    def _send(event: str, data, room: Optional[str], namespace: str) -> None:
+        from yuuzone.socketio_app import socketio
+        socketio.emit(event, data, room=room, namespace=namespace)
+
+    def flush(self) -> int:
+        """Send everything buffered: one frame per room; returns the number of frames"""
+        with self.lock:
+            rooms, self.rooms = self.rooms, {}
+        if not rooms:
+            return 0
+
+        start_time = time.perf_counter()
+        frames = 0
+        for (namespace, room), entries in rooms.items():
+            events = list(entries.values())
+            try:
+                if len(events) == 1:
+                    self._send(events[0][0], events[0][1], room, namespace)
+                else:
+                    self._send(BATCH_EVENT, {'events': events}, room, namespace)
+                    self.batch_frames += 1
+                frames += 1
+            except Exception as e:
+                logger.error(f"Failed to flush {len(events)} events to room {room}: {e}")
+        self.frames_sent += frames
+        self.last_flush_ms = (time.perf_counter() - start_time) * 1000
+        return frames
+
+    def _flush_loop(self):
+        while self.is_running:
+            time.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error in emit flush loop: {e}")
+
+    def start(self):
+        """Start the flush thread"""
+        if self.flush_thread is None or not self.flush_thread.is_alive():
+            self.is_running = True
+            self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self.flush_thread.start()
+            logger.info(f"Emit scheduler started ({self.tick * 1000:.0f}ms tick, {len(self.policies)} coalesced events)")
+
+    def stop(self):
+        """Stop the flush thread and send what is still buffered"""
+        self.is_running = False
+        if self.flush_thread and self.flush_thread.is_alive():
+            self.flush_thread.join(timeout=5)
+        self.flush()
+        logger.info("Emit scheduler stopped")
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            buffered = sum(len(entries) for entries in self.rooms.values())
+        return {
+            'running': self.is_running,
+            'tick_ms': round(self.tick * 1000),
+            'coalesced_events': sorted(self.policies),
+            'buffered': buffered,
+            'events_in': self.events_in,
+            'events_merged': self.events_merged,
+            'events_immediate': self.events_immediate,
+            'frames_sent': self.frames_sent,
+            'batch_frames': self.batch_frames,
+            'last_flush_ms': round(self.last_flush_ms, 3) if self.last_flush_ms is not None else None,
+        }
+
+
+def _create_emit_scheduler() -> EmitScheduler:
+    from yuuzone.config import EMIT_COALESCE_TICK_MS, EMIT_COALESCE_EVENTS
+    policies = DEFAULT_POLICIES
+    if EMIT_COALESCE_EVENTS is not None:
+        enabled = {name.strip() for name in EMIT_COALESCE_EVENTS.split(',') if name.strip()}
+        policies = {name: policy for name, policy in DEFAULT_POLICIES.items() if name in enabled}
+    return EmitScheduler(tick_ms=EMIT_COALESCE_TICK_MS, policies=policies)
+
+
+# Global instance
+emit_scheduler = _create_emit_scheduler()
+
+
+def init_emit_scheduler(app):
+    """Start the flush thread"""
+    if emit_scheduler.tick > 0 and emit_scheduler.policies:
+        emit_scheduler.start()
+        import atexit
+        atexit.register(emit_scheduler.stop)
+    return emit_scheduler
@@ -0,0 +1,128 @@
+"""
+Socket Event Limiter
+Per-socket token buckets for client-sent Socket.IO events. Buckets refill lazily when an event
+arrives, so there are no timers; events over the rate are dropped and counted.
+"""
+
+import functools
+import logging
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EventRate(NamedTuple):
+    rate: float  # Tokens per second
+    burst: float  # Bucket size
+    scope: Optional[str] = None  # Payload field that gets its own bucket, e.g. one per room
+    notify: bool = False  # Tell the sender once per run of dropped events
+
+
+DEFAULT_RATES: Dict[str, EventRate] = {
+    # Typing state is idempotent: one event per second per room carries it
+    'typing': EventRate(1, 1, scope='room'),
+    'stop_typing': EventRate(1, 2, scope='room'),
+    'new_message': EventRate(2, 5, scope='room', notify=True),
+    'edit_message': EventRate(1, 3, scope='room', notify=True),
+    'delete_message': EventRate(1, 3, scope='room', notify=True),
+    'user_activity': EventRate(0.2, 2),
+    'performance_metrics': EventRate(0.1, 1),
+    'system_status': EventRate(0.1, 1),
+    'presence_heartbeat': EventRate(0.2, 3),
+    # Route changes join and leave a few rooms at once
+    'join': EventRate(5, 20),
+    'leave': EventRate(5, 20),
+    'join_room': EventRate(2, 5),
+    'leave_room': EventRate(2, 5),
+    'join_chat': EventRate(2, 5),
+    'leave_chat': EventRate(2, 5),
+    'view_feed': EventRate(1, 5),
+}
+DEFAULT_RATE = EventRate(2, 10)  # Relayed notifications (votes, edits, moderation) not listed above
+
+MAX_BUCKETS_PER_SOCKET = 64  # Scoped buckets beyond this share the event's unscoped bucket
+
+
+class EventLimiter:
+    """Token bucket per (socket, event[, scope]) in one dict per socket"""
+
+    def __init__(self, rates: Optional[Dict[str, EventRate]] = None, default: EventRate = DEFAULT_RATE):
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.default = default
+        self.lock = threading.Lock()
+        # sid -> bucket key -> [tokens, last refill (monotonic), dropping]
+        self.buckets: Dict[str, Dict[str, list]] = {}
+        self.allowed: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+
+    def check(self, sid: str, event: str, data=None) -> Tuple[bool, Optional[float]]:
+        """(allowed, seconds until the next token if the sender should be told, else None)"""
+        rate = self.rates.get(event, self.default)
+        key = event
+        if rate.scope and isinstance(data, dict):
+            scope = data.get(rate.scope)
+            if isinstance(scope, str) and len(scope) <= 100:
+                key = f'{event}|{scope}'
+        now = time.monotonic()
+
+        with self.lock:
+            buckets = self.buckets.setdefault(sid, {})
+            bucket = buckets.get(key)
+            if bucket is None:
+                if len(buckets) >= MAX_BUCKETS_PER_SOCKET and key != event:
+                    key = event
+                    bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = [rate.burst, now, False]
+            tokens = min(rate.burst, bucket[0] + (now - bucket[1]) * rate.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                bucket[2] = False
+                self.allowed[event] = self.allowed.get(event, 0) + 1
+                return True, None
+            bucket[0] = tokens
+            first_drop = not bucket[2]
+            bucket[2] = True
+            self.dropped[event] = self.dropped.get(event, 0) + 1
+        if rate.notify and first_drop:
+            return False, (1 - tokens) / rate.rate
+        return False, None
+
+    def drop(self, sid: str) -> None:
+        """Forget a disconnected socket's buckets"""
+        with self.lock:
+            self.buckets.pop(sid, None)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'sockets': len(self.buckets),
+                'buckets': sum(len(buckets) for buckets in self.buckets.values()),
+                'allowed': dict(self.allowed),
+                'dropped': dict(self.dropped),
+                'dropped_total': sum(self.dropped.values()),
+            }
+
+
+# Global instance
+event_limiter = EventLimiter()
+
+
+def throttled(event: str):
+    """Decorator for Socket.IO handlers: events over the socket's rate for `event` are dropped"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args):
+            from flask import request
+            allowed, retry_after = event_limiter.check(request.sid, event, args[0] if args else None)
+            if allowed:
+                return handler(*args)
+            if retry_after is not None:
+                from flask_socketio import emit
+                emit('rate_limited', {'event': event, 'retry_after': round(retry_after, 2)})
+            return None
+        return wrapper
+    return decorator
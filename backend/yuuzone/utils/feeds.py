@@ -0,0 +1,126 @@
+"""
+Feed Interest Index
+Which sockets want feed events (new, updated and deleted posts) from which subthread. A socket registers
+the feed it is viewing and is put in the feed:<subthread_id> room of every subthread that feed shows,
+so a write reaches only the sockets whose feed includes its subthread. Subthread pages are already
+covered by their sub:<id> room.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+FEEDS = ('home', 'all', 'popular')
+
+
+def feed_room(subthread_id) -> str:
+    return f'feed:{subthread_id}'
+
+
+class FeedRegistry:
+    """Per-socket feed views and the subthreads each one is indexed under"""
+
+    def __init__(self, top_size: int = 25, top_ttl: float = 60, max_subthreads: int = 200):
+        self.top_size = top_size  # Must match the subthreads /posts/all and /posts/popular read from
+        self.top_ttl = top_ttl
+        self.max_subthreads = max_subthreads  # Home feeds beyond this get live updates for the first ones only
+        self.lock = threading.Lock()
+        self.views: Dict[str, Tuple[str, FrozenSet[int]]] = {}  # sid -> (feed, subthread ids)
+        self.subthread_sockets: Dict[int, int] = {}  # subthread id -> sockets indexed under it on this worker
+        self.feed_sockets: Dict[str, int] = {feed: 0 for feed in FEEDS}
+        self.top: Dict[str, Tuple[float, Tuple[int, ...]]] = {}
+        self.registrations = 0
+        self.top_refreshes = 0
+
+    def _top(self, feed: str) -> Tuple[int, ...]:
+        now = time.time()
+        with self.lock:
+            cached = self.top.get(feed)
+            if cached and now - cached[0] < self.top_ttl:
+                return cached[1]
+
+        from yuuzone.subthreads.models import SubthreadInfo
+        order = SubthreadInfo.members_count if feed == 'all' else SubthreadInfo.posts_count
+        ids = tuple(row.id for row in SubthreadInfo.query.with_entities(SubthreadInfo.id).order_by(order.desc()).limit(self.top_size))
+        with self.lock:
+            self.top[feed] = (now, ids)
+            self.top_refreshes += 1
+        return ids
+
+    def resolve(self, feed: str, user) -> FrozenSet[int]:
+        """Subthread ids `feed` shows to `user`, the same set the feed's REST endpoint reads from"""
+        from yuuzone.subthreads.service import access_cache
+        if feed == 'home':
+            if not user.is_authenticated:
+                raise ValueError('Authentication required for the home feed')
+            ids = set(access_cache.get(user.id).subscribed)
+        else:
+            ids = set(self._top(feed))
+        if user.is_authenticated:
+            ids -= access_cache.get(user.id).banned
+        return frozenset(sorted(ids)[:self.max_subthreads])
+
+    def view(self, sid: str, feed: Optional[str], user) -> Tuple[Set[int], Set[int]]:
+        """Register the feed a socket is viewing (None for none); returns (subthreads to join, subthreads to leave)"""
+        if feed is not None and feed not in FEEDS:
+            raise ValueError(f'Unknown feed: {feed}')
+        subthreads = self.resolve(feed, user) if feed else frozenset()
+        with self.lock:
+            previous = self._forget(sid)
+            if feed:
+                self.views[sid] = (feed, subthreads)
+                self.feed_sockets[feed] += 1
+                for subthread_id in subthreads:
+                    self.subthread_sockets[subthread_id] = self.subthread_sockets.get(subthread_id, 0) + 1
+            self.registrations += 1
+        return set(subthreads - previous), set(previous - subthreads)
+
+    def _forget(self, sid: str) -> FrozenSet[int]:
+        view = self.views.pop(sid, None)
+        if view is None:
+            return frozenset()
+        feed, subthreads = view
+        self.feed_sockets[feed] -= 1
+        for subthread_id in subthreads:
+            count = self.subthread_sockets[subthread_id] - 1
+            if count:
+                self.subthread_sockets[subthread_id] = count
+            else:
+                del self.subthread_sockets[subthread_id]
+        return subthreads
+
+    def drop(self, sid: str) -> None:
+        """Forget a disconnected socket"""
+        with self.lock:
+            self._forget(sid)
+
+    @staticmethod
+    def emit(event: str, data: Dict, subthread_id) -> None:
+        """Send a feed event to the sockets whose feed shows `subthread_id`"""
+        from yuuzone.utils.emit_scheduler import emit_scheduler
+        emit_scheduler.emit(event, data, room=feed_room(subthread_id))
+
+    def get_stats(self) -> Dict:
+        now = time.time()
+        with self.lock:
+            return {
+                'sockets': len(self.views),
+                'feeds': dict(self.feed_sockets),
+                'indexed_subthreads': len(self.subthread_sockets),
+                'memberships': sum(self.subthread_sockets.values()),
+                'registrations': self.registrations,
+                'top_refreshes': self.top_refreshes,
+                'top_age_seconds': {feed: round(now - cached[0], 1) for feed, cached in self.top.items()},
+            }
+
+
+def _create_feed_registry() -> FeedRegistry:
+    from yuuzone.config import FEED_MAX_SUBTHREADS, FEED_TOP_TTL
+    return FeedRegistry(top_ttl=FEED_TOP_TTL, max_subthreads=FEED_MAX_SUBTHREADS)
+
+
+# Global instance
+feed_registry = _create_feed_registry()
@@ -0,0 +1,75 @@
+"""
+Green-aware PostgreSQL driver integration
+Lets psycopg2 yield to the eventlet hub while it waits on the database socket,
+so a slow query no longer blocks every other request on the worker.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def eventlet_wait_callback(conn, timeout=-1):
+    """psycopg2 wait callback that parks the current greenlet until the socket is ready"""
+    from eventlet.hubs import trampoline
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            trampoline(conn.fileno(), read=True)
+        elif state == extensions.POLL_WRITE:
+            trampoline(conn.fileno(), write=True)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
+
+
+def is_eventlet_active() -> bool:
+    """True when the process runs under eventlet with a patched socket module (gunicorn eventlet worker)"""
+    try:
+        from eventlet import patcher
+        return patcher.is_monkey_patched("socket")
+    except ImportError:
+        return False
+
+
+def patch_psycopg(force: bool = False) -> bool:
+    """Install the eventlet wait callback on psycopg2; must run before the first connection is opened"""
+    if not force and not is_eventlet_active():
+        return False
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        logger.warning("psycopg2 not available, database calls will not yield to the eventlet hub")
+        return False
+
+    if not hasattr(extensions, "set_wait_callback"):
+        logger.warning("psycopg2 build does not support wait callbacks")
+        return False
+
+    if extensions.get_wait_callback() is not None:
+        # eventlet.monkey_patch() installs an equivalent callback when psycopg2 was importable
+        logger.info("psycopg2 wait callback already installed")
+        return True
+
+    extensions.set_wait_callback(eventlet_wait_callback)
+    logger.info("psycopg2 eventlet wait callback installed")
+    return True
+
+
+def engine_options(database_uri: str, pool_size: int, max_overflow: int, pool_timeout: int) -> dict:
+    """SQLAlchemy engine options; the pool is sized for many greenlets sharing one worker"""
+    options = {
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
+    if database_uri and database_uri.startswith(("postgres://", "postgresql")):
+        options.update({
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            # Fail fast instead of parking greenlets forever when the pool is exhausted
+            'pool_timeout': pool_timeout,
+        })
+    return options
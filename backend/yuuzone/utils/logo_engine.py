@@ -0,0 +1,322 @@
+"""
+Default Subthread Logo Engine
+Renders the pixel-art default logos and uploads them off the request path. Subthreads still
+showing the inline placeholder are rescanned on start and periodically, so jobs lost to a full
+queue, a failed upload or a restart are picked up again, up to a bounded number of attempts.
+"""
+
+import io
+import logging
+import queue
+import random
+import threading
+import time
+import uuid
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+LOGO_SIZE = (720, 720)
+PIXEL_SIZE = 24  # Size of each pixel block (30x30 grid)
+TEXT_RATIO = 0.88  # Text should fill 88% of the logo
+
+# Five main font types (including pixel fonts), each with platform-specific candidates
+FONT_TYPES = [
+    # Type 1: Arial (Sans-serif, clean)
+    [("arial.ttf", "Arial"), ("C:/Windows/Fonts/arial.ttf", "Arial"),
+     ("/System/Library/Fonts/Arial.ttf", "Arial"), ("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", "Liberation Sans")],
+
+    # Type 2: Arial Bold (Sans-serif, bold)
+    [("arialbd.ttf", "Arial Bold"), ("C:/Windows/Fonts/arialbd.ttf", "Arial Bold"),
+     ("/Library/Fonts/Arial Bold.ttf", "Arial Bold"), ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", "DejaVu Sans Bold")],
+
+    # Type 3: Times (Serif, classic)
+    [("times.ttf", "Times New Roman"), ("C:/Windows/Fonts/times.ttf", "Times New Roman"),
+     ("/System/Library/Fonts/Times.ttc", "Times"), ("/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf", "Liberation Serif")],
+
+    # Type 4: Calibri (Modern sans-serif)
+    [("calibri.ttf", "Calibri"), ("C:/Windows/Fonts/calibri.ttf", "Calibri"),
+     ("/System/Library/Fonts/Helvetica.ttc", "Helvetica"), ("/usr/share/fonts/truetype/ubuntu/Ubuntu-R.ttf", "Ubuntu")],
+
+    # Type 5: Bold serif
+    [("timesbd.ttf", "Times Bold"), ("C:/Windows/Fonts/timesbd.ttf", "Times Bold"),
+     ("/usr/share/fonts/truetype/liberation/LiberationSerif-Bold.ttf", "Liberation Serif Bold"), ("/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf", "DejaVu Serif Bold")]
+]
+
+
+@lru_cache(maxsize=256)
+def load_font(font_path: str, size: int):
+    """Load a truetype font once per (path, size); raises OSError when the font is missing"""
+    return ImageFont.truetype(font_path, size)
+
+
+@lru_cache(maxsize=32)
+def _font_available(font_path: str) -> bool:
+    try:
+        load_font(font_path, 500)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _text_box(text: str, font) -> Tuple[int, int]:
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+@lru_cache(maxsize=1024)
+def fit_font_size(font_path: str, text: str, target_size: int) -> int:
+    """Binary search the font size that makes the text about target_size pixels; cached per (font, text)"""
+    min_size = 50
+    max_size = 800
+    optimal_size = 500
+
+    for _ in range(15):  # Max 15 iterations
+        text_width, text_height = _text_box(text, load_font(font_path, optimal_size))
+        max_dimension = max(text_width, text_height)
+
+        if abs(max_dimension - target_size) < 15:  # Close enough
+            break
+        elif max_dimension < target_size:
+            min_size = optimal_size
+        else:
+            max_size = optimal_size
+        optimal_size = (min_size + max_size) // 2
+
+    return optimal_size
+
+
+def pick_font(rng=random):
+    """Pick a random available font from one random font type, falling back to the default font"""
+    candidates = list(rng.choice(FONT_TYPES))
+    rng.shuffle(candidates)
+    for font_path, _name in candidates:
+        if _font_available(font_path):
+            return font_path
+    return None
+
+
+def render_pixel_background(rng=random) -> Image.Image:
+    """Render the tonal pixel-art background as a small grid upscaled with nearest-neighbour"""
+    base_hue = rng.randint(0, 360)  # Random hue (0-360)
+    base_saturation = rng.randint(70, 100)  # High saturation (70-100%)
+    base_value = rng.randint(60, 90)  # Medium-high value (60-90%)
+
+    grid = (LOGO_SIZE[0] // PIXEL_SIZE, LOGO_SIZE[1] // PIXEL_SIZE)
+    cells = grid[0] * grid[1]
+    # Keep the hue fixed and vary saturation (±25) and value (±30) per cell for a tonal look
+    hue = bytes([base_hue * 255 // 360]) * cells
+    saturation = bytes(max(30, min(100, base_saturation + rng.randint(-25, 25))) * 255 // 100 for _ in range(cells))
+    value = bytes(max(25, min(95, base_value + rng.randint(-30, 30))) * 255 // 100 for _ in range(cells))
+
+    small = Image.merge("HSV", [Image.frombytes("L", grid, band) for band in (hue, saturation, value)])
+    return small.convert("RGB").resize(LOGO_SIZE, Image.NEAREST)
+
+
+def logo_text(name: str) -> str:
+    return (name[2:5].upper() if len(name) > 4 else name[2:].upper()) or "SUB"
+
+
+def render_default_logo(name: str, rng=random) -> bytes:
+    """Render the default logo for a subthread name and return it as PNG bytes"""
+    img = render_pixel_background(rng)
+    draw = ImageDraw.Draw(img)
+    text = logo_text(name)
+
+    font_path = pick_font(rng)
+    if font_path:
+        font = load_font(font_path, fit_font_size(font_path, text, int(LOGO_SIZE[0] * TEXT_RATIO)))
+    else:
+        font = ImageFont.load_default()
+
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    text_x = (LOGO_SIZE[0] - text_width) / 2
+    text_y = (LOGO_SIZE[1] - text_height) / 2
+
+    # White text with a black outline proportional to the text size, rasterized in a single pass
+    outline_offset = max(20, int(max(text_width, text_height) * 0.03))
+    draw.text((text_x, text_y), text, font=font, fill=(255, 255, 255),
+              stroke_width=outline_offset, stroke_fill=(0, 0, 0))
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", compress_level=3)  # Cloudinary re-encodes with f_auto anyway
+    return buffer.getvalue()
+
+
+class LogoEngine:
+    """Background worker that renders and uploads default logos after the subthread is committed"""
+
+    def __init__(self, app=None, max_queue_size: int = 200, max_attempts: int = 3,
+                 rescan_interval: int = 300, rescan_min_age: int = 60):
+        self.app = app
+        self.jobs: "queue.Queue[Tuple[int, str]]" = queue.Queue(maxsize=max_queue_size)
+        self.max_attempts = max_attempts
+        self.rescan_interval = rescan_interval
+        self.rescan_min_age = rescan_min_age  # Newer placeholders are still with the worker that queued them
+        self.lock = threading.Lock()
+        self.queued: Set[int] = set()
+        self.attempts: Dict[int, int] = {}  # Subthread id -> failed renders or uploads
+        self.thread = None
+        self.running = False
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.requeued = 0
+        self.abandoned = 0
+        self.renders = 0
+        self.last_render_ms: Optional[float] = None
+        self.total_render_ms = 0.0
+
+    def start(self, app):
+        self.app = app
+        if self.thread is None or not self.thread.is_alive():
+            self.running = True
+            self.thread = threading.Thread(target=self._worker_loop, daemon=True)
+            self.thread.start()
+            logger.info("Logo engine worker started")
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            try:
+                self.jobs.put_nowait((None, None))  # Wake the worker so it can exit
+            except queue.Full:
+                pass
+            self.thread.join(timeout=5)
+            logger.info("Logo engine worker stopped")
+
+    def enqueue(self, subthread_id: int, name: str) -> bool:
+        """Queue default logo generation; the subthread keeps its placeholder until the job finishes"""
+        with self.lock:
+            if subthread_id in self.queued:
+                return True
+            try:
+                self.jobs.put_nowait((subthread_id, name))
+            except queue.Full:
+                self.dropped += 1
+                logger.warning(f"Logo queue full, keeping placeholder logo for subthread {subthread_id} until the next rescan")
+                return False
+            self.queued.add(subthread_id)
+            return True
+
+    def _worker_loop(self):
+        self._rescan()
+        while self.running:
+            try:
+                subthread_id, name = self.jobs.get(timeout=self.rescan_interval)
+            except queue.Empty:
+                self._rescan()
+                continue
+            if subthread_id is None:
+                continue
+            with self.lock:
+                self.queued.discard(subthread_id)
+            try:
+                self._process(subthread_id, name)
+                self.processed += 1
+                self.attempts.pop(subthread_id, None)
+            except Exception as e:
+                self.failed += 1
+                attempts = self.attempts[subthread_id] = self.attempts.get(subthread_id, 0) + 1
+                if attempts >= self.max_attempts:
+                    self.abandoned += 1
+                    logger.error(f"Giving up on the default logo for subthread {name} after {attempts} attempts: {e}")
+                else:
+                    logger.error(f"Error generating default logo for subthread {name} (attempt {attempts}, retried on rescan): {e}")
+
+    def _rescan(self):
+        """Queue subthreads still showing the inline placeholder, including ones whose job was lost"""
+        try:
+            with self.app.app_context():
+                from yuuzone import db
+                from yuuzone.subthreads.models import Subthread
+                rows = (
+                    db.session.query(Subthread.id, Subthread.name)
+                    .filter(
+                        Subthread.logo.startswith("data:image/"),
+                        Subthread.created_at < datetime.now(timezone.utc) - timedelta(seconds=self.rescan_min_age),
+                    )
+                    .order_by(Subthread.id)
+                    .all()
+                )
+                db.session.remove()
+            for row in rows:
+                if self.attempts.get(row.id, 0) >= self.max_attempts or row.id in self.queued:
+                    continue
+                if not self.enqueue(row.id, row.name):
+                    break
+                self.requeued += 1
+        except Exception as e:
+            logger.error(f"Failed to scan for placeholder subthread logos: {e}")
+
+    def _process(self, subthread_id: int, name: str):
+        import cloudinary.uploader as uploader
+
+        start_time = time.perf_counter()
+        image_bytes = render_default_logo(name)
+        self.last_render_ms = (time.perf_counter() - start_time) * 1000
+        self.total_render_ms += self.last_render_ms
+        self.renders += 1
+
+        image_data = uploader.upload(io.BytesIO(image_bytes), public_id=f"default_logo_{uuid.uuid4().hex}", resource_type="image")
+        if not image_data or not image_data.get('public_id'):
+            raise ValueError("Cloudinary upload failed: no public_id returned")
+
+        with self.app.app_context():
+            from yuuzone import db
+            from yuuzone.subthreads.models import Subthread
+            from yuuzone.subthreads.service import subthread_header_cache
+
+            url = f"https://res.cloudinary.com/{self.app.config['CLOUDINARY_NAME']}/image/upload/f_auto,q_auto/{image_data.get('public_id')}"
+            # Only replace the placeholder; the logo may have been changed while the job was queued
+            updated = Subthread.query.filter(
+                Subthread.id == subthread_id,
+                Subthread.logo.startswith("data:image/"),
+            ).update({Subthread.logo: url}, synchronize_session=False)
+            db.session.commit()
+            db.session.remove()
+
+            if not updated:
+                uploader.destroy(image_data.get('public_id'))
+                return
+            subthread_header_cache.invalidate(subthread_id)
+
+        try:
+            from yuuzone.socketio_app import socketio
+            socketio.emit('internal_subthread_update', {
+                'type': 'updated',
+                'subthreadId': subthread_id,
+                'updated_fields': {'logo': url},
+            })
+        except Exception as e:
+            logger.error(f"Failed to emit logo update for subthread {subthread_id}: {e}")
+
+    def get_status(self) -> Dict:
+        return {
+            "running": self.running,
+            "queued": self.jobs.qsize(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "requeued": self.requeued,
+            "abandoned": self.abandoned,
+            "last_render_ms": round(self.last_render_ms, 2) if self.last_render_ms is not None else None,
+            "avg_render_ms": round(self.total_render_ms / self.renders, 2) if self.renders else None,
+        }
+
+
+# Global instance
+logo_engine = LogoEngine()
+
+
+def init_logo_engine(app):
+    """Start the logo engine worker for the given app"""
+    logo_engine.start(app)
+    import atexit
+    atexit.register(logo_engine.stop)
+    return logo_engine
@@ -0,0 +1,415 @@
+"""
+Media Upload Pipeline
+Uploads post and message media to Cloudinary off the request path with bounded concurrency.
+Requests spool files to disk and commit pending upload rows; workers upload them, attach the
+result to the post or message and tell clients over Socket.IO that the media is ready.
+"""
+
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+from werkzeug.utils import secure_filename
+from yuuzone.utils.chat_delivery import chat_delivery
+from yuuzone.utils.rooms import sub_room, user_room
+from yuuzone.utils.feeds import feed_registry
+
+logger = logging.getLogger(__name__)
+
+
+def media_type_for(content_type: Optional[str]) -> str:
+    if content_type and content_type.startswith("image/"):
+        return "image"
+    if content_type and content_type.startswith("video/"):
+        return "video"
+    return "file"
+
+
+class MediaUploadPipeline:
+    """Pool of upload workers fed by committed MediaUpload rows"""
+
+    def __init__(self, app=None, workers: int = 4, spool_dir: Optional[str] = None,
+                 chunked_threshold: int = 20 * 1024 * 1024, chunk_size: int = 6 * 1024 * 1024,
+                 max_attempts: int = 3, lease_seconds: int = 120, rescan_interval: int = 60):
+        self.app = app
+        self.workers = workers  # Concurrent Cloudinary uploads
+        self.spool_dir = spool_dir or os.path.join(tempfile.gettempdir(), "yuuzone_uploads")
+        self.chunked_threshold = chunked_threshold  # Videos at least this large use Cloudinary's chunked upload
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds  # An upload untouched this long is abandoned; also the retry backoff
+        self.rescan_interval = rescan_interval
+        self.jobs: "queue.Queue[Optional[int]]" = queue.Queue()
+        self.threads = []
+        self.running = False
+        self.lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.chunked = 0
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self.last_upload_ms: Optional[float] = None
+        self.max_upload_ms = 0.0
+        self.total_upload_ms = 0.0
+
+    def start(self, app):
+        self.app = app
+        os.makedirs(self.spool_dir, exist_ok=True)
+        if not any(thread.is_alive() for thread in self.threads):
+            self.running = True
+            # The first worker also rescans for uploads interrupted by a restart
+            self.threads = [
+                threading.Thread(target=self._worker_loop, args=(index == 0,), daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self.threads:
+                thread.start()
+            logger.info(f"Media upload pipeline started with {self.workers} workers")
+
+    def stop(self):
+        self.running = False
+        for _ in self.threads:
+            self.jobs.put(None)  # Wake each worker so it can exit
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join(timeout=5)
+        logger.info("Media upload pipeline stopped")
+
+    def stage(self, file, user_id: int, max_size: Optional[int] = None, post_id: Optional[int] = None,
+              message_id: Optional[int] = None, media_order: int = 0):
+        """Stream an uploaded file to the spool directory and return an unsaved MediaUpload for it"""
+        from yuuzone.posts.models import MediaUpload
+
+        filename = secure_filename(file.filename or "") or "upload"
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}_{filename}")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        file.save(path)  # Copies in small chunks; the request never holds the whole file in memory
+        size = os.path.getsize(path)
+        if size == 0:
+            self._remove_spool(path)
+            raise ValueError("File is empty")
+        if max_size and size > max_size:
+            self._remove_spool(path)
+            raise ValueError(f"File too large. Maximum size is {max_size // (1024 * 1024)}MB.")
+        return MediaUpload(
+            user_id=user_id,
+            media_type=media_type_for(file.content_type),
+            filename=filename,
+            spool_path=path,
+            size=size,
+            post_id=post_id,
+            message_id=message_id,
+            media_order=media_order,
+        )
+
+    def discard(self, uploads: Iterable) -> None:
+        """Remove the spooled files of uploads whose request failed before they were committed"""
+        for upload in uploads:
+            self._remove_spool(upload.spool_path)
+
+    def enqueue(self, upload_id: int) -> None:
+        """Hand a committed upload to the workers; unqueued uploads are still picked up by the periodic rescan"""
+        self.jobs.put(upload_id)
+
+    def _worker_loop(self, rescans: bool):
+        if rescans:
+            self._rescan()
+        while self.running:
+            try:
+                upload_id = self.jobs.get(timeout=self.rescan_interval)
+            except queue.Empty:
+                if rescans:
+                    self._rescan()
+                continue
+            if upload_id is None:
+                continue
+            self._run(upload_id)
+
+    def _rescan(self):
+        try:
+            with self.app.app_context():
+                from yuuzone import db
+                from yuuzone.posts.models import MediaUpload
+                rows = (
+                    db.session.query(MediaUpload.id)
+                    .filter(MediaUpload.status != "ready", MediaUpload.attempts < self.max_attempts)
+                    .order_by(MediaUpload.id)
+                    .all()
+                )
+                db.session.remove()
+            for row in rows:
+                self.jobs.put(row.id)
+        except Exception as e:
+            logger.error(f"Failed to scan for pending media uploads: {e}")
+
+    def _claim(self, upload_id: int):
+        """Mark the upload as uploading unless it was touched within the lease (in flight, or failed recently)"""
+        from sqlalchemy import or_
+        from yuuzone import db
+        from yuuzone.posts.models import MediaUpload
+
+        now = datetime.now(timezone.utc)
+        claimed = MediaUpload.query.filter(
+            MediaUpload.id == upload_id,
+            MediaUpload.status != "ready",
+            MediaUpload.attempts < self.max_attempts,
+            or_(MediaUpload.status == "pending",
+                MediaUpload.updated_at < now - timedelta(seconds=self.lease_seconds)),
+        ).update({
+            MediaUpload.status: "uploading",
+            MediaUpload.attempts: MediaUpload.attempts + 1,
+            MediaUpload.updated_at: now,
+        }, synchronize_session=False)
+        db.session.commit()
+        return db.session.get(MediaUpload, upload_id) if claimed else None
+
+    def _run(self, upload_id: int):
+        with self.app.app_context():
+            from yuuzone import db
+            try:
+                upload = self._claim(upload_id)
+                if upload is None:
+                    return
+                job = upload.as_dict() | {"spool_path": upload.spool_path, "filename": upload.filename,
+                                          "size": upload.size, "user_id": upload.user_id}
+                # Release the connection for the length of the upload
+                db.session.remove()
+            except Exception as e:
+                db.session.rollback()
+                db.session.remove()
+                logger.error(f"Failed to claim media upload {upload_id}: {e}")
+                return
+
+            with self.lock:
+                self.active += 1
+            started = time.perf_counter()
+            try:
+                if not job["spool_path"] or not os.path.exists(job["spool_path"]):
+                    raise FileNotFoundError("Spooled file is gone")
+                url, public_id, resource_type = self._upload(job)
+                self._record_upload(job["size"], started)
+                self._finalize(upload_id, job, url, public_id, resource_type)
+            except Exception as e:
+                db.session.rollback()
+                with self.lock:
+                    self.failed += 1
+                logger.error(f"Media upload {upload_id} failed: {e}")
+                self._mark_failed(upload_id, job, str(e))
+            finally:
+                with self.lock:
+                    self.active -= 1
+                db.session.remove()
+
+    def _upload(self, job):
+        """Upload the spooled file; returns (url, public_id, resource_type)"""
+        import cloudinary.uploader as uploader
+
+        cloud_name = self.app.config['CLOUDINARY_NAME']
+        stem = job["filename"].rsplit('.')[0]
+        prefix = "message_" if job["message_id"] else ""
+        path = job["spool_path"]
+
+        if job["media_type"] == "image":
+            public_id = f"{prefix}image_{uuid.uuid4().hex}_{stem}" if prefix else f"{uuid.uuid4().hex}_{stem}"
+            data = uploader.upload(path, public_id=public_id, resource_type="image")
+            if not data or not data.get('public_id'):
+                raise ValueError("Cloudinary upload failed: no public_id returned")
+            return f"https://res.cloudinary.com/{cloud_name}/image/upload/c_auto,g_auto/{data.get('public_id')}", data.get('public_id'), "image"
+
+        if job["media_type"] == "video":
+            public_id = f"{prefix}video_{uuid.uuid4().hex}_{stem}" if prefix else f"{uuid.uuid4().hex}_{stem}"
+            if job["size"] >= self.chunked_threshold:
+                data = uploader.upload_large(path, resource_type="video", public_id=public_id, chunk_size=self.chunk_size)
+                with self.lock:
+                    self.chunked += 1
+            else:
+                data = uploader.upload(path, resource_type="video", public_id=public_id)
+            if not data or not data.get('public_id'):
+                raise ValueError("Cloudinary video upload failed: no public_id returned")
+            if job["message_id"]:
+                return f"https://res.cloudinary.com/{cloud_name}/video/upload/{data.get('public_id')}", data.get('public_id'), "video"
+            if not data.get('playback_url'):
+                raise ValueError("Cloudinary video upload failed: no playback_url returned")
+            return data.get('playback_url'), data.get('public_id'), "video"
+
+        if not job["message_id"]:
+            raise ValueError("Unsupported media type for posts")
+        data = uploader.upload(path, resource_type="raw", public_id=f"message_file_{uuid.uuid4().hex}_{stem}")
+        if not data or not data.get('secure_url'):
+            raise ValueError("Cloudinary upload failed: no secure_url returned")
+        return data.get('secure_url'), data.get('public_id'), "raw"
+
+    def _record_upload(self, size: int, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.uploads += 1
+            self.bytes_uploaded += size or 0
+            self.last_upload_ms = elapsed_ms
+            self.max_upload_ms = max(self.max_upload_ms, elapsed_ms)
+            self.total_upload_ms += elapsed_ms
+
+    def _finalize(self, upload_id: int, job, url: str, public_id: str, resource_type: str):
+        """Attach the uploaded media to its post or message in one transaction"""
+        import cloudinary.uploader as uploader
+        from yuuzone import db
+        from yuuzone.messages.models import Messages
+        from yuuzone.posts.models import Media, MediaUpload, Posts
+
+        upload = db.session.get(MediaUpload, upload_id)
+        if upload is None or upload.status == "ready":
+            # The post or message was deleted (or the media replaced) while the file was uploading
+            db.session.rollback()
+            uploader.destroy(public_id, resource_type=resource_type)
+            self._remove_spool(job["spool_path"])
+            return
+
+        if upload.post_id:
+            db.session.add(Media(url, upload.media_type, post_id=upload.post_id, media_order=upload.media_order))
+            if upload.media_order == 0:
+                # First media doubles as the legacy single-media column
+                Posts.query.filter(Posts.id == upload.post_id).update({Posts.media: url}, synchronize_session=False)
+        elif upload.message_id:
+            Messages.query.filter(Messages.id == upload.message_id).update({Messages.media: url}, synchronize_session=False)
+
+        upload.status = "ready"
+        upload.url = url
+        upload.error = None
+        upload.spool_path = None
+        upload.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+        with self.lock:
+            self.completed += 1
+
+        self._remove_spool(job["spool_path"])
+        self._notify(upload.as_dict(), job["user_id"])
+
+    def _mark_failed(self, upload_id: int, job, error: str):
+        from yuuzone import db
+        from yuuzone.posts.models import MediaUpload
+        try:
+            MediaUpload.query.filter(MediaUpload.id == upload_id).update({
+                MediaUpload.status: "failed",
+                MediaUpload.error: error[:1000],
+                MediaUpload.updated_at: datetime.now(timezone.utc),
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to record failure of media upload {upload_id}: {e}")
+            return
+
+        upload = db.session.get(MediaUpload, upload_id)
+        if upload is None or upload.attempts >= self.max_attempts:
+            # Out of retries (or the parent is gone): free the disk and tell the uploader
+            self._remove_spool(job["spool_path"])
+            if upload is not None:
+                self._notify(upload.as_dict(), job["user_id"])
+
+    def _notify(self, upload: Dict, user_id: Optional[int]):
+        """Push the finished upload to clients; posts reuse the post_updated events the feeds already handle"""
+        try:
+            from yuuzone.socketio_app import socketio
+        except ImportError:
+            return
+        try:
+            if user_id:
+                socketio.emit('media_ready', upload, room=user_room(user_id))
+            if upload["status"] != "ready":
+                return
+            if upload["post_id"]:
+                self._notify_post(socketio, upload["post_id"])
+            elif upload["message_id"]:
+                self._notify_message(socketio, upload)
+        except Exception as e:
+            logger.error(f"Failed to emit media ready event for upload {upload['upload_id']}: {e}")
+
+    def _notify_post(self, socketio, post_id: int):
+        from yuuzone.posts.models import PostInfo
+
+        post_info = PostInfo.query.filter_by(post_id=post_id).first()
+        if post_info is None:
+            return
+        payload = {
+            'postId': post_id,
+            'newData': post_info.as_dict(),
+            'subthreadId': post_info.thread_id,
+            'updatedBy': post_info.user_name,
+            'timestamp': None,
+        }
+        socketio.emit('post_updated', payload, room=sub_room(post_info.thread_id))
+        feed_registry.emit('post_updated_global', payload, post_info.thread_id)
+
+    def _notify_message(self, socketio, upload: Dict):
+        from yuuzone import db
+        from yuuzone.messages.models import Messages
+        from yuuzone.users.models import User
+
+        message = db.session.get(Messages, upload["message_id"])
+        if message is None:
+            return
+        names = dict(db.session.query(User.id, User.username).filter(User.id.in_([message.sender_id, message.receiver_id])))
+        payload = {
+            'message_id': message.id,
+            'media': message.media,
+            'upload': upload,
+            'sender': names.get(message.sender_id),
+        }
+        chat_delivery.deliver('message_media_ready', payload, (message.receiver_id, message.sender_id),
+                              tuple(names.values()) if len(names) == 2 else None)
+
+    @staticmethod
+    def _remove_spool(path: Optional[str]):
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove spooled upload {path}: {e}")
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            return {
+                "running": self.running,
+                "workers": self.workers,
+                "queued": self.jobs.qsize(),
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "chunked": self.chunked,
+                "bytes_uploaded": self.bytes_uploaded,
+                "last_upload_ms": round(self.last_upload_ms, 2) if self.last_upload_ms is not None else None,
+                "max_upload_ms": round(self.max_upload_ms, 2),
+                "avg_upload_ms": round(self.total_upload_ms / self.uploads, 2) if self.uploads else None,
+            }
+
+
+def _create_media_upload_pipeline() -> MediaUploadPipeline:
+    from yuuzone.config import (
+        MEDIA_UPLOAD_WORKERS, MEDIA_UPLOAD_SPOOL_DIR, MEDIA_CHUNKED_UPLOAD_THRESHOLD, MEDIA_UPLOAD_CHUNK_SIZE,
+    )
+    return MediaUploadPipeline(
+        workers=MEDIA_UPLOAD_WORKERS,
+        spool_dir=MEDIA_UPLOAD_SPOOL_DIR,
+        chunked_threshold=MEDIA_CHUNKED_UPLOAD_THRESHOLD,
+        chunk_size=MEDIA_UPLOAD_CHUNK_SIZE,
+    )
+
+
+# Global instance
+media_upload_pipeline = _create_media_upload_pipeline()
+
+
+def init_media_upload_pipeline(app):
+    """Start the media upload workers for the given app"""
+    media_upload_pipeline.start(app)
+    import atexit
+    atexit.register(media_upload_pipeline.stop)
+    return media_upload_pipeline
@@ -0,0 +1,184 @@
+"""
+Decrypted Message Cache
+Bounded LRU of decrypted message content, with batch decryption of large pages off the eventlet hub.
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry cost of the key tuple, the OrderedDict slot and the edited_at datetime
+ENTRY_OVERHEAD = 200
+
+
+class DecryptedMessageCache:
+    """LRU of plaintext keyed by (message_id, edited_at), accounted by approximate memory size"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, batch_threshold: int = 32, workers: int = 1):
+        self.max_bytes = max_bytes
+        self.batch_threshold = batch_threshold  # Misses on one page before decryption moves to native threads
+        self.workers = workers
+        self.entries: "OrderedDict[Tuple[int, Hashable], Tuple[str, int]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pages = 0
+        self.offloaded_pages = 0
+        self.decrypted = 0
+        self.decrypt_ms = 0.0
+        self.page_ms = 0.0
+        self.last_page: Optional[Dict] = None
+
+    @staticmethod
+    def _key(message) -> Tuple[int, Hashable]:
+        # Edits re-encrypt the content and move edited_at, so an edited message never hits its old entry
+        return message.id, message.edited_at
+
+    def _get(self, key) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key, content: str) -> None:
+        size = sys.getsizeof(content) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        self.entries[key] = (content, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _key, (_content, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    @staticmethod
+    def _decrypt_chunk(encryption, chunk: List[Tuple[Hashable, bytes, Optional[bytes]]]) -> List[Tuple[Hashable, Optional[str]]]:
+        # Plain bytes only: ORM objects must not be touched from a native thread
+        return [(key, encryption.decrypt_message(ciphertext, iv)) for key, ciphertext, iv in chunk]
+
+    def _decrypt_all(self, encryption, pending) -> Tuple[List[Tuple[Hashable, Optional[str]]], bool]:
+        from yuuzone.utils.green_db import is_eventlet_active
+        if len(pending) < self.batch_threshold or not is_eventlet_active():
+            return self._decrypt_chunk(encryption, pending), False
+
+        from eventlet import GreenPool, tpool
+        chunk_size = -(-len(pending) // self.workers)
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        pool = GreenPool(len(chunks))
+        results = []
+        for part in pool.imap(lambda chunk: tpool.execute(self._decrypt_chunk, encryption, chunk), chunks):
+            results.extend(part)
+        return results, True
+
+    def get_content(self, message, encryption) -> Optional[str]:
+        """Decrypted content of one message, or None when it cannot be decrypted"""
+        key = self._key(message)
+        with self.lock:
+            content = self._get(key)
+            if content is not None:
+                self.hits += 1
+                return content
+            self.misses += 1
+
+        start_time = time.perf_counter()
+        content = encryption.decrypt_message(message.content_encrypted, message.iv)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        with self.lock:
+            self.decrypted += 1
+            self.decrypt_ms += elapsed_ms
+            if content is not None:
+                self._put(key, content)
+        return content
+
+    def decrypt_page(self, messages, encryption) -> Dict[int, Optional[str]]:
+        """Decrypted content for a page of messages by id; None where decryption was not possible"""
+        start_time = time.perf_counter()
+        contents: Dict[int, Optional[str]] = {}
+        pending = []
+        hits = 0
+        with self.lock:
+            for message in messages:
+                if not message.content_encrypted:
+                    contents[message.id] = None
+                    continue
+                key = self._key(message)
+                content = self._get(key)
+                if content is None:
+                    pending.append((key, message.content_encrypted, message.iv))
+                else:
+                    contents[message.id] = content
+                    hits += 1
+
+        results = []
+        offloaded = False
+        if pending:
+            results, offloaded = self._decrypt_all(encryption, pending)
+            for key, content in results:
+                contents[key[0]] = content
+
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        with self.lock:
+            for key, content in results:
+                if content is not None:
+                    self._put(key, content)
+            self.hits += hits
+            self.misses += len(pending)
+            self.decrypted += len(pending)
+            self.decrypt_ms += elapsed_ms
+            self.page_ms += elapsed_ms
+            self.pages += 1
+            self.offloaded_pages += int(offloaded)
+            self.last_page = {
+                'messages': len(messages),
+                'hits': hits,
+                'decrypted': len(pending),
+                'offloaded': offloaded,
+                'ms': round(elapsed_ms, 3),
+            }
+        if pending:
+            logger.debug(f"Decrypted {len(pending)}/{len(messages)} messages in {elapsed_ms:.2f}ms (offloaded={offloaded})")
+        return contents
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+                'pages': self.pages,
+                'offloaded_pages': self.offloaded_pages,
+                'decrypted': self.decrypted,
+                'decrypt_ms_total': round(self.decrypt_ms, 2),
+                'ms_per_page': round(self.page_ms / self.pages, 3) if self.pages else None,
+                'last_page': self.last_page,
+            }
+
+
+def _create_message_cache() -> DecryptedMessageCache:
+    from yuuzone.config import MESSAGE_CACHE_MAX_BYTES, MESSAGE_DECRYPT_BATCH_THRESHOLD, MESSAGE_DECRYPT_WORKERS
+    return DecryptedMessageCache(MESSAGE_CACHE_MAX_BYTES, MESSAGE_DECRYPT_BATCH_THRESHOLD, MESSAGE_DECRYPT_WORKERS)
+
+
+# Global instance
+message_cache = _create_message_cache()
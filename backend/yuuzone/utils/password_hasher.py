@@ -0,0 +1,129 @@
+"""
+Password Hashing Service
+Runs bcrypt hashing and verification off the eventlet hub with bounded concurrency.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash operations are already waiting for a worker"""
+
+
+class PasswordHasher:
+    """Bounded bcrypt executor with latency metrics and transparent cost upgrades"""
+
+    def __init__(self, rounds: int = 12, max_workers: int = 1, max_pending: int = 32):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending  # Running + waiting operations before new ones are rejected
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.operations = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.last_ms: Optional[float] = None
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+
+    def _execute(self, func, *args):
+        """Run a bcrypt call in a native thread so the hub keeps serving other greenlets"""
+        from yuuzone.utils.green_db import is_eventlet_active
+        if is_eventlet_active():
+            from eventlet import tpool
+            return tpool.execute(func, *args)
+        # Plain threaded server: bcrypt releases the GIL, so the request thread can run it directly
+        return func(*args)
+
+    def _run(self, func, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy(f"{self.pending} password operations already pending")
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        start_time = time.perf_counter()
+        try:
+            with self.slots:
+                return self._execute(func, *args)
+        finally:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            with self.lock:
+                self.pending -= 1
+                self.operations += 1
+                self.last_ms = elapsed_ms
+                self.max_ms = max(self.max_ms, elapsed_ms)
+                self.total_ms += elapsed_ms
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured cost factor"""
+        return self._run(bcrypt.hashpw, password.encode(), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        """Check a password against a stored bcrypt hash"""
+        if not password or not password_hash:
+            return False
+        try:
+            return self._run(bcrypt.checkpw, password.encode(), password_hash.encode())
+        except ValueError as e:
+            logger.warning(f"Invalid stored password hash: {e}")
+            return False
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when the stored hash was made with a lower cost factor than configured"""
+        try:
+            return int(password_hash.split("$")[2]) < self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+    def verify_user(self, user, password: str) -> bool:
+        """Verify a user's password and upgrade the stored hash if its cost factor is outdated"""
+        if not self.verify(password, user.password_hash):
+            return False
+        if self.needs_rehash(user.password_hash):
+            from yuuzone import db
+            try:
+                user.password_hash = self.hash(password)
+                db.session.commit()
+                with self.lock:
+                    self.rehashed += 1
+                logger.info(f"Upgraded password hash for user {user.id} to cost {self.rounds}")
+            except Exception as e:
+                # The old hash is still valid, the upgrade is retried on the next login
+                db.session.rollback()
+                logger.error(f"Failed to upgrade password hash for user {user.id}: {e}")
+        return True
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                "rounds": self.rounds,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "peak_pending": self.peak_pending,
+                "operations": self.operations,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "last_ms": round(self.last_ms, 2) if self.last_ms is not None else None,
+                "max_ms": round(self.max_ms, 2),
+                "avg_ms": round(self.total_ms / self.operations, 2) if self.operations else None,
+            }
+
+
+def _create_password_hasher() -> PasswordHasher:
+    from yuuzone.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+    return PasswordHasher(BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+
+# Global instance
+password_hasher = _create_password_hasher()
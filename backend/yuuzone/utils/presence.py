@@ -0,0 +1,335 @@
+"""
+Presence Service
+Server-side source of truth for who is online and how many people are in each room. Sockets are
+tracked per user and per room from connect, join, leave and disconnect; sockets that miss their
+heartbeats stop counting until the next one. Count and status changes are pushed debounced, once
+per tick, instead of on every join or leave.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Room types whose live count is pushed to the room
+COUNTED_ROOM_TYPES = {'sub': 'subthread_id', 'post': 'post_id'}
+# Room types a user's online/offline status is pushed to
+STATUS_ROOM_TYPES = ('sub', 'post', 'chat')
+ACTIVE_USERS_LIMIT = 20
+# Flushes a worker's cluster report may miss before peers stop counting it
+REPORT_TTL_TICKS = 5
+
+
+class _Socket:
+    __slots__ = ('user_key', 'username', 'rooms', 'active')
+
+    def __init__(self, user_key: str, username: Optional[str]):
+        self.user_key = user_key  # 'u<id>' for users, the sid for anonymous sockets
+        self.username = username
+        self.rooms: Set[str] = set()
+        self.active = False
+
+
+class PresenceService:
+    """Sockets per user and per room, expired on missed heartbeats, with debounced pushes"""
+
+    def __init__(self, heartbeat_ttl: float = 90, debounce_ms: int = 1000):
+        self.heartbeat_ttl = heartbeat_ttl
+        self.debounce = debounce_ms / 1000.0
+        self.lock = threading.Lock()
+        self.sockets: Dict[str, _Socket] = {}
+        # Active sockets by last heartbeat, oldest first, so expiry only looks at the ones due
+        self.deadlines: "OrderedDict[str, float]" = OrderedDict()
+        self.user_sockets: Dict[str, int] = {}  # user key -> active sockets
+        self.room_users: Dict[str, Dict[str, int]] = {}  # room -> user key -> active sockets in the room
+        self.usernames: Dict[str, str] = {}  # user key -> username
+        self.dirty_rooms: Set[str] = set()
+        self.status_changes: Dict[str, Set[str]] = {}  # user key -> rooms to tell
+        self.pushed_counts: Dict[str, int] = {}
+        self.pushed_status: Dict[str, str] = {}
+        self.flush_thread = None
+        self.is_running = False
+        self.heartbeats = 0
+        self.expired = 0
+        self.count_pushes = 0
+        self.status_pushes = 0
+
+    # Bookkeeping; callers hold the lock
+
+    def _activate(self, sid: str, entry: _Socket, now: float) -> None:
+        entry.active = True
+        self.deadlines[sid] = now
+        users = self.user_sockets.get(entry.user_key, 0)
+        self.user_sockets[entry.user_key] = users + 1
+        if users == 0 and entry.username:
+            self.usernames[entry.user_key] = entry.username
+            self.status_changes.setdefault(entry.user_key, set()).update(entry.rooms)
+        for room in entry.rooms:
+            self._enter(entry.user_key, room)
+
+    def _deactivate(self, sid: str, entry: _Socket) -> None:
+        entry.active = False
+        self.deadlines.pop(sid, None)
+        for room in entry.rooms:
+            self._exit(entry.user_key, room)
+        users = self.user_sockets[entry.user_key] - 1
+        if users:
+            self.user_sockets[entry.user_key] = users
+        else:
+            del self.user_sockets[entry.user_key]
+            if entry.username:
+                self.status_changes.setdefault(entry.user_key, set()).update(entry.rooms)
+
+    def _enter(self, user_key: str, room: str) -> None:
+        members = self.room_users.setdefault(room, {})
+        members[user_key] = members.get(user_key, 0) + 1
+        self.dirty_rooms.add(room)
+
+    def _exit(self, user_key: str, room: str) -> None:
+        members = self.room_users[room]
+        count = members[user_key] - 1
+        if count:
+            members[user_key] = count
+        else:
+            del members[user_key]
+            if not members:
+                del self.room_users[room]
+        self.dirty_rooms.add(room)
+
+    def _seen(self, sid: str, entry: _Socket) -> None:
+        now = time.monotonic()
+        if entry.active:
+            self.deadlines[sid] = now
+            self.deadlines.move_to_end(sid)
+        else:
+            self._activate(sid, entry, now)
+
+    # Socket events
+
+    def connect(self, sid: str, user_id=None, username: Optional[str] = None) -> None:
+        entry = _Socket(f'u{user_id}' if user_id is not None else sid, username)
+        with self.lock:
+            previous = self.sockets.pop(sid, None)
+            if previous is not None and previous.active:
+                self._deactivate(sid, previous)
+            self.sockets[sid] = entry
+            self._activate(sid, entry, time.monotonic())
+
+    def disconnect(self, sid: str) -> None:
+        with self.lock:
+            entry = self.sockets.pop(sid, None)
+            if entry is not None and entry.active:
+                self._deactivate(sid, entry)
+
+    def join(self, sid: str, room: str) -> None:
+        with self.lock:
+            entry = self.sockets.get(sid)
+            if entry is None or room in entry.rooms:
+                return
+            entry.rooms.add(room)
+            if entry.active:
+                self._enter(entry.user_key, room)
+            self._seen(sid, entry)
+            if entry.username and room.startswith('chat:'):
+                # The other side of the chat learns this user is here
+                self.status_changes.setdefault(entry.user_key, set()).add(room)
+
+    def leave(self, sid: str, room: str) -> None:
+        with self.lock:
+            entry = self.sockets.get(sid)
+            if entry is None or room not in entry.rooms:
+                return
+            entry.rooms.discard(room)
+            if entry.active:
+                self._exit(entry.user_key, room)
+
+    def heartbeat(self, sid: str) -> bool:
+        with self.lock:
+            entry = self.sockets.get(sid)
+            if entry is None:
+                return False
+            self.heartbeats += 1
+            self._seen(sid, entry)
+        return True
+
+    def expire(self) -> int:
+        """Stop counting sockets that missed their heartbeats; work is proportional to the sockets due"""
+        cutoff = time.monotonic() - self.heartbeat_ttl
+        expired = 0
+        with self.lock:
+            while self.deadlines:
+                sid, last_seen = next(iter(self.deadlines.items()))
+                if last_seen > cutoff:
+                    break
+                self._deactivate(sid, self.sockets[sid])
+                expired += 1
+            self.expired += expired
+        return expired
+
+    # Queries
+
+    def room_count(self, room: str) -> int:
+        """Distinct users (anonymous sockets count once each) in a room on this worker"""
+        with self.lock:
+            return len(self.room_users.get(room, ()))
+
+    def is_online(self, user_id) -> bool:
+        with self.lock:
+            return f'u{user_id}' in self.user_sockets
+
+    def _active_usernames(self, room: str) -> List[str]:
+        names = []
+        for user_key in self.room_users.get(room, ()):
+            name = self.usernames.get(user_key)
+            if name:
+                names.append(name)
+                if len(names) >= ACTIVE_USERS_LIMIT:
+                    break
+        return names
+
+    # Pushes
+
+    def _owner(self, room: str, local_count: int, peers: Dict[str, Dict[str, int]], worker_id: str) -> Optional[str]:
+        """The worker that pushes a room's count: the lowest id among workers with sockets in it"""
+        holders = [peer for peer, counts in peers.items() if counts.get(room)]
+        if local_count:
+            holders.append(worker_id)
+        return min(holders) if holders else None
+
+    def flush(self) -> int:
+        """Report this worker's counts to the cluster, then push changed room counts and user status
+
+        One cluster report per tick carries every counted room and online user on this worker. Each
+        room's count is pushed by one worker only; the others just track the total.
+        """
+        from yuuzone.socketio_app import socketio
+        from yuuzone.utils.cluster import cluster
+
+        self.expire()
+        with self.lock:
+            dirty, self.dirty_rooms = self.dirty_rooms, set()
+            changes, self.status_changes = self.status_changes, {}
+            local = {
+                room: len(members) for room, members in self.room_users.items()
+                if room.partition(':')[0] in COUNTED_ROOM_TYPES
+            }
+            reported = dict(local)
+            reported.update((key, 1) for key in self.user_sockets if key in self.usernames)
+            # Rooms whose count this worker may have to push: its own, and ones it saw change or pushed before
+            rooms = set(local).union(
+                room for room in dirty if room.partition(':')[0] in COUNTED_ROOM_TYPES
+            ).union(self.pushed_counts)
+            active_users = {room: self._active_usernames(room) for room in rooms}
+            statuses = {
+                user_key: (user_key in self.user_sockets, self.usernames.get(user_key), rooms_to_tell)
+                for user_key, rooms_to_tell in changes.items()
+            }
+            for user_key in changes:
+                if user_key not in self.user_sockets:
+                    self.usernames.pop(user_key, None)
+
+        # Other workers hold the rest of each room
+        peers = cluster.report_counts('presence', reported, ttl=max(10.0, self.debounce * REPORT_TTL_TICKS))
+
+        sent = 0
+        for room in rooms:
+            local_count = local.get(room, 0)
+            total = local_count + sum(counts.get(room, 0) for counts in peers.values())
+            owner = self._owner(room, local_count, peers, cluster.worker_id)
+            changed = self.pushed_counts.get(room, 0) != total
+            if total:
+                self.pushed_counts[room] = total
+            else:
+                self.pushed_counts.pop(room, None)
+            if owner is None:
+                # An emptied room has no holder left; the worker that saw it empty says so
+                pushes = room in dirty
+            else:
+                pushes = owner == cluster.worker_id
+            if not changed or not pushes:
+                continue
+            room_type, _, entity_id = room.partition(':')
+            socketio.emit('live_user_count_updated', {
+                'room': room,
+                COUNTED_ROOM_TYPES[room_type]: int(entity_id),
+                'user_count': total,
+                'active_users': active_users[room],
+            }, room=room)
+            sent += 1
+            self.count_pushes += 1
+
+        for user_key, (online_here, username, rooms_to_tell) in statuses.items():
+            if not username:
+                continue
+            # A user whose last socket here closed may still be connected to another worker
+            elsewhere = any(counts.get(user_key) for counts in peers.values())
+            status = 'online' if online_here or elsewhere else 'offline'
+            targets = [room for room in rooms_to_tell if room.partition(':')[0] in STATUS_ROOM_TYPES]
+            new_chat = status == 'online' and any(room.startswith('chat:') for room in targets)
+            if self.pushed_status.get(user_key) == status and not new_chat:
+                continue
+            if status == 'online':
+                self.pushed_status[user_key] = status
+            else:
+                self.pushed_status.pop(user_key, None)
+            for room in targets:
+                socketio.emit('user_status_changed', {'username': username, 'status': status}, room=room)
+                sent += 1
+                self.status_pushes += 1
+        return sent
+
+    def _flush_loop(self):
+        while self.is_running:
+            time.sleep(self.debounce)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error in presence flush loop: {e}")
+
+    def start(self):
+        """Start the debounce thread"""
+        if self.flush_thread is None or not self.flush_thread.is_alive():
+            self.is_running = True
+            self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self.flush_thread.start()
+            logger.info(f"Presence service started ({self.debounce * 1000:.0f}ms debounce, {self.heartbeat_ttl:.0f}s heartbeat TTL)")
+
+    def stop(self):
+        self.is_running = False
+        if self.flush_thread and self.flush_thread.is_alive():
+            self.flush_thread.join(timeout=5)
+        logger.info("Presence service stopped")
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'running': self.is_running,
+                'sockets': len(self.sockets),
+                'active_sockets': len(self.deadlines),
+                'online_users': sum(1 for key in self.user_sockets if key.startswith('u')),
+                'rooms': len(self.room_users),
+                'heartbeats': self.heartbeats,
+                'expired': self.expired,
+                'count_pushes': self.count_pushes,
+                'status_pushes': self.status_pushes,
+            }
+
+
+def _create_presence_service() -> PresenceService:
+    from yuuzone.config import PRESENCE_HEARTBEAT_TTL, PRESENCE_DEBOUNCE_MS
+    return PresenceService(heartbeat_ttl=PRESENCE_HEARTBEAT_TTL, debounce_ms=PRESENCE_DEBOUNCE_MS)
+
+
+# Global instance
+presence = _create_presence_service()
+
+
+def init_presence(app):
+    """Start the debounce thread"""
+    presence.start()
+    import atexit
+    atexit.register(presence.stop)
+    return presence
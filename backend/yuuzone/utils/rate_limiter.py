@@ -1,18 +1,14 @@
-import time
 import logging
 from functools import wraps
 from flask import request, jsonify, current_app
 from flask_login import current_user
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
-import threading
+from yuuzone.utils.cluster import cluster
 
 class RateLimiter:
     """Rate limiter for preventing spam and duplicate submissions"""
     
     def __init__(self):
-        self.rate_limits = defaultdict(lambda: deque())
-        self.lock = threading.Lock()
+        # Attempt windows live on the cluster backend so every worker counts against the same limit
         
         # Define rate limits for different actions
         self.limits = {
@@ -40,65 +36,35 @@ class RateLimiter:
             ip = request.headers.get('X-Forwarded-For', request.remote_addr)
             return f"ip_{ip}_{action}"
     
-    def _cleanup_old_entries(self, action):
-        """Remove old entries from rate limit tracking"""
-        identifier = self._get_identifier(action)
-        limit_config = self.limits.get(action, {'max_attempts': 10, 'window': 300})
-        cutoff_time = time.time() - limit_config['window']
-        
-        with self.lock:
-            if identifier in self.rate_limits:
-                # Remove entries older than the window
-                self.rate_limits[identifier] = deque(
-                    timestamp for timestamp in self.rate_limits[identifier] 
-                    if timestamp > cutoff_time
-                )
+    def _window(self, action, record):
+        limit_config = self.limits[action]
+        return cluster.hit_window(self._get_identifier(action), limit_config['max_attempts'],
+                                  limit_config['window'], record=record)
     
     def is_rate_limited(self, action):
         """Check if the current request is rate limited"""
         if action not in self.limits:
             return False
-            
-        self._cleanup_old_entries(action)
-        identifier = self._get_identifier(action)
-        limit_config = self.limits[action]
         
-        with self.lock:
-            attempts = len(self.rate_limits[identifier])
-            if attempts >= limit_config['max_attempts']:
-                return True
-            
-            # Add current attempt
-            self.rate_limits[identifier].append(time.time())
-            return False
+        # Counting and recording happen in one step on the shared backend, so concurrent workers cannot overshoot
+        allowed, _attempts, _reset = self._window(action, record=True)
+        return not allowed
     
     def get_remaining_attempts(self, action):
         """Get remaining attempts for an action"""
         if action not in self.limits:
             return float('inf')
-            
-        self._cleanup_old_entries(action)
-        identifier = self._get_identifier(action)
-        limit_config = self.limits[action]
         
-        with self.lock:
-            attempts = len(self.rate_limits[identifier])
-            return max(0, limit_config['max_attempts'] - attempts)
+        _allowed, attempts, _reset = self._window(action, record=False)
+        return max(0, self.limits[action]['max_attempts'] - attempts)
     
     def get_reset_time(self, action):
         """Get time until rate limit resets"""
         if action not in self.limits:
             return 0
-            
-        identifier = self._get_identifier(action)
-        limit_config = self.limits[action]
         
-        with self.lock:
-            if identifier in self.rate_limits and self.rate_limits[identifier]:
-                oldest_timestamp = min(self.rate_limits[identifier])
-                reset_time = oldest_timestamp + limit_config['window'] - time.time()
-                return max(0, reset_time)
-        return 0
+        _allowed, _attempts, reset = self._window(action, record=False)
+        return reset
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
@@ -133,8 +99,7 @@ class DuplicateDetector:
     """Detect duplicate submissions to prevent spam"""
     
     def __init__(self):
-        self.recent_submissions = defaultdict(lambda: deque())
-        self.lock = threading.Lock()
+        # Recent submissions live on the cluster backend so a resubmission hitting another worker is still caught
         
         # Define duplicate detection rules
         self.duplicate_rules = {
@@ -187,27 +152,16 @@ class DuplicateDetector:
             
         rule = self.duplicate_rules[action]
         identifier = self._get_identifier(action)
-        cutoff_time = time.time() - rule['window']
         
-        with self.lock:
-            # Clean old entries
-            self.recent_submissions[identifier] = deque(
-                entry for entry in self.recent_submissions[identifier]
-                if entry['timestamp'] > cutoff_time
-            )
-            
-            # Check for duplicates
-            for entry in self.recent_submissions[identifier]:
-                if self._is_similar_submission(data, entry['data'], rule):
-                    return True
-            
-            # Add current submission
-            self.recent_submissions[identifier].append({
-                'timestamp': time.time(),
-                'data': data.copy()
-            })
-            
-            return False
+        # Check for duplicates
+        for entry in cluster.recent_entries(identifier, rule['window']):
+            if self._is_similar_submission(data, entry, rule):
+                return True
+        
+        # Add current submission (only the compared fields are kept)
+        cluster.add_entry(identifier, {field: data[field] for field in rule['fields'] if field in data}, rule['window'])
+        
+        return False
     
     def _is_similar_submission(self, new_data, old_data, rule):
         """Check if two submissions are similar enough to be considered duplicates"""
@@ -0,0 +1,202 @@
+"""
+Reconnect Replay Log
+Recent events per room, numbered with this worker's sequence, so a socket that reconnects gets only
+what it missed in the rooms it rejoins instead of refetching them. Each room keeps a bounded ring
+buffer; entries past the TTL are dropped lazily when the room is next written or read. A client
+too far behind (events evicted, worker restarted) is told to refetch.
+
+Events are stamped where each worker delivers them (the client manager below), so with a message
+queue the numbers a socket sees all come from the worker holding it.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+import socketio
+
+from yuuzone.utils.cluster import LocalPubSubManager
+
+logger = logging.getLogger(__name__)
+
+# Room types whose events are logged; settings rooms carry state pushes that are refetched anyway
+REPLAY_ROOM_TYPES = ('sub', 'post', 'chat', 'feed', 'user')
+# Transient or state-carrying events a reconnected client has no use for
+SKIP_EVENTS = frozenset({'user_typing', 'user_stop_typing', 'live_user_count_updated', 'user_status_changed'})
+SEQ_FIELD = '_seq'
+
+
+class _RoomLog:
+    __slots__ = ('events', 'lost')
+
+    def __init__(self, max_events: int):
+        self.events: deque = deque(maxlen=max_events)  # (seq, recorded at, event, data)
+        self.lost = 0  # Highest sequence number no longer in the buffer
+
+
+class ReplayLog:
+    """Ring buffer per room, sequence numbers per worker, resume points per reconnected socket"""
+
+    def __init__(self, max_events: int = 100, max_rooms: int = 2000, ttl: float = 120):
+        self.max_events = max_events
+        self.max_rooms = max_rooms
+        self.ttl = ttl
+        self.epoch = uuid.uuid4().hex[:12]  # A restarted worker starts a new epoch and numbering
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.logs: "OrderedDict[str, _RoomLog]" = OrderedDict()  # Least recently written first
+        self.evicted_through = 0  # Highest sequence number dropped with a whole room
+        self.resumes: Dict[str, Tuple[int, float]] = {}  # sid -> (last seq the client saw, since when)
+        self.recorded = 0
+        self.replayed = 0
+        self.refetches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_events > 0 and self.max_rooms > 0
+
+    def _expire(self, log: _RoomLog, now: float) -> None:
+        cutoff = now - self.ttl
+        events = log.events
+        while events and events[0][1] <= cutoff:
+            log.lost = events.popleft()[0]
+
+    def stamp(self, event: str, data, room, namespace: Optional[str] = None):
+        """Number a room event and log it; returns the payload to send, with its sequence number"""
+        if not self.enabled or room is None or event in SKIP_EVENTS or not isinstance(data, dict):
+            return data
+        if namespace not in (None, '/'):
+            return data
+        rooms = [room] if isinstance(room, str) else list(room)
+        rooms = [name for name in rooms if isinstance(name, str) and name.partition(':')[0] in REPLAY_ROOM_TYPES]
+        if not rooms:
+            return data
+
+        now = time.monotonic()
+        with self.lock:
+            self.seq += 1
+            stamped = dict(data)
+            stamped[SEQ_FIELD] = self.seq
+            entry = (self.seq, now, event, stamped)
+            for name in rooms:
+                log = self.logs.get(name)
+                if log is None:
+                    log = self.logs[name] = _RoomLog(self.max_events)
+                    if len(self.logs) > self.max_rooms:
+                        _, evicted = self.logs.popitem(last=False)
+                        if evicted.events:
+                            self.evicted_through = max(self.evicted_through, evicted.events[-1][0])
+                else:
+                    self.logs.move_to_end(name)
+                    self._expire(log, now)
+                if len(log.events) == log.events.maxlen:
+                    log.lost = log.events[0][0]
+                log.events.append(entry)
+            self.recorded += 1
+        return stamped
+
+    def position(self) -> Dict:
+        """Where a client resumes from if it reconnects to this worker"""
+        with self.lock:
+            return {'epoch': self.epoch, 'seq': self.seq}
+
+    def resume(self, sid: str, epoch, seq) -> bool:
+        """Record a reconnected socket's last seen sequence number; False if it cannot resume here"""
+        if not self.enabled or epoch != self.epoch or not isinstance(seq, int) or seq < 0:
+            return False
+        with self.lock:
+            if seq > self.seq:
+                return False
+            self.resumes[sid] = (seq, time.monotonic())
+        return True
+
+    def catch_up(self, sid: str, rooms: List[str]) -> Tuple[List[list], List[str]]:
+        """([event, data] the socket missed in `rooms`, oldest first; rooms it must refetch instead)"""
+        now = time.monotonic()
+        with self.lock:
+            resume = self.resumes.get(sid)
+            if resume is None:
+                return [], []
+            since, resumed_at = resume
+            if now - resumed_at > self.ttl:
+                # Later joins are new rooms, not rejoins
+                del self.resumes[sid]
+                return [], []
+            missed: Dict[int, list] = {}
+            refetch = []
+            for name in rooms:
+                log = self.logs.get(name)
+                if log is None:
+                    if since < self.evicted_through:
+                        refetch.append(name)
+                    continue
+                self._expire(log, now)
+                if since < log.lost:
+                    refetch.append(name)
+                    continue
+                for seq, _recorded, event, data in reversed(log.events):
+                    if seq <= since:
+                        break
+                    missed[seq] = [event, data]
+            self.replayed += len(missed)
+            self.refetches += len(refetch)
+        return [missed[seq] for seq in sorted(missed)], refetch
+
+    def drop(self, sid: str) -> None:
+        """Forget a disconnected socket's resume point"""
+        with self.lock:
+            self.resumes.pop(sid, None)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'epoch': self.epoch,
+                'seq': self.seq,
+                'rooms': len(self.logs),
+                'events': sum(len(log.events) for log in self.logs.values()),
+                'max_events_per_room': self.max_events,
+                'max_rooms': self.max_rooms,
+                'ttl': self.ttl,
+                'resuming_sockets': len(self.resumes),
+                'recorded': self.recorded,
+                'replayed': self.replayed,
+                'refetches': self.refetches,
+            }
+
+
+def _create_replay_log() -> ReplayLog:
+    from yuuzone.config import REPLAY_MAX_EVENTS_PER_ROOM, REPLAY_MAX_ROOMS, REPLAY_TTL
+    return ReplayLog(max_events=REPLAY_MAX_EVENTS_PER_ROOM, max_rooms=REPLAY_MAX_ROOMS, ttl=REPLAY_TTL)
+
+
+# Global instance
+replay_log = _create_replay_log()
+
+
+class ReplayManager(socketio.Manager):
+    """Client manager for a single process: stamps room events as they are delivered"""
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        room = to or room
+        return super().emit(event, replay_log.stamp(event, data, room, namespace), namespace,
+                            room=room, skip_sid=skip_sid, callback=callback, **kwargs)
+
+
+class ReplayPubSubMixin:
+    """For message-queue managers: every worker stamps the events it delivers to its own sockets"""
+
+    def _handle_emit(self, message):
+        data = replay_log.stamp(message['event'], message['data'], message.get('room'), message.get('namespace'))
+        return super()._handle_emit(dict(message, data=data))
+
+
+class ReplayLocalPubSubManager(ReplayPubSubMixin, LocalPubSubManager):
+    pass
+
+
+class ReplayRedisManager(ReplayPubSubMixin, socketio.RedisManager):
+    pass
@@ -0,0 +1,179 @@
+"""
+Room Registry
+Typed Socket.IO room names, validated on join, with per-socket limits and membership counts per room type.
+
+    sub:<subthread_id>   post:<post_id>   chat:<username>:<username>   user:<id|username>   settings:<id>
+
+Feed rooms (feed:<subthread_id>) are not joined by clients; utils.feeds manages them.
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Usernames start with a letter, so user:<id> and user:<username> never collide and ':' never appears in one
+_ID = re.compile(r'^[0-9]{1,18}$')
+_USERNAME = re.compile(r'^[A-Za-z][A-Za-z0-9_]{0,49}$')
+
+# Rooms of each type one socket may hold at once; a tab sits in a handful, these leave room for several tabs' worth
+DEFAULT_TYPE_LIMITS: Dict[str, int] = {
+    'sub': 10,
+    'post': 10,
+    'chat': 10,
+    'user': 2,  # By id and by username
+    'settings': 1,
+}
+
+
+def sub_room(subthread_id) -> str:
+    return f'sub:{subthread_id}'
+
+
+def post_room(post_id) -> str:
+    return f'post:{post_id}'
+
+
+def user_room(user) -> str:
+    """Personal room, by user id or username"""
+    return f'user:{user}'
+
+
+def settings_room(user_id) -> str:
+    return f'settings:{user_id}'
+
+
+def chat_room(first_username: str, second_username: str) -> str:
+    first, second = sorted((first_username, second_username))
+    return f'chat:{first}:{second}'
+
+
+def parse_room(room) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """(type, parts) for a well-formed room name, None otherwise"""
+    if not isinstance(room, str) or len(room) > 100:
+        return None
+    room_type, _, rest = room.partition(':')
+    parts = tuple(rest.split(':'))
+    if room_type in ('sub', 'post', 'settings'):
+        valid = len(parts) == 1 and _ID.match(parts[0])
+    elif room_type == 'user':
+        valid = len(parts) == 1 and (_ID.match(parts[0]) or _USERNAME.match(parts[0]))
+    elif room_type == 'chat':
+        valid = len(parts) == 2 and all(_USERNAME.match(part) for part in parts) and parts[0] <= parts[1]
+    else:
+        valid = False
+    return (room_type, parts) if valid else None
+
+
+def authorize(room_type: str, parts: Tuple[str, ...], user) -> Optional[str]:
+    """Error message if `user` (a Flask-Login user) may not join the room, None if it may"""
+    if room_type not in ('user', 'settings', 'chat'):
+        return None
+    if not user.is_authenticated:
+        return f'Authentication required for {room_type} rooms'
+    if room_type == 'user' and parts[0] in (str(user.id), user.username):
+        return None
+    if room_type == 'settings' and parts[0] == str(user.id):
+        return None
+    if room_type == 'chat' and user.username in parts:
+        return None
+    return f'Not a member of this {room_type} room'
+
+
+class RoomRegistry:
+    """Which typed rooms each socket holds; enforces the per-socket limits and keeps counts per type"""
+
+    def __init__(self, max_rooms: int = 32, type_limits: Optional[Dict[str, int]] = None):
+        self.max_rooms = max_rooms
+        self.type_limits = dict(DEFAULT_TYPE_LIMITS if type_limits is None else type_limits)
+        self.lock = threading.Lock()
+        self.memberships: Dict[str, Set[str]] = {}  # sid -> rooms
+        self.room_sizes: Dict[str, int] = {}  # room -> sockets on this worker
+        self.type_memberships: Dict[str, int] = {room_type: 0 for room_type in self.type_limits}
+        self.type_rooms: Dict[str, int] = {room_type: 0 for room_type in self.type_limits}
+        self.rejected: Dict[str, int] = {}
+
+    def _reject(self, reason: str, message: str) -> str:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return message
+
+    def add(self, sid: str, room, user) -> Optional[str]:
+        """Validate and record a join; returns an error message, or None when the socket may join"""
+        parsed = parse_room(room)
+        if parsed is None:
+            with self.lock:
+                return self._reject('invalid', 'Invalid room name')
+        room_type, parts = parsed
+        error = authorize(room_type, parts, user)
+        with self.lock:
+            if error:
+                return self._reject('unauthorized', error)
+            rooms = self.memberships.setdefault(sid, set())
+            if room in rooms:
+                return None
+            if len(rooms) >= self.max_rooms:
+                return self._reject('socket_limit', f'Room limit reached ({self.max_rooms})')
+            held = sum(1 for joined in rooms if joined.partition(':')[0] == room_type)
+            if held >= self.type_limits.get(room_type, 0):
+                return self._reject('type_limit', f'Too many {room_type} rooms')
+            rooms.add(room)
+            self.type_memberships[room_type] += 1
+            size = self.room_sizes.get(room, 0)
+            if size == 0:
+                self.type_rooms[room_type] += 1
+            self.room_sizes[room] = size + 1
+        return None
+
+    def _discard(self, room: str) -> None:
+        room_type = room.partition(':')[0]
+        self.type_memberships[room_type] -= 1
+        size = self.room_sizes.pop(room) - 1
+        if size:
+            self.room_sizes[room] = size
+        else:
+            self.type_rooms[room_type] -= 1
+
+    def remove(self, sid: str, room) -> bool:
+        with self.lock:
+            rooms = self.memberships.get(sid)
+            if not rooms or room not in rooms:
+                return False
+            rooms.discard(room)
+            if not rooms:
+                del self.memberships[sid]
+            self._discard(room)
+        return True
+
+    def drop(self, sid: str) -> Set[str]:
+        """Forget a disconnected socket; returns the rooms it held"""
+        with self.lock:
+            rooms = self.memberships.pop(sid, set())
+            for room in rooms:
+                self._discard(room)
+        return rooms
+
+    def is_member(self, sid: str, room) -> bool:
+        with self.lock:
+            return room in self.memberships.get(sid, ())
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'sockets': len(self.memberships),
+                'memberships': dict(self.type_memberships),
+                'rooms': dict(self.type_rooms),
+                'max_rooms_per_socket': self.max_rooms,
+                'type_limits': dict(self.type_limits),
+                'rejected': dict(self.rejected),
+            }
+
+
+def _create_room_registry() -> RoomRegistry:
+    from yuuzone.config import ROOM_MAX_PER_SOCKET
+    return RoomRegistry(max_rooms=ROOM_MAX_PER_SOCKET)
+
+
+# Global instance
+room_registry = _create_room_registry()
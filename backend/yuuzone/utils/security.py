@@ -399,7 +399,6 @@ class SecureURLValidator:
 class URLUploadRateLimit:
     """Simple rate limiting for URL uploads"""
     
-    _upload_counts = {}  # user_id -> [(timestamp, count), ...]
     MAX_UPLOADS_PER_HOUR = 20
     
     @classmethod
@@ -408,28 +407,11 @@ class URLUploadRateLimit:
         Check if user has exceeded rate limit
         Raises ValueError if rate limit exceeded
         """
-        import time
+        from yuuzone.utils.cluster import cluster
         
-        current_time = time.time()
-        hour_ago = current_time - 3600  # 1 hour ago
-        
-        # Clean old entries
-        if user_id in cls._upload_counts:
-            cls._upload_counts[user_id] = [
-                (timestamp, count) for timestamp, count in cls._upload_counts[user_id]
-                if timestamp > hour_ago
-            ]
-        
-        # Count uploads in last hour
-        user_uploads = cls._upload_counts.get(user_id, [])
-        total_uploads = sum(count for timestamp, count in user_uploads)
-        
-        if total_uploads >= cls.MAX_UPLOADS_PER_HOUR:
+        # Shared window so uploads through every worker count toward the same hourly limit
+        allowed, _uploads, _reset = cluster.hit_window(f"url_upload_{user_id}", cls.MAX_UPLOADS_PER_HOUR, 3600)
+        if not allowed:
             raise ValueError(f"Rate limit exceeded: maximum {cls.MAX_UPLOADS_PER_HOUR} URL uploads per hour")
         
-        # Record this upload
-        if user_id not in cls._upload_counts:
-            cls._upload_counts[user_id] = []
-        cls._upload_counts[user_id].append((current_time, 1))
-        
         #logging.info(f"User {user_id} URL upload count: {total_uploads + 1}/{cls.MAX_UPLOADS_PER_HOUR}")
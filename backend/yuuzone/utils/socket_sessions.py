@@ -0,0 +1,89 @@
+"""
+Socket Sessions
+The identity behind each Socket.IO connection, resolved once when it connects and reused by every event
+handler. With manage_session=False, Flask-Login would otherwise decode the session cookie and run the
+user loader again on every event. Records are refreshed after a TTL, so renames and deletions still
+reach long-lived sockets.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SocketIdentity(NamedTuple):
+    """Who a socket belongs to; has the attributes room authorization reads from a Flask-Login user"""
+    id: Optional[int]
+    username: Optional[str]
+    is_authenticated: bool
+
+
+ANONYMOUS = SocketIdentity(None, None, False)
+
+
+class SocketSessions:
+    """sid -> (identity, resolved at) for the connected sockets on this worker"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, Tuple[SocketIdentity, float]] = {}
+        self.hits = 0
+        self.resolves = 0
+
+    @staticmethod
+    def _identity(user) -> SocketIdentity:
+        if user is None or not user.is_authenticated:
+            return ANONYMOUS
+        return SocketIdentity(int(user.id), user.username, True)
+
+    def bind(self, sid: str, user) -> SocketIdentity:
+        """Record the identity of a Flask-Login user for a socket"""
+        identity = self._identity(user)
+        with self.lock:
+            self.sessions[sid] = (identity, time.monotonic())
+            self.resolves += 1
+        return identity
+
+    def get(self, sid: str) -> SocketIdentity:
+        """The socket's identity; resolved through Flask-Login, inside the event's request context, when missing or stale"""
+        with self.lock:
+            entry = self.sessions.get(sid)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+        from flask_login import current_user
+        return self.bind(sid, current_user)
+
+    def drop(self, sid: str) -> None:
+        """Forget a disconnected socket"""
+        with self.lock:
+            self.sessions.pop(sid, None)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'sockets': len(self.sessions),
+                'authenticated': sum(1 for identity, _ in self.sessions.values() if identity.is_authenticated),
+                'hits': self.hits,
+                'resolves': self.resolves,
+                'ttl': self.ttl,
+            }
+
+
+def _create_socket_sessions() -> SocketSessions:
+    from yuuzone.config import SOCKET_IDENTITY_TTL
+    return SocketSessions(ttl=SOCKET_IDENTITY_TTL)
+
+
+# Global instance
+socket_sessions = _create_socket_sessions()
+
+
+def socket_user() -> SocketIdentity:
+    """Identity of the socket whose event is being handled"""
+    from flask import request
+    return socket_sessions.get(request.sid)
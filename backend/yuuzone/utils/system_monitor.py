@@ -1,45 +1,125 @@
 import psutil
 import logging
+import threading
 import time
+from collections import deque
 from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from .cluster import cluster
+from .connection_registry import connection_registry
 
 logger = logging.getLogger(__name__)
 
 class SystemMonitor:
-    def __init__(self):
+    def __init__(self, sample_interval: float = 2.0, history_size: int = 150):
         self.cpu_threshold = 90  # CPU usage threshold (%) - increased from 80
         self.memory_threshold = 90  # Memory usage threshold (%) - increased from 85
         self.connection_limit = 150  # Maximum concurrent connections - increased from 100
-        self.connection_timeout = 300  # Connection timeout in seconds
-        self.active_connections: Dict[str, Dict] = {}
-        self.last_cleanup = datetime.now()
-        self.cleanup_interval = 120  # Cleanup every 120 seconds - increased from 60
-        
-    def get_system_stats(self) -> Dict:
-        """Get current system statistics"""
+        self.other_connections = 0  # Connections held by other workers, refreshed with each sample
+
+        # Background sampler: readers get the latest snapshot instead of sampling psutil themselves
+        self.sample_interval = sample_interval
+        self.history: deque = deque(maxlen=history_size)  # Recent samples, oldest first
+        self.snapshot: Optional[Dict] = None
+        self.snapshot_at = 0.0
+        self.sampler_thread = None
+        self.sampler_running = False
+        self.samples = 0
+        self.inline_samples = 0  # Samples taken on a caller's path because the snapshot was stale
+        self.last_sample_ms: Optional[float] = None
+
+    def start_sampler(self):
+        """Start the background sampling thread"""
+        if self.sampler_thread is None or not self.sampler_thread.is_alive():
+            self.sampler_running = True
+            # Prime cpu_percent so the first interval=None reading is measured against a baseline
+            psutil.cpu_percent(interval=None)
+            self.sampler_thread = threading.Thread(target=self._sampler_loop, daemon=True)
+            self.sampler_thread.start()
+            logger.info(f"System sampler started ({self.sample_interval}s interval)")
+
+    def stop_sampler(self):
+        """Stop the background sampling thread"""
+        self.sampler_running = False
+        if self.sampler_thread and self.sampler_thread.is_alive():
+            self.sampler_thread.join(timeout=5)
+            logger.info("System sampler stopped")
+
+    def _sampler_loop(self):
+        while self.sampler_running:
+            try:
+                self._sample()
+            except Exception as e:
+                logger.error(f"Error in system sampler loop: {e}")
+            time.sleep(self.sample_interval)
+
+    def _sample(self, report: bool = True) -> Optional[Dict]:
+        """Take one sample; cpu_percent(interval=None) reports usage since the previous call and never sleeps.
+        With report=False only local metrics are read; the cluster round trip is left to the sampler thread."""
+        start_time = time.perf_counter()
         try:
-            # Use a shorter interval for CPU check to reduce overhead
-            cpu_percent = psutil.cpu_percent(interval=0.1)  # Reduced from 1 second to 0.1 seconds
             memory = psutil.virtual_memory()
             disk = psutil.disk_usage('/')
-            
-            return {
-                'cpu_percent': cpu_percent,
+            sample = {
+                'cpu_percent': psutil.cpu_percent(interval=None),
                 'memory_percent': memory.percent,
                 'memory_available': memory.available,
                 'disk_percent': disk.percent,
-                'active_connections': len(self.active_connections),
                 'timestamp': datetime.now().isoformat()
             }
         except Exception as e:
-            logger.error(f"Error getting system stats: {e}")
+            logger.error(f"Error sampling system stats: {e}")
+            return None
+        if report:
+            # Publish this worker's count and pick up everyone else's, so the limit covers the whole deployment
+            self.other_connections = cluster.report_count('connections', len(connection_registry))
+        # Swap the reference; readers see either the old or the new snapshot, never a partial one
+        self.snapshot = sample
+        self.snapshot_at = time.monotonic()
+        self.history.append(sample)
+        self.samples += 1
+        self.last_sample_ms = (time.perf_counter() - start_time) * 1000
+        return sample
+
+    def _current(self) -> Optional[Dict]:
+        snapshot = self.snapshot
+        # Sampler not running (or stuck): fall back to a non-blocking inline sample of local metrics;
+        # peers' connection counts keep their last sampled value
+        if snapshot is None or time.monotonic() - self.snapshot_at > self.sample_interval * 3:
+            self.inline_samples += 1
+            snapshot = self._sample(report=False)
+        return snapshot
+
+    def get_system_stats(self) -> Dict:
+        """Get current system statistics from the latest sample"""
+        snapshot = self._current()
+        if not snapshot:
             return {}
+        return {
+            **snapshot,
+            'active_connections': len(connection_registry),
+            'cluster_connections': len(connection_registry) + self.other_connections,
+        }
+
+    def get_history(self) -> List[Dict]:
+        """Recent samples, oldest first"""
+        return list(self.history)
+
+    def get_sampler_status(self) -> Dict:
+        return {
+            'running': self.sampler_running,
+            'interval_seconds': self.sample_interval,
+            'samples': self.samples,
+            'inline_samples': self.inline_samples,
+            'history_size': len(self.history),
+            'last_sample_ms': round(self.last_sample_ms, 3) if self.last_sample_ms is not None else None,
+        }
     
     def should_accept_connections(self) -> bool:
         """Auto-decision: Should we accept new connections?"""
         try:
-            stats = self.get_system_stats()
+            stats = self._current() or {}
             
             # Check CPU usage
             if stats.get('cpu_percent', 0) > self.cpu_threshold:
@@ -52,8 +132,9 @@ class SystemMonitor:
                 return False
             
             # Check connection limit
-            if len(self.active_connections) >= self.connection_limit:
-                logger.warning(f"Connection limit reached: {len(self.active_connections)}")
+            connections = len(connection_registry) + self.other_connections
+            if connections >= self.connection_limit:
+                logger.warning(f"Connection limit reached: {connections}")
                 return False
             
             return True
@@ -61,100 +142,11 @@ class SystemMonitor:
         except Exception as e:
             logger.error(f"Error checking connection acceptance: {e}")
             return False
-    
-    def register_connection(self, connection_id: str, connection_type: str = "unknown") -> bool:
-        """Register a new connection"""
-        if not self.should_accept_connections():
-            return False
-        
-        self.active_connections[connection_id] = {
-            'type': connection_type,
-            'created_at': datetime.now(),
-            'last_activity': datetime.now(),
-            'status': 'active'
-        }
-        
-        logger.info(f"Connection registered: {connection_id} ({connection_type})")
-        return True
-    
-    def update_connection_activity(self, connection_id: str) -> bool:
-        """Update connection activity timestamp"""
-        if connection_id in self.active_connections:
-            self.active_connections[connection_id]['last_activity'] = datetime.now()
-            return True
-        return False
-    
-    def remove_connection(self, connection_id: str) -> bool:
-        """Remove a connection"""
-        if connection_id in self.active_connections:
-            connection_info = self.active_connections.pop(connection_id)
-            logger.info(f"Connection removed: {connection_id} ({connection_info['type']})")
-            return True
-        return False
-    
-    def cleanup_old_connections(self) -> int:
-        """Auto-cleanup: Remove stale connections"""
-        now = datetime.now()
-        removed_count = 0
-        
-        # Check if it's time for cleanup
-        if (now - self.last_cleanup).seconds < self.cleanup_interval:
-            return 0
-        
-        stale_connections = []
-        
-        for conn_id, conn_info in self.active_connections.items():
-            # Check for timeout
-            if (now - conn_info['last_activity']).seconds > self.connection_timeout:
-                stale_connections.append(conn_id)
-        
-        # Remove stale connections
-        for conn_id in stale_connections:
-            if self.remove_connection(conn_id):
-                removed_count += 1
-        
-        if removed_count > 0:
-            logger.info(f"Cleaned up {removed_count} stale connections")
-        
-        self.last_cleanup = now
-        return removed_count
-    
-    def get_connection_stats(self) -> Dict:
-        """Get connection statistics"""
-        now = datetime.now()
-        stats = {
-            'total_connections': len(self.active_connections),
-            'connection_types': {},
-            'oldest_connection': None,
-            'newest_connection': None
-        }
-        
-        if self.active_connections:
-            for conn_info in self.active_connections.values():
-                conn_type = conn_info['type']
-                stats['connection_types'][conn_type] = stats['connection_types'].get(conn_type, 0) + 1
-            
-            # Find oldest and newest connections
-            oldest = min(self.active_connections.values(), key=lambda x: x['created_at'])
-            newest = max(self.active_connections.values(), key=lambda x: x['created_at'])
-            
-            stats['oldest_connection'] = {
-                'age_seconds': (now - oldest['created_at']).seconds,
-                'type': oldest['type']
-            }
-            stats['newest_connection'] = {
-                'age_seconds': (now - newest['created_at']).seconds,
-                'type': newest['type']
-            }
-        
-        return stats
-    
-    def force_cleanup(self) -> int:
-        """Force cleanup of all connections"""
-        removed_count = len(self.active_connections)
-        self.active_connections.clear()
-        logger.warning(f"Force cleanup: removed {removed_count} connections")
-        return removed_count
+
+def _create_system_monitor() -> SystemMonitor:
+    from yuuzone.config import SYSTEM_SAMPLE_INTERVAL, SYSTEM_HISTORY_SIZE
+    return SystemMonitor(sample_interval=SYSTEM_SAMPLE_INTERVAL, history_size=SYSTEM_HISTORY_SIZE)
+
 
 # Global instance
-system_monitor = SystemMonitor() 
\ No newline at end of file
+system_monitor = _create_system_monitor() 
\ No newline at end of file
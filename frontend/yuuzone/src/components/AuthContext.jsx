@@ -5,9 +5,34 @@ import { createContext, useContext, useEffect, useState, useCallback, useRef } f
 import { io } from "socket.io-client";
 import { useTranslation } from "react-i18next";
 import themeManager from "../utils/themeManager";
+import { userRoom } from "../utils/rooms";
 
 const AuthContext = createContext();
 
+// Recently replayed sequence numbers, so an event delivered live and replayed is handled once
+const REPLAY_SEEN_LIMIT = 500;
+
+/** Refetch what rooms show after their missed events could not be replayed (every room when null) */
+function refetchRooms(queryClient, rooms) {
+  const types = rooms ? new Set(rooms.map((room) => room.split(":")[0])) : null;
+  const stale = (type) => !types || types.has(type);
+  if (stale("sub") || stale("feed")) {
+    queryClient.invalidateQueries({ queryKey: ["posts"] });
+  }
+  if (stale("post")) {
+    const postIds = rooms ? rooms.filter((room) => room.startsWith("post:")).map((room) => room.slice(5)) : [null];
+    postIds.forEach((postId) => {
+      queryClient.invalidateQueries({ queryKey: postId ? ["post", postId] : ["post"] });
+    });
+  }
+  if (stale("chat")) {
+    queryClient.invalidateQueries({ queryKey: ["chat"] });
+  }
+  if (stale("chat") || stale("user")) {
+    queryClient.invalidateQueries({ queryKey: ["inbox"] });
+  }
+}
+
 AuthProvider.propTypes = {
   children: PropTypes.any,
 };
@@ -25,6 +50,8 @@ export function AuthProvider({ children }) {
   
   // Ref to track current socket for cleanup
   const socketRef = useRef(null);
+  // Reconnect replay: the server epoch and the last sequence number this client saw, sent back on reconnect
+  const replayRef = useRef({ epoch: null, seq: 0, seen: new Set() });
   
   const { refetch } = useQuery({
     queryKey: ["user"],
@@ -387,7 +414,7 @@ export function AuthProvider({ children }) {
       
       try {
         if (socket.connected) {
-          socket.emit('leave', { room: `user_${socket.auth?.userId}` });
+          socket.emit('leave', { room: userRoom(socket.auth?.userId) });
         }
         socket.disconnect();
       } catch (error) {
@@ -420,7 +447,7 @@ export function AuthProvider({ children }) {
 
         
         newSocket = io(socketUrl, {
-          transports: ["polling", "websocket"], // Start with polling, upgrade to websocket
+          transports: ["websocket", "polling"], // WebSocket first; the polling fallback needs sticky sessions when the server runs several workers
           reconnection: true,
           reconnectionAttempts: 5,
           reconnectionDelay: 1000,
@@ -436,18 +463,60 @@ export function AuthProvider({ children }) {
           pingInterval: 25000, // Increased ping interval
           extraHeaders: {
             'X-Requested-With': 'XMLHttpRequest'
+          },
+          // Evaluated on every (re)connect, so rejoined rooms are caught up from the last event seen
+          auth: (cb) => {
+            const { epoch, seq } = replayRef.current;
+            cb(epoch ? { replay: { epoch, seq } } : {});
+          }
+        });
+
+        // False when the event was already handled
+        const noteSeq = (seq) => {
+          const replay = replayRef.current;
+          if (typeof seq !== "number") return true;
+          if (replay.seen.has(seq)) return false;
+          replay.seen.add(seq);
+          if (replay.seen.size > REPLAY_SEEN_LIMIT) {
+            replay.seen.delete(replay.seen.values().next().value);
           }
+          replay.seq = Math.max(replay.seq, seq);
+          return true;
+        };
+
+        newSocket.onAny((event, data) => {
+          noteSeq(data?._seq);
+        });
+
+        newSocket.on("connected", ({ replay } = {}) => {
+          // A new epoch means a restarted server: numbering starts over
+          if (replay && replay.epoch !== replayRef.current.epoch) {
+            replayRef.current = { epoch: replay.epoch, seq: replay.seq, seen: new Set() };
+          }
+        });
+
+        newSocket.on("replay_refetch", ({ rooms } = {}) => {
+          refetchRooms(queryClient, rooms);
         });
 
         newSocket.on("connect", () => {
           try {
     
-            newSocket.emit("join", { room: `user_${user.id}` });
+            newSocket.emit("join", { room: userRoom(user.id) });
                 } catch (error) {
         // Failed to join user room on connect
       }
         });
 
+        // Coalesced frames carry several events for one room; hand each to its own listeners
+        newSocket.on("batch", (frame) => {
+          (frame?.events || []).forEach(([event, data]) => {
+            // Replayed events may already have arrived live
+            if (frame.replay && !noteSeq(data?._seq)) return;
+            newSocket.listeners(event).forEach((listener) => listener(data));
+          });
+        });
+
         newSocket.on("disconnect", (reason) => {
   
         });
@@ -460,7 +529,7 @@ export function AuthProvider({ children }) {
   
           try {
             // Rejoin user room after reconnection
-            newSocket.emit("join", { room: `user_${user.id}` });
+            newSocket.emit("join", { room: userRoom(user.id) });
           } catch (error) {
             // Failed to join user room on reconnect
           }
@@ -497,7 +566,7 @@ export function AuthProvider({ children }) {
         if (currentSocket && typeof currentSocket.disconnect === 'function') {
           try {
             if (currentSocket.connected) {
-              currentSocket.emit("leave", { room: `user_${user.id}` });
+              currentSocket.emit("leave", { room: userRoom(user.id) });
             }
             currentSocket.disconnect();
 
@@ -513,6 +582,22 @@ export function AuthProvider({ children }) {
     }
   }, [user]);
 
+  // Presence: beat while the tab is visible; the server stops counting sockets that miss beats for 90s
+  useEffect(() => {
+    if (!socket) return;
+    const beat = () => {
+      if (socket.connected && document.visibilityState === "visible") {
+        socket.emit("presence_heartbeat");
+      }
+    };
+    const intervalId = setInterval(beat, 30000);
+    document.addEventListener("visibilitychange", beat);
+    return () => {
+      clearInterval(intervalId);
+      document.removeEventListener("visibilitychange", beat);
+    };
+  }, [socket]);
+
   // Add global error handler for socket-related errors
   useEffect(() => {
     const handleGlobalError = (event) => {
@@ -571,7 +656,7 @@ export function AuthProvider({ children }) {
     // Clean up socket connection
     try {
       if (socket && socket.connected) {
-        socket.emit('leave', { room: `user_${user.id}` });
+        socket.emit('leave', { room: userRoom(user.id) });
         socket.disconnect();
       }
     } catch (error) {
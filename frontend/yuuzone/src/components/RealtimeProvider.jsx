@@ -1,6 +1,7 @@
 import { useEffect } from 'react';
 import { useLocation } from 'react-router-dom';
 import AuthConsumer from './AuthContext';
+import { FEEDS, postRoom, userRoom } from '../utils/rooms';
 import useRealtimeNotifications from '../hooks/useRealtimeNotifications';
 
 /**
@@ -39,17 +40,14 @@ export default function RealtimeProvider({ children }) {
     const timeoutId = setTimeout(() => {
     // Join appropriate rooms based on current route
     switch (currentRoute) {
-      case 'thread':
-        if (routeParam) {
-          // Join subthread room
-          socket.emit('join', { room: routeParam });
-        }
+      case 't':
+        // Subthread rooms are joined by useRealtimeSubthread, which knows the subthread id
         break;
       
       case 'post':
         if (routeParam) {
           // Join post room for comments
-          socket.emit('join', { room: routeParam });
+          socket.emit('join', { room: postRoom(routeParam) });
         }
         break;
       
@@ -62,8 +60,10 @@ export default function RealtimeProvider({ children }) {
         break;
       
       default:
-        // For home page and other routes, join general rooms
-        socket.emit('join', { room: 'general' });
+        // Feed pages register the feed; the server sends post events only from subthreads it shows
+        if (FEEDS.includes(currentRoute)) {
+          socket.emit('view_feed', { feed: currentRoute });
+        }
         break;
     }
     }, 300); // 300ms debounce for route changes
@@ -71,12 +71,10 @@ export default function RealtimeProvider({ children }) {
     // Cleanup function to leave rooms when route changes
     return () => {
       clearTimeout(timeoutId);
-      if (currentRoute === 'thread' && routeParam) {
-        socket.emit('leave', { room: routeParam });
-      } else if (currentRoute === 'post' && routeParam) {
-        socket.emit('leave', { room: routeParam });
-      } else {
-        socket.emit('leave', { room: 'general' });
+      if (currentRoute === 'post' && routeParam) {
+        socket.emit('leave', { room: postRoom(routeParam) });
+      } else if (FEEDS.includes(currentRoute)) {
+        socket.emit('view_feed', { feed: null });
       }
     };
   }, [socket, user, location.pathname]);
@@ -98,7 +96,7 @@ export default function RealtimeProvider({ children }) {
 
       // Rejoin rooms after reconnection
       if (user?.username) {
-        socket.emit('join', { room: `user_${user.username}` });
+        socket.emit('join', { room: userRoom(user.username) });
       }
     };
 
@@ -20,7 +20,7 @@ export default function Vote({ url, intitalVote, initialCount, contentID, type }
   const { t } = useTranslation();
   const [vote, setVote] = useState(intitalVote);
   const [voteCount, setVoteCount] = useState(initialCount);
-  const { isAuthenticated } = useAuthContext();
+  const { isAuthenticated, user } = useAuthContext();
   const { connected, socket } = useSocket("votes");
 
   const { mutate } = useMutation({
@@ -45,26 +45,32 @@ export default function Vote({ url, intitalVote, initialCount, contentID, type }
   useEffect(() => {
     if (!connected) return;
 
+    const isComment = url.includes("comment");
+    const eventName = isComment ? "comment_vote_updated" : "post_vote_updated";
+
     const handleVoteUpdate = (data) => {
-      if (data.post_id === contentID) {
-        // Update vote count based on the vote change
+      if ((isComment ? data.comment_id : data.post_id) !== contentID) return;
+      if (typeof data.karma === "number") {
+        // Server updates are coalesced per tick and carry the absolute count
+        setVoteCount(data.karma);
+      } else {
         const voteChange = data.vote_type === 'new' ? (data.is_upvote ? 1 : -1) :
                           data.vote_type === 'update' ? (data.is_upvote ? 2 : -2) :
                           data.vote_type === 'remove' ? (data.old_vote ? -1 : 1) : 0;
-        
         setVoteCount(prev => prev + voteChange);
+      }
+      // Other people's votes change the count, not this viewer's own arrow
+      if (user && data.user_id === user.id) {
         setVote(data.is_upvote);
       }
     };
 
-    socket.on("post_vote_updated", handleVoteUpdate);
-    socket.on("comment_vote_updated", handleVoteUpdate);
+    socket.on(eventName, handleVoteUpdate);
 
     return () => {
-      socket.off("post_vote_updated", handleVoteUpdate);
-      socket.off("comment_vote_updated", handleVoteUpdate);
+      socket.off(eventName, handleVoteUpdate);
     };
-  }, [connected, socket, contentID]);
+  }, [connected, socket, contentID, url, user]);
 
   function handleVote(newVote) {
     if (!isAuthenticated) {
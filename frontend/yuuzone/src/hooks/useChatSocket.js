@@ -1,5 +1,6 @@
 import { useEffect, useState, useCallback } from "react";
 import AuthConsumer from "../components/AuthContext";
+import { chatRoom as typedChatRoom, userRoom } from "../utils/rooms";
 import { useTranslation } from "react-i18next";
 
 /**
@@ -53,9 +54,7 @@ export default function useChatSocket(currentUser, chatPartner) {
     if (!user1 || !user2) {
       return null;
     }
-    const sortedUsers = [user1, user2].sort();
-    const roomName = `chat_${sortedUsers[0]}_${sortedUsers[1]}`;
-    return roomName;
+    return typedChatRoom(user1, user2);
   }, []);
 
   // Monitor socket connection status
@@ -121,8 +120,7 @@ export default function useChatSocket(currentUser, chatPartner) {
 
       // Also join user-specific rooms for notifications
       if (currentUser) {
-        const userRoom = `user_${currentUser}`;
-        socket.emit("join", { room: userRoom });
+        socket.emit("join", { room: userRoom(currentUser) });
       }
 
       setChatRoom(roomName);
@@ -213,6 +211,23 @@ export default function useChatSocket(currentUser, chatPartner) {
     };
   }, [socket]);
 
+  // Attachment finished uploading in the background
+  const onMessageMediaReady = useCallback((callback) => {
+    if (!socket) return () => {};
+
+    const handleMediaReady = (data) => {
+      callback(data);
+    };
+
+    socket.on("message_media_ready", handleMediaReady);
+    socket.on("media_ready", handleMediaReady);
+
+    return () => {
+      socket.off("message_media_ready", handleMediaReady);
+      socket.off("media_ready", handleMediaReady);
+    };
+  }, [socket]);
+
   // Send message via socket
   const sendMessage = useCallback((messageData) => {
     if (!socket || !chatRoom) return;
@@ -251,6 +266,7 @@ export default function useChatSocket(currentUser, chatPartner) {
     onStopTyping,
     onMessageEdit,
     onMessageDelete,
+    onMessageMediaReady,
     sendMessage,
     sendTyping,
     sendStopTyping
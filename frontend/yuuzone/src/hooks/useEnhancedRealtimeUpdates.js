@@ -1,6 +1,7 @@
 import { useEffect, useCallback, useRef, useState } from 'react';
 import { useQueryClient } from '@tanstack/react-query';
 import AuthConsumer from '../components/AuthContext';
+import { subRoom } from '../utils/rooms';
 
 /**
  * Enhanced real-time updates hook that provides additional functionality
@@ -27,10 +28,12 @@ export default function useEnhancedRealtimeUpdates(options = {}) {
 
   // Handle live user count updates
   const handleLiveUserCountUpdate = useCallback((data) => {
-    const { user_count, active_users } = data;
+    const { subthread_id, user_count, active_users } = data;
+    // Post rooms get their own counts; only this subthread's apply here
+    if (subthread_id === undefined || String(subthread_id) !== String(subthreadId)) return;
     setLiveUserCount(user_count);
     setActiveUsers(active_users || []);
-  }, []);
+  }, [subthreadId]);
 
   // Handle user activity updates
   const handleUserActivity = useCallback((data) => {
@@ -185,7 +188,7 @@ export default function useEnhancedRealtimeUpdates(options = {}) {
 
     // Join subthread room if provided
     if (subthreadId) {
-      socket.emit('join', { room: subthreadId });
+      socket.emit('join', { room: subRoom(subthreadId) });
     }
 
     // Set up event listeners
@@ -207,7 +210,7 @@ export default function useEnhancedRealtimeUpdates(options = {}) {
     return () => {
       // Leave subthread room
       if (subthreadId) {
-        socket.emit('leave', { room: subthreadId });
+        socket.emit('leave', { room: subRoom(subthreadId) });
       }
       
       // Clean up event listeners
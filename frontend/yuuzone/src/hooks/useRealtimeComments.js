@@ -1,6 +1,7 @@
 import { useEffect, useCallback } from 'react';
 import { useQueryClient } from '@tanstack/react-query';
 import AuthConsumer from '../components/AuthContext';
+import { postRoom } from '../utils/rooms';
 
 /**
  * Custom hook for handling real-time comment updates
@@ -151,7 +152,7 @@ export default function useRealtimeComments(postId) {
     if (!socket || !postId) return;
 
     // Join the post room to receive comment updates
-    socket.emit('join', { room: postId });
+    socket.emit('join', { room: postRoom(postId) });
 
     // Set up event listeners
     socket.on('new_comment', handleNewComment);
@@ -160,7 +161,7 @@ export default function useRealtimeComments(postId) {
 
     return () => {
       // Leave the post room
-      socket.emit('leave', { room: postId });
+      socket.emit('leave', { room: postRoom(postId) });
       
       // Clean up event listeners
       socket.off('new_comment', handleNewComment);
@@ -1,6 +1,7 @@
 import { useEffect, useCallback, useState } from 'react';
 import { useQueryClient } from '@tanstack/react-query';
 import AuthConsumer from '../components/AuthContext';
+import { userRoom } from '../utils/rooms';
 
 /**
  * Custom hook for handling real-time notifications
@@ -157,7 +158,7 @@ export default function useRealtimeNotifications() {
     // Debounce room joining to prevent spam
     const timeoutId = setTimeout(() => {
     // Join personal room for notifications
-    socket.emit('join', { room: `user_${user.username}` });
+    socket.emit('join', { room: userRoom(user.username) });
     }, 500);
 
     // Set up event listeners
@@ -168,7 +169,7 @@ export default function useRealtimeNotifications() {
     return () => {
       clearTimeout(timeoutId);
       // Leave personal room
-      socket.emit('leave', { room: `user_${user.username}` });
+      socket.emit('leave', { room: userRoom(user.username) });
       
       // Clean up event listeners
       socket.off('notification', handleNotification);
@@ -2,6 +2,7 @@ import { useEffect, useCallback, useRef, useState } from 'react';
 import { useLocation } from 'react-router-dom';
 import { useQueryClient } from '@tanstack/react-query';
 import AuthConsumer from '../components/AuthContext';
+import { settingsRoom } from '../utils/rooms';
 import axios from 'axios';
 
 // Global flag to prevent multiple translate stats fetching instances
@@ -354,7 +355,7 @@ export default function useRealtimeSettings() {
     socket.on('blocked_users_updated', handleBlockedUsersUpdated);
 
     // Join user's settings room for real-time updates
-    socket.emit('join_room', `user_settings_${user.id}`);
+    socket.emit('join_room', settingsRoom(user.id));
 
     return () => {
       socket.off('theme_updated', handleThemeUpdated);
@@ -364,7 +365,7 @@ export default function useRealtimeSettings() {
       socket.off('translation_stats_updated', handleTranslationStatsUpdated);
       socket.off('blocked_users_updated', handleBlockedUsersUpdated);
       
-      socket.emit('leave_room', `user_settings_${user.id}`);
+      socket.emit('leave_room', settingsRoom(user.id));
     };
   }, [socket, user, handleThemeUpdated, handleSubscriptionUpdated, handleCustomThemeUpdated, handleUserPreferenceUpdated, handleTranslationStatsUpdated, handleBlockedUsersUpdated]);
 
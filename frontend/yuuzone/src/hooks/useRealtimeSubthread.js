@@ -2,6 +2,7 @@ import { useEffect, useCallback } from 'react';
 import { useLocation } from 'react-router-dom';
 import { useQueryClient } from '@tanstack/react-query';
 import AuthConsumer from '../components/AuthContext';
+import { subRoom } from '../utils/rooms';
 
 /**
  * Custom hook for handling real-time subthread updates
@@ -166,7 +167,7 @@ export default function useRealtimeSubthread(subthreadId, subthreadName) {
 
     // Join the subthread room to receive updates
     if (subthreadId) {
-      socket.emit('join', { room: subthreadId });
+      socket.emit('join', { room: subRoom(subthreadId) });
     }
 
     // Set up event listeners
@@ -183,7 +184,7 @@ export default function useRealtimeSubthread(subthreadId, subthreadName) {
 
       // Leave the subthread room
       if (subthreadId) {
-        socket.emit('leave', { room: subthreadId });
+        socket.emit('leave', { room: subRoom(subthreadId) });
       }
       
       // Clean up event listeners
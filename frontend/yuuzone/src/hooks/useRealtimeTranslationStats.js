@@ -1,6 +1,7 @@
 import { useEffect, useCallback, useRef, useState } from 'react';
 import { useQueryClient } from '@tanstack/react-query';
 import AuthConsumer from '../components/AuthContext';
+import { settingsRoom } from '../utils/rooms';
 import axios from 'axios';
 
 // Global flag to prevent multiple translate stats fetching instances
@@ -100,11 +101,11 @@ export default function useRealtimeTranslationStats() {
     socket.on('translation_stats_updated', handleTranslationStatsUpdated);
 
     // Join user's settings room for real-time updates
-    socket.emit('join_room', `user_settings_${user.id}`);
+    socket.emit('join_room', settingsRoom(user.id));
 
     return () => {
       socket.off('translation_stats_updated', handleTranslationStatsUpdated);
-      socket.emit('leave_room', `user_settings_${user.id}`);
+      socket.emit('leave_room', settingsRoom(user.id));
     };
   }, [socket, user, handleTranslationStatsUpdated]);
 
@@ -3,6 +3,7 @@ import { useLocation } from 'react-router-dom';
 import { useQueryClient } from '@tanstack/react-query';
 import { useNavigate } from 'react-router-dom';
 import AuthConsumer from '../components/AuthContext';
+import { subRoom, userRoom } from '../utils/rooms';
 
 /**
  * Custom hook for handling real-time user management updates
@@ -270,12 +271,12 @@ export default function useRealtimeUserManagement(subthreadId) {
 
     // Join subthread room for management events
     if (subthreadId) {
-      socket.emit('join', { room: subthreadId });
+      socket.emit('join', { room: subRoom(subthreadId) });
     }
 
     // Join personal room for user-specific events
     if (user?.username) {
-      socket.emit('join', { room: `user_${user.username}` });
+      socket.emit('join', { room: userRoom(user.username) });
     }
 
     // Set up event listeners
@@ -298,10 +299,10 @@ export default function useRealtimeUserManagement(subthreadId) {
 
       // Leave rooms
       if (subthreadId) {
-        socket.emit('leave', { room: subthreadId });
+        socket.emit('leave', { room: subRoom(subthreadId) });
       }
       if (user?.username) {
-        socket.emit('leave', { room: `user_${user.username}` });
+        socket.emit('leave', { room: userRoom(user.username) });
       }
       
       // Clean up event listeners
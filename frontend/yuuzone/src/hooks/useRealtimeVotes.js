@@ -12,7 +12,7 @@ export default function useRealtimeVotes(postId, subthreadId) {
 
   // Handle real-time post vote updates
   const handlePostVoteUpdate = useCallback((data) => {
-    const { post_id, user_id, is_upvote, vote_type, old_vote } = data;
+    const { post_id, user_id, is_upvote, vote_type, old_vote, upvotes, downvotes, karma } = data;
     
     // Only update if we have relevant IDs
     if (!post_id) return;
@@ -38,8 +38,16 @@ export default function useRealtimeVotes(postId, subthreadId) {
         const updatePostVotes = (post) => {
           if (post.post_info?.id !== post_id) return post;
 
-          const updatedPost = { ...post };
+          const updatedPost = { ...post, post_info: { ...post.post_info } };
           
+          // Server updates are coalesced per tick and carry absolute counts
+          if (typeof karma === 'number') {
+            updatedPost.post_info.upvotes = upvotes;
+            updatedPost.post_info.downvotes = downvotes;
+            updatedPost.post_info.post_karma = karma;
+            return updatedPost;
+          }
+
           // Update vote counts based on vote type
           if (vote_type === 'new') {
             if (is_upvote) {
@@ -94,7 +102,7 @@ export default function useRealtimeVotes(postId, subthreadId) {
 
   // Handle real-time comment vote updates
   const handleCommentVoteUpdate = useCallback((data) => {
-    const { comment_id, post_id, user_id, is_upvote, vote_type, old_vote } = data;
+    const { comment_id, post_id, user_id, is_upvote, vote_type, old_vote, upvotes, downvotes, karma } = data;
     
     // Only update if we have relevant IDs
     if (!comment_id || !post_id) return;
@@ -120,6 +128,13 @@ export default function useRealtimeVotes(postId, subthreadId) {
 
         const updatedComment = { ...comment };
         
+        // Server updates are coalesced per tick and carry absolute counts
+        if (typeof karma === 'number') {
+          updatedComment.upvotes = upvotes;
+          updatedComment.downvotes = downvotes;
+          return updatedComment;
+        }
+
         // Update vote counts based on vote type
         if (vote_type === 'new') {
           if (is_upvote) {
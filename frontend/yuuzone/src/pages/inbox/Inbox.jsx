@@ -199,17 +199,23 @@ export const Chat = ({ sender, setCurChat, newChat = false, showUserInfo, setSho
   const [unreadCount, setUnreadCount] = useState(0);
   const messagesEndRef = useRef(null);
   const messagesContainerRef = useRef(null);
+  const restoreScrollRef = useRef(null);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
 
   const {
-    connected, onMessage, onTyping, onStopTyping, onMessageEdit, onMessageDelete, sendTyping, sendStopTyping
+    connected, onMessage, onTyping, onStopTyping, onMessageEdit, onMessageDelete, onMessageMediaReady, sendTyping, sendStopTyping
   } = useChatSocket(user?.username, sender?.username) || {};
 
   const { data, isLoading, error } = useQuery({
     queryKey: ["chat", sender?.username],
     queryFn: async () => {
       if (!sender?.username) return [];
+      // Newest page first; older pages are prepended as the user scrolls up
       const response = await axios.get(`/api/messages/chat/${sender.username}`);
-      return response.data;
+      queryClient.setQueryData(["chatCursor", sender.username], response.data.next_before);
+      setOlderCursor(response.data.next_before);
+      return response.data.messages;
     },
     enabled: !!sender?.username,
     retry: 2,
@@ -221,6 +227,34 @@ export const Chat = ({ sender, setCurChat, newChat = false, showUserInfo, setSho
     refetchOnReconnect: false, // Prevent refetch on network reconnect
   });
 
+  // Cached chats keep their paging cursor next to the messages
+  useEffect(() => {
+    setOlderCursor(sender?.username ? queryClient.getQueryData(["chatCursor", sender.username]) ?? null : null);
+  }, [sender?.username, queryClient]);
+
+  const loadOlderMessages = useCallback(async () => {
+    if (!olderCursor || loadingOlder || !sender?.username) return;
+    setLoadingOlder(true);
+    try {
+      const response = await axios.get(`/api/messages/chat/${sender.username}`, {
+        params: { before: olderCursor }
+      });
+      const container = messagesContainerRef.current;
+      // Remember the distance from the bottom so the prepended page does not move the viewport
+      restoreScrollRef.current = container ? container.scrollHeight - container.scrollTop : null;
+      queryClient.setQueryData(["chat", sender.username], (oldData) => {
+        const known = new Set((oldData || []).map(msg => msg.message_id));
+        return [...response.data.messages.filter(msg => !known.has(msg.message_id)), ...(oldData || [])];
+      });
+      queryClient.setQueryData(["chatCursor", sender.username], response.data.next_before);
+      setOlderCursor(response.data.next_before);
+    } catch {
+      // Keep the cursor so the next scroll retries
+    } finally {
+      setLoadingOlder(false);
+    }
+  }, [olderCursor, loadingOlder, sender?.username, queryClient]);
+
   // Send message mutation
   const { mutate } = useMutation({
     mutationFn: async (params) => {
@@ -370,6 +404,7 @@ export const Chat = ({ sender, setCurChat, newChat = false, showUserInfo, setSho
           message_id: messageData.message_id,
           content: messageData.message || messageData.content || '',
           media: messageData.media || null,
+          media_upload: messageData.media_upload || null,
           created_at: messageData.created_at,
           sender: messageData.sender,
           receiver: messageData.receiver,
@@ -498,23 +533,46 @@ export const Chat = ({ sender, setCurChat, newChat = false, showUserInfo, setSho
       });
     };
 
+    // message_media_ready carries the final URL; media_ready (sent to the uploader only) also reports failures
+    const handleMediaReady = (data) => {
+      const upload = data.upload || data;
+      if (!upload.message_id) return;
+      queryClient.setQueryData(["chat", sender.username], (oldData) => {
+        if (!Array.isArray(oldData)) return oldData;
+        return oldData.map(msg =>
+          msg.message_id === upload.message_id
+            ? { ...msg, media: data.media || upload.url || msg.media, media_upload: upload }
+            : msg
+        );
+      });
+    };
+
     const unsubscribeEdit = onMessageEdit(handleMessageEdited);
     const unsubscribeDelete = onMessageDelete(handleMessageDeleted);
+    const unsubscribeMedia = onMessageMediaReady ? onMessageMediaReady(handleMediaReady) : () => {};
 
     return () => {
       unsubscribeEdit();
       unsubscribeDelete();
+      unsubscribeMedia();
     };
-  }, [connected, onMessageEdit, onMessageDelete, queryClient, sender?.username]);
+  }, [connected, onMessageEdit, onMessageDelete, onMessageMediaReady, queryClient, sender?.username]);
 
   // Scroll to bottom when new messages arrive
   useEffect(() => {
-    myRef.current?.scrollIntoView({ behavior: "smooth" });
+    if (restoreScrollRef.current !== null && messagesContainerRef.current) {
+      // An older page was prepended: keep the user on the message they were reading
+      const container = messagesContainerRef.current;
+      container.scrollTop = container.scrollHeight - restoreScrollRef.current;
+      restoreScrollRef.current = null;
+    } else {
+      myRef.current?.scrollIntoView({ behavior: "smooth" });
+    }
     if (data && Array.isArray(data)) {
       queryClient.setQueryData(["chat", sender?.username], (oldData) => {
         // Allow messages with content OR media (don't filter out media-only messages)
         return Array.isArray(oldData) ? oldData.filter((msg) =>
-          (msg.content && (msg.content.trim() || '').length > 0) || msg.media
+          (msg.content && (msg.content.trim() || '').length > 0) || msg.media || msg.media_upload
         ) : [];
       });
     }
@@ -678,6 +736,11 @@ export const Chat = ({ sender, setCurChat, newChat = false, showUserInfo, setSho
     const isBottom = scrollTop + clientHeight >= scrollHeight - 10; // 10px threshold
     
     setIsAtBottom(isBottom);
+
+    // Near the top: fetch the previous page of the conversation
+    if (scrollTop < 80 && olderCursor) {
+      loadOlderMessages();
+    }
     
     // If user scrolls to bottom, hide new message indicator and reset unread count
     if (isBottom) {
@@ -951,6 +1014,11 @@ export const Chat = ({ sender, setCurChat, newChat = false, showUserInfo, setSho
             onScroll={handleScroll}
             className="flex-1 overflow-y-auto p-2 md:p-4 space-y-3 md:space-y-4 min-h-0"
           >
+          {loadingOlder && (
+            <div className="flex justify-center py-2">
+              <LoadingSpinner />
+            </div>
+          )}
           {data && Array.isArray(data) && data.length > 0 ? (
             data.map((msg) => (
               <div
@@ -993,6 +1061,13 @@ export const Chat = ({ sender, setCurChat, newChat = false, showUserInfo, setSho
                     </div>
                   )}
 
+                  {/* Attachment still uploading (or failed) in the background */}
+                  {!msg.media && msg.media_upload && (
+                    <div className="mt-2 text-xs italic opacity-75">
+                      {msg.media_upload.status === 'failed' ? t('messages.mediaUploadFailed') : t('messages.mediaUploading')}
+                    </div>
+                  )}
+
                   {/* Media Display */}
                   {msg.media && (
                     <div className="mt-2">
@@ -0,0 +1,21 @@
+/**
+ * Socket.IO room names. The server only accepts these typed forms, so subthread 42,
+ * post 42 and user 42 each get their own room.
+ */
+
+/** Feeds a socket can register with `view_feed`; the server manages their rooms */
+export const FEEDS = ["home", "all", "popular"];
+
+export const subRoom = (subthreadId) => `sub:${subthreadId}`;
+
+export const postRoom = (postId) => `post:${postId}`;
+
+/** Personal room, by user id or username */
+export const userRoom = (user) => `user:${user}`;
+
+export const settingsRoom = (userId) => `settings:${userId}`;
+
+export const chatRoom = (firstUsername, secondUsername) => {
+  const [first, second] = [firstUsername, secondUsername].sort();
+  return `chat:${first}:${second}`;
+};